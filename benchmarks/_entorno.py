@@ -0,0 +1,115 @@
+"""
+Utilidades compartidas por los benchmarks.
+
+Cada benchmark corre contra una base SQLite temporal recién migrada, nunca
+contra db.sqlite3, así que se pueden ejecutar sin miedo desde la raíz:
+
+    python benchmarks/bench_reservas.py
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+RAIZ = Path(__file__).resolve().parent.parent
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+
+def preparar_django(**ajustes):
+    """Configura Django sobre una base temporal y aplica las migraciones"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tienda.settings')
+
+    from django.conf import settings
+
+    directorio = Path(tempfile.mkdtemp(prefix='tienda-bench-'))
+    # El perfil SQLite de settings (WAL, timeout, BEGIN IMMEDIATE) aunque
+    # TIENDA_DB apunte a otra base
+    base = settings.DATABASES['default']
+    if 'sqlite' not in base['ENGINE']:
+        base = settings.BASES_DISPONIBLES['sqlite']
+    settings.DATABASES = {'default': {**base, 'NAME': directorio / 'bench.sqlite3'}}
+    # Los hashes de contraseña no son lo que medimos
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    for nombre, valor in ajustes.items():
+        setattr(settings, nombre, valor)
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return directorio
+
+
+@contextmanager
+def cronometro(resultado, clave='segundos'):
+    """Guarda en resultado[clave] los segundos transcurridos dentro del bloque"""
+    inicio = time.perf_counter()
+    try:
+        yield resultado
+    finally:
+        resultado[clave] = time.perf_counter() - inicio
+
+
+def pedir_wsgi(aplicacion, ruta, encabezados):
+    """Un GET contra una aplicación WSGI en el mismo proceso: (estado, bytes del cuerpo)"""
+    entorno = {'PATH_INFO': ruta, 'REQUEST_METHOD': 'GET', 'wsgi.errors': sys.stderr}
+    entorno.update(encabezados)
+    setup_testing_defaults(entorno)
+    estado = []
+    cuerpo = aplicacion(entorno, lambda status, headers, exc_info=None: estado.append(status))
+    try:
+        return estado[0][:3], sum(len(parte) for parte in cuerpo)
+    finally:
+        if hasattr(cuerpo, 'close'):
+            cuerpo.close()
+
+
+async def pedir_asgi(aplicacion, ruta, encabezados):
+    """Lo mismo contra una aplicación ASGI; `encabezados` con claves HTTP_* como en WSGI"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(), 'query_string': b'',
+        'root_path': '', 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+        'headers': [(b'host', b'localhost')] + [
+            (nombre[5:].replace('_', '-').lower().encode(), valor.encode())
+            for nombre, valor in encabezados.items()
+        ],
+    }
+    resultado = {'estado': None, 'bytes': 0}
+
+    async def recibir():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def enviar(mensaje):
+        if mensaje['type'] == 'http.response.start':
+            resultado['estado'] = str(mensaje['status'])
+        elif mensaje['type'] == 'http.response.body':
+            resultado['bytes'] += len(mensaje.get('body', b''))
+
+    await aplicacion(scope, recibir, enviar)
+    return resultado['estado'], resultado['bytes']
+
+
+def imprimir_tabla(filas, columnas):
+    """Imprime una lista de diccionarios como tabla de texto alineada"""
+    anchos = {
+        col: max(len(col), *(len(_formatear(f.get(col))) for f in filas))
+        for col in columnas
+    }
+    print('  '.join(col.ljust(anchos[col]) for col in columnas))
+    print('  '.join('-' * anchos[col] for col in columnas))
+    for fila in filas:
+        print('  '.join(_formatear(fila.get(col)).ljust(anchos[col]) for col in columnas))
+
+
+def _formatear(valor):
+    if isinstance(valor, float):
+        return f'{valor:,.3f}'
+    if valor is None:
+        return '-'
+    return str(valor)
@@ -0,0 +1,92 @@
+"""
+Acciones en bloque del admin de productos: un save() por fila contra un UPDATE.
+
+Para 100, 1000 y 10000 productos seleccionados compara la acción anterior
+(recorrer el queryset y guardar cada producto) con ajustar_stock_en_lote y
+cambiar_precios_en_lote, contando consultas y midiendo el tiempo. Los
+INSERT del libro de inventario (agrupado como en una request) se cuentan
+aparte: bulk_create los parte en lotes por el límite de parámetros de SQLite.
+
+    python benchmarks/bench_acciones_admin.py [--seleccionados 100 1000 10000]
+"""
+import argparse
+from decimal import Decimal
+
+from _entorno import cronometro, imprimir_tabla, preparar_django
+
+
+def stock_legado(queryset):
+    """Reproduce la acción aumentar_inventario previa (+10, fila por fila)"""
+    for producto in queryset:
+        producto.inventario += 10
+        producto.save()
+
+
+def stock_en_lote(queryset):
+    from carrito.inventario import AJUSTE_AUMENTAR, ajustar_stock_en_lote
+
+    ajustar_stock_en_lote(queryset, AJUSTE_AUMENTAR, 10)
+
+
+def precio_legado(queryset):
+    for producto in queryset:
+        producto.precio = (producto.precio * Decimal('1.05')).quantize(Decimal('0.01'))
+        producto.save()
+
+
+def precio_en_lote(queryset):
+    from carrito.precios import cambiar_precios_en_lote
+
+    cambiar_precios_en_lote(queryset, 5)
+
+
+def medir(estrategia, queryset):
+    from django.db import connection
+    from carrito.movimientos import agrupar_movimientos
+
+    # Sin CaptureQueriesContext: el registro de consultas se corta en 9000
+    contador = {'consultas': 0, 'libro': 0}
+
+    def contar(execute, sql, params, many, context):
+        contador['consultas'] += 1
+        contador['libro'] += sql.startswith('INSERT INTO "carrito_inventariomovimiento"')
+        return execute(sql, params, many, context)
+
+    resultado = {}
+    with connection.execute_wrapper(contar), cronometro(resultado):
+        with agrupar_movimientos():
+            estrategia(queryset)
+    return {
+        'estrategia': estrategia.__name__,
+        'productos': queryset.count(),
+        'consultas': contador['consultas'] - contador['libro'],
+        'inserts_libro': contador['libro'],
+        'ms': resultado['segundos'] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seleccionados', type=int, nargs='+', default=[100, 1000, 10_000])
+    args = parser.parse_args()
+
+    preparar_django()
+
+    from carrito.models import Producto
+
+    Producto.objects.bulk_create(
+        Producto(nombre=f'Producto {i}', descripcion='Benchmark', precio=Decimal('9.99'), inventario=5)
+        for i in range(max(args.seleccionados))
+    )
+
+    filas = []
+    for seleccionados in args.seleccionados:
+        ids = list(Producto.objects.order_by('id').values_list('pk', flat=True)[:seleccionados])
+        queryset = Producto.objects.filter(pk__in=ids)
+        for estrategia in (stock_legado, stock_en_lote, precio_legado, precio_en_lote):
+            filas.append(medir(estrategia, queryset))
+    imprimir_tabla(filas, ['estrategia', 'productos', 'consultas', 'inserts_libro', 'ms'])
+
+
+if __name__ == '__main__':
+    main()
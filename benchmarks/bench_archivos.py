@@ -0,0 +1,116 @@
+"""
+Pedidos por segundo al servir estáticos y media desde la aplicación.
+
+Corre collectstatic sobre un STATIC_ROOT temporal (nombres con hash y
+copias .gz/.br) y pide, a través de la aplicación WSGI y de la ASGI
+completas, una hoja de estilos del admin (sin comprimir, comprimida y
+revalidada con If-None-Match) y la imagen más grande de media/productos
+(completa y por rangos de 64 KB). Como referencia compara la vista
+django.views.static.serve, que era lo que servía media con DEBUG, con
+servir_archivo; las dos se llaman directo, sin handler ni middlewares.
+
+    python benchmarks/bench_archivos.py
+"""
+import argparse
+import asyncio
+
+from _entorno import RAIZ, cronometro, imprimir_tabla, pedir_asgi, pedir_wsgi, preparar_django
+
+CSS = 'admin/css/base.css'
+
+
+def medir(nombre, pedidos, pedir):
+    estado, tamano = pedir(0)
+    resultado = {}
+    with cronometro(resultado):
+        for i in range(pedidos):
+            pedir(i)
+    return {
+        'escenario': nombre, 'estado': estado, 'kb_por_pedido': tamano / 1024,
+        'pedidos_por_s': pedidos / resultado['segundos'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pedidos', type=int, default=2000)
+    args = parser.parse_args()
+
+    directorio = preparar_django(
+        DEBUG=False, ALLOWED_HOSTS=['*'], MEDIA_ROOT=RAIZ / 'media',
+    )
+    from django.conf import settings
+    # Las aplicaciones arman el índice de estáticos al crearse, después de collectstatic
+    settings.STATIC_ROOT = directorio / 'static'
+
+    from django.contrib.staticfiles.storage import staticfiles_storage
+    from django.core.asgi import get_asgi_application
+    from django.core.management import call_command
+    from django.core.wsgi import get_wsgi_application
+    from django.test import Client, RequestFactory
+    from django.views.static import serve
+
+    from carrito.archivos import Archivo, brotli, servir_archivo
+
+    call_command('collectstatic', interactive=False, verbosity=0)
+    css = staticfiles_storage.url(CSS)
+    imagen = max((RAIZ / 'media' / 'productos').iterdir(), key=lambda ruta: ruta.stat().st_size)
+    url_imagen = f'{settings.MEDIA_URL}productos/{imagen.name}'
+    tamano_imagen = imagen.stat().st_size
+
+    wsgi = get_wsgi_application()
+    asgi = get_asgi_application()
+    etag = Client().get(css)['ETag']
+
+    def rango(i):
+        inicio = (i * 65536) % max(1, tamano_imagen - 65536)
+        return {'HTTP_RANGE': f'bytes={inicio}-{inicio + 65535}'}
+
+    escenarios = [
+        ('css con hash', css, lambda i: {}),
+        ('css con hash, gzip', css, lambda i: {'HTTP_ACCEPT_ENCODING': 'gzip, br'}),
+        ('css revalidado (304)', css, lambda i: {'HTTP_IF_NONE_MATCH': etag}),
+        ('imagen completa', url_imagen, lambda i: {}),
+        ('imagen por rangos de 64 KB', url_imagen, rango),
+    ]
+    filas = []
+    for nombre, ruta, encabezados in escenarios:
+        filas.append({'servidor': 'WSGI', **medir(
+            nombre, args.pedidos, lambda i: pedir_wsgi(wsgi, ruta, encabezados(i))
+        )})
+
+    bucle = asyncio.new_event_loop()
+    for nombre, ruta, encabezados in escenarios:
+        filas.append({'servidor': 'ASGI', **medir(
+            nombre, args.pedidos,
+            lambda i: bucle.run_until_complete(pedir_asgi(asgi, ruta, encabezados(i)))
+        )})
+    bucle.close()
+
+    fabrica = RequestFactory()
+    relativo = url_imagen[len(settings.MEDIA_URL):]
+
+    def vista(i):
+        respuesta = serve(fabrica.get(url_imagen), relativo, document_root=settings.MEDIA_ROOT)
+        tamano = sum(len(parte) for parte in respuesta.streaming_content)
+        respuesta.close()
+        return str(respuesta.status_code), tamano
+
+    def directo(i):
+        archivo = Archivo.desde_disco(imagen, 'public')
+        respuesta = servir_archivo(fabrica.get(url_imagen), archivo)
+        tamano = sum(len(parte) for parte in respuesta.streaming_content)
+        respuesta.close()
+        return str(respuesta.status_code), tamano
+
+    filas.append({'servidor': 'static.serve', **medir('imagen completa (antes)', args.pedidos, vista)})
+    filas.append({'servidor': 'servir_archivo', **medir('imagen completa', args.pedidos, directo)})
+    imprimir_tabla(filas, ['servidor', 'escenario', 'estado', 'kb_por_pedido', 'pedidos_por_s'])
+
+    comprimidos = sum(1 for _ in settings.STATIC_ROOT.rglob('*.gz'))
+    print(f'\n{comprimidos} archivos .gz en STATIC_ROOT; brotli '
+          f'{"disponible" if brotli is not None else "no instalado (solo .gz)"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Búsqueda de productos: LIKE '%q%' (icontains) contra el índice FTS5.
+
+Para cada tamaño de catálogo carga productos con nombres y descripciones
+sintéticas, reconstruye el índice y mide la mediana de varias consultas
+con ambos motores.
+
+    python benchmarks/bench_busqueda.py [--tamanos 10000 100000 1000000]
+"""
+import argparse
+import random
+import statistics
+from decimal import Decimal
+
+from _entorno import cronometro, imprimir_tabla, preparar_django
+
+VOCABULARIO = (
+    'audífonos batería cargador teclado mouse pantalla parlante consola control '
+    'silla gamer ventilador inalámbrico bluetooth usb tipo-c original repuesto '
+    'negro blanco rojo portátil recargable rápido mecánico óptico curvo 4k hdr '
+    'xbox playstation nintendo logitech samsung sony jbl iphone android laptop'
+).split()
+
+CONSULTAS = ['bateria', 'carg', 'teclado mecanico', 'sony 4k', 'xyzzy']
+
+
+def cargar(total, desde):
+    from carrito.models import Producto
+
+    azar = random.Random(total)
+    lote = 10_000
+    for inicio in range(desde, total, lote):
+        Producto.objects.bulk_create(
+            Producto(
+                nombre=' '.join(azar.sample(VOCABULARIO, 3)).capitalize(),
+                descripcion=' '.join(azar.choices(VOCABULARIO, k=25)),
+                precio=Decimal('9.99'),
+                inventario=5
+            )
+            for _ in range(inicio, min(inicio + lote, total))
+        )
+
+
+def medir(motor, consulta, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        resultado = {}
+        with cronometro(resultado):
+            motor.buscar(consulta, limite=25)
+        tiempos.append(resultado['segundos'] * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    preparar_django()
+
+    from carrito.busqueda import MotorBusqueda, MotorFTS5
+
+    like, fts = MotorBusqueda(), MotorFTS5()
+    filas = []
+    cargados = 0
+    for tamano in sorted(args.tamanos):
+        cargar(tamano, cargados)
+        cargados = tamano
+        indexado = {}
+        with cronometro(indexado):
+            fts.reconstruir()
+        for consulta in CONSULTAS:
+            filas.append({
+                'productos': tamano,
+                'consulta': consulta,
+                'like_ms': medir(like, consulta),
+                'fts5_ms': medir(fts, consulta),
+                'reindexar_s': indexado['segundos'],
+            })
+    imprimir_tabla(filas, ['productos', 'consulta', 'like_ms', 'fts5_ms', 'reindexar_s'])
+
+
+if __name__ == '__main__':
+    main()
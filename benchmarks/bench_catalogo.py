@@ -0,0 +1,87 @@
+"""
+Costo de una página del catálogo según su profundidad: OFFSET contra cursor.
+
+Carga N productos en stock y mide cuánto tarda traer 24 productos en la
+página 1, 100, 1000... usando OFFSET (como haría Paginator) y usando
+carrito.paginacion.pagina_por_cursor.
+
+    python benchmarks/bench_catalogo.py [--productos 100000]
+"""
+import argparse
+import statistics
+from decimal import Decimal
+
+from _entorno import cronometro, imprimir_tabla, preparar_django
+
+POR_PAGINA = 24
+
+
+def cargar_productos(total):
+    from django.db import connection
+    from carrito.models import Producto
+
+    lote = 5000
+    for inicio in range(0, total, lote):
+        Producto.objects.bulk_create(
+            Producto(
+                nombre=f'Producto {i}',
+                descripcion='Benchmark',
+                precio=Decimal('9.99'),
+                inventario=i % 7
+            )
+            for i in range(inicio, min(inicio + lote, total))
+        )
+    # Fechas de creación distintas, como en un catálogo real
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE carrito_producto SET creado = datetime(creado, '-' || id || ' seconds')"
+        )
+        cursor.execute('ANALYZE')
+
+
+def medir(funcion, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        resultado = {}
+        with cronometro(resultado):
+            funcion()
+        tiempos.append(resultado['segundos'] * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--productos', type=int, default=100_000)
+    args = parser.parse_args()
+
+    preparar_django()
+
+    from carrito.models import Producto
+    from carrito.paginacion import codificar_cursor, pagina_por_cursor
+
+    cargar_productos(args.productos)
+    en_stock = Producto.objects.filter(inventario__gt=0)
+    total = en_stock.count()
+
+    filas = []
+    for pagina in (1, 10, 100, 1000, total // POR_PAGINA):
+        desde = (pagina - 1) * POR_PAGINA
+        if desde >= total:
+            continue
+        anterior = en_stock.order_by('-creado', '-id')[desde - 1] if desde else None
+        cursor = codificar_cursor(anterior) if anterior else None
+
+        filas.append({
+            'pagina': pagina,
+            'offset_ms': medir(
+                lambda: list(en_stock.order_by('-creado', '-id')[desde:desde + POR_PAGINA])
+            ),
+            'cursor_ms': medir(lambda: pagina_por_cursor(en_stock, cursor, POR_PAGINA)),
+        })
+
+    print(f'{total} productos en stock de {args.productos}')
+    imprimir_tabla(filas, ['pagina', 'offset_ms', 'cursor_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Latencia del checkout para carritos de 1, 10 y 100 líneas.
+
+Compara el flujo anterior (verificación ítem por ítem + Carrito.limpiar con
+un save() y un delete() por línea) con Carrito.confirmar_pedido.
+
+    python benchmarks/bench_checkout.py [--lineas 1 10 100] [--repeticiones 20]
+"""
+import argparse
+import statistics
+from decimal import Decimal
+
+from _entorno import cronometro, imprimir_tabla, preparar_django
+
+
+def checkout_legado(carrito):
+    """Reproduce la vista checkout previa a los pedidos"""
+    for item in carrito.items.all():
+        if item.cantidad > item.producto.inventario + item.cantidad_reservada:
+            raise ValueError(f"No hay suficiente stock de {item.producto.nombre}")
+    for item in carrito.items.all():
+        producto = item.producto
+        producto.inventario += item.cantidad
+        producto.save()
+        item.delete()
+    carrito.save()
+
+
+def checkout_pedido(carrito):
+    carrito.confirmar_pedido()
+
+
+def preparar_carrito(usuario, productos):
+    from carrito.models import Carrito
+
+    carrito, _ = Carrito.objects.get_or_create(usuario=usuario)
+    for producto in productos:
+        carrito.agregar_producto(producto, 1)
+    carrito.refresh_from_db()
+    return carrito
+
+
+def medir(estrategia, usuario, productos, repeticiones):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    tiempos = []
+    consultas = 0
+    for _ in range(repeticiones):
+        carrito = preparar_carrito(usuario, productos)
+        connection.queries_log.clear()
+        resultado = {}
+        with CaptureQueriesContext(connection) as capturadas, cronometro(resultado):
+            estrategia(carrito)
+        tiempos.append(resultado['segundos'] * 1000)
+        consultas = len(capturadas)
+    return {
+        'estrategia': estrategia.__name__,
+        'lineas': len(productos),
+        'consultas': consultas,
+        'mediana_ms': statistics.median(tiempos),
+        'p95_ms': sorted(tiempos)[int(len(tiempos) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lineas', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    preparar_django()
+
+    from django.contrib.auth.models import User
+    from carrito.models import Producto
+
+    usuario = User.objects.create_user('bench', password='bench')
+    productos = [
+        Producto.objects.create(
+            nombre=f'Producto {i}',
+            descripcion='Benchmark',
+            precio=Decimal('9.99'),
+            inventario=10 ** 6
+        )
+        for i in range(max(args.lineas))
+    ]
+
+    filas = []
+    for lineas in args.lineas:
+        for estrategia in (checkout_legado, checkout_pedido):
+            filas.append(medir(estrategia, usuario, productos[:lineas], args.repeticiones))
+    imprimir_tabla(filas, ['estrategia', 'lineas', 'consultas', 'mediana_ms', 'p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
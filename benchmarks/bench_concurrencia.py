@@ -0,0 +1,153 @@
+"""
+Operaciones por segundo y errores de lock con escrituras concurrentes al carrito.
+
+Cada perfil corre en un proceso aparte con su propia base:
+
+- sqlite-antes: el backend de Django tal como estaba (journal por
+                defecto, BEGIN diferido, timeout de 5 s);
+- sqlite-wal:   el perfil 'sqlite' de settings (WAL, synchronous=NORMAL,
+                mmap, BEGIN IMMEDIATE, timeout de 20 s);
+- postgres:     el perfil 'postgres' (solo con --postgres; toma la
+                conexión de las variables TIENDA_DB_* y crea y borra una
+                base test_<nombre>, como el runner de tests).
+
+`--hilos` usuarios, cada uno con su carrito, alternan lecturas (una página
+del catálogo y el resumen del carrito) con escrituras (agregar y quitar un
+producto, que reservan y liberan stock). Una operación que termina en
+OperationalError ("database is locked") cuenta como error.
+
+    python benchmarks/bench_concurrencia.py
+    TIENDA_DB_NOMBRE=tienda TIENDA_DB_USUARIO=... python benchmarks/bench_concurrencia.py --postgres
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from _entorno import imprimir_tabla, preparar_django
+
+PERFILES = ('sqlite-antes', 'sqlite-wal', 'postgres')
+
+
+def preparar_perfil(perfil):
+    """Configura Django para el perfil; devuelve cómo limpiar al terminar"""
+    if perfil == 'postgres':
+        os.environ['TIENDA_DB'] = 'postgres'
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tienda.settings')
+        import django
+        django.setup()
+        from django.db import connection
+        from django.conf import settings
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        return lambda: connection.creation.destroy_test_db(original, verbosity=0)
+
+    if perfil == 'sqlite-antes':
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tienda.settings')
+        from django.conf import settings
+        settings.DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': '', 'OPTIONS': {},
+        }
+    preparar_django()
+    return lambda: None
+
+
+def preparar_datos(productos, hilos):
+    from django.contrib.auth.models import User
+    from carrito.models import Carrito, Producto
+
+    Producto.objects.bulk_create(
+        Producto(nombre=f'Producto {i}', descripcion='Benchmark', precio=Decimal('9.99'), inventario=10_000)
+        for i in range(productos)
+    )
+    User.objects.bulk_create(User(username=f'bench{i}') for i in range(hilos))
+    Carrito.objects.bulk_create(Carrito(usuario=usuario) for usuario in User.objects.all())
+    return list(Carrito.objects.order_by('pk')), list(Producto.objects.all())
+
+
+def correr_perfil(perfil, args):
+    """Corre dentro del proceso hijo e imprime una línea JSON"""
+    limpiar = preparar_perfil(perfil)
+    from django.db import OperationalError, connection
+    from carrito.consultas import resumen_carrito
+    from carrito.models import Producto
+
+    try:
+        carritos, productos = preparar_datos(args.productos, args.hilos)
+        barrera = threading.Barrier(args.hilos)
+
+        def usuario(carrito):
+            azar = random.Random(carrito.pk)
+            latencias, errores = [], 0
+            barrera.wait()
+            try:
+                for _ in range(args.operaciones):
+                    inicio = time.perf_counter()
+                    try:
+                        if azar.random() < args.escrituras:
+                            producto = azar.choice(productos)
+                            carrito.agregar_producto(producto, 1)
+                            carrito.remover_producto(producto, 1)
+                        else:
+                            list(Producto.objects.filter(inventario__gt=0).order_by('pk')[:24])
+                            resumen_carrito(carrito)
+                    except OperationalError:
+                        errores += 1
+                    latencias.append(time.perf_counter() - inicio)
+            finally:
+                connection.close()
+            return latencias, errores
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(args.hilos) as pool:
+            resultados = list(pool.map(usuario, carritos))
+        segundos = time.perf_counter() - inicio
+    finally:
+        limpiar()
+
+    latencias = [lat for parte, _ in resultados for lat in parte]
+    print(json.dumps({
+        'perfil': perfil,
+        'operaciones_por_s': len(latencias) / segundos,
+        'p50_ms': statistics.median(latencias) * 1000,
+        'p99_ms': statistics.quantiles(latencias, n=100)[98] * 1000,
+        'errores_lock': sum(errores for _, errores in resultados),
+    }), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--hilos', type=int, default=16)
+    parser.add_argument('--operaciones', type=int, default=200, help='por hilo')
+    parser.add_argument('--escrituras', type=float, default=0.3, help='fracción de escrituras')
+    parser.add_argument('--productos', type=int, default=50)
+    parser.add_argument('--postgres', action='store_true')
+    parser.add_argument('--perfil', choices=PERFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.perfil:
+        correr_perfil(args.perfil, args)
+        return
+
+    filas = []
+    for perfil in PERFILES if args.postgres else PERFILES[:2]:
+        salida = subprocess.run(
+            [sys.executable, __file__, '--perfil', perfil, '--hilos', str(args.hilos),
+             '--operaciones', str(args.operaciones), '--escrituras', str(args.escrituras),
+             '--productos', str(args.productos)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        filas.extend(json.loads(linea) for linea in salida.splitlines() if linea.startswith('{'))
+    imprimir_tabla(filas, ['perfil', 'operaciones_por_s', 'p50_ms', 'p99_ms', 'errores_lock'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Exportación en streaming contra armar el archivo completo en memoria.
+
+Carga N productos y carritos con ítems, y exporta productos (CSV y JSON
+Lines) y el agregado de carritos con carrito.exportacion.exportar,
+consumiendo los bloques como lo haría StreamingHttpResponse. Después
+exporta productos cargando el queryset entero y escribiendo el CSV en un
+StringIO, como haría una vista ingenua. El pico de memoria (RSS) solo
+crece con la variante ingenua, que corre al final por eso.
+
+    python benchmarks/bench_exportacion.py [--productos 1000000] [--carritos 1000]
+"""
+import argparse
+import csv
+import io
+import resource
+from decimal import Decimal
+
+from _entorno import cronometro, imprimir_tabla, preparar_django
+
+
+def pico_memoria_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def cargar(productos, carritos, items_por_carrito=50):
+    from django.contrib.auth.models import User
+    from carrito.models import Carrito, ItemCarrito, Producto
+
+    lote = 10_000
+    for inicio in range(0, productos, lote):
+        Producto.objects.bulk_create(
+            Producto(
+                sku=f'SKU-{i:08d}', nombre=f'Producto {i}', descripcion='Benchmark, con "comillas"',
+                precio=Decimal('9.99'), inventario=i % 50
+            )
+            for i in range(inicio, min(inicio + lote, productos))
+        )
+    usuarios = User.objects.bulk_create(User(username=f'bench{i}') for i in range(carritos))
+    Carrito.objects.bulk_create(Carrito(usuario=usuario) for usuario in usuarios)
+    ids = list(Producto.objects.values_list('pk', flat=True)[:items_por_carrito * 20])
+    ItemCarrito.objects.bulk_create(
+        ItemCarrito(carrito=carrito, producto_id=ids[(n * 7 + i) % len(ids)], cantidad=1 + i % 3)
+        for n, carrito in enumerate(Carrito.objects.all())
+        for i in range(items_por_carrito)
+    )
+
+
+def medir_streaming(conjunto, formato):
+    from carrito.exportacion import exportar
+
+    resultado, bytes_ = {}, 0
+    with cronometro(resultado):
+        for bloque in exportar(conjunto, formato):
+            bytes_ += len(bloque.encode())
+    return resultado['segundos'], bytes_
+
+
+def medir_en_memoria():
+    from carrito.models import Producto
+
+    resultado = {}
+    with cronometro(resultado):
+        salida = io.StringIO()
+        escritor = csv.writer(salida)
+        for producto in list(Producto.objects.all()):
+            escritor.writerow([
+                producto.pk, producto.sku, producto.nombre, producto.descripcion,
+                producto.precio, producto.inventario, producto.creado, producto.actualizado
+            ])
+        contenido = salida.getvalue().encode()
+    return resultado['segundos'], len(contenido)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--productos', type=int, default=1_000_000)
+    parser.add_argument('--carritos', type=int, default=1000)
+    args = parser.parse_args()
+
+    preparar_django()
+    cargar(args.productos, args.carritos)
+    print(f'Pico de memoria después de la carga: {pico_memoria_mb():,.0f} MB')
+
+    filas = []
+    for estrategia, conjunto, formato in (
+        ('streaming', 'productos', 'csv'),
+        ('streaming', 'productos', 'jsonl'),
+        ('streaming', 'carritos', 'csv'),
+    ):
+        segundos, tamano = medir_streaming(conjunto, formato)
+        filas.append({
+            'estrategia': estrategia, 'conjunto': f'{conjunto}.{formato}',
+            'segundos': segundos, 'mb': tamano / 2 ** 20, 'pico_rss_mb': pico_memoria_mb(),
+        })
+    segundos, tamano = medir_en_memoria()
+    filas.append({
+        'estrategia': 'en memoria', 'conjunto': 'productos.csv',
+        'segundos': segundos, 'mb': tamano / 2 ** 20, 'pico_rss_mb': pico_memoria_mb(),
+    })
+    imprimir_tabla(filas, ['estrategia', 'conjunto', 'segundos', 'mb', 'pico_rss_mb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Bytes de imagen que descarga la primera página del catálogo.
+
+Carga 24 productos con las fotos reales de media/productos, pide la
+página con el cliente de pruebas y, para cada escenario (ancho de
+pantalla, densidad y formatos que entiende el navegador), elige del
+srcset emitido la variante que tomaría el navegador y suma sus tamaños.
+Compara con el original que servía la tarjeta antes. También mide la
+primera petición a una variante (se genera) contra las siguientes (disco).
+
+    python benchmarks/bench_imagenes.py
+"""
+import argparse
+import re
+import shutil
+import statistics
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+from _entorno import RAIZ, cronometro, imprimir_tabla, preparar_django
+
+# (nombre, ancho de la ventana en px CSS, densidad, formatos aceptados)
+ESCENARIOS = [
+    ('móvil 390px @3x', 390, 3, ('image/avif', 'image/webp')),
+    ('escritorio 1280px @1x', 1280, 1, ('image/avif', 'image/webp')),
+    ('escritorio 1440px @2x', 1440, 2, ('image/avif', 'image/webp')),
+    ('escritorio 1440px @2x, sin AVIF', 1440, 2, ('image/webp',)),
+    ('navegador viejo (solo JPEG)', 1280, 1, ()),
+]
+
+_PICTURE = re.compile(r'<picture>(.*?)</picture>', re.S)
+_SOURCE = re.compile(r'<source type="([^"]+)" srcset="([^"]+)"')
+_IMG_SRCSET = re.compile(r'<img [^>]*srcset="([^"]+)"')
+
+
+def ancho_tarjeta(ventana):
+    # sizes="(min-width: 768px) 33vw, 100vw"
+    return ventana / 3 if ventana >= 768 else ventana
+
+
+def elegir(srcset, necesario):
+    candidatos = sorted(
+        (int(descriptor[:-1]), url)
+        for url, descriptor in (parte.split() for parte in srcset.split(', '))
+    )
+    for ancho, url in candidatos:
+        if ancho >= necesario:
+            return url
+    return candidatos[-1][1]
+
+
+def cargar_productos(cantidad):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from carrito.models import Producto
+
+    fotos = sorted((RAIZ / 'media' / 'productos').iterdir())
+    for i in range(cantidad):
+        foto = fotos[i % len(fotos)]
+        Producto.objects.create(
+            nombre=f'Producto {i}', descripcion='Benchmark', precio=Decimal('9.99'), inventario=5,
+            imagen=SimpleUploadedFile(f'{i}-{foto.name}', foto.read_bytes())
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--productos', type=int, default=24)
+    args = parser.parse_args()
+
+    media = Path(tempfile.mkdtemp(prefix='tienda-media-'))
+    preparar_django(
+        MEDIA_ROOT=media, IMAGENES_VARIANTES_ROOT=media / 'variantes', ALLOWED_HOSTS=['*'],
+        IMAGENES_PERFILES_AL_SUBIR=('miniatura', 'tarjeta'),
+    )
+
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from carrito import imagenes
+    from carrito.models import Producto
+
+    cargar_productos(args.productos)
+    cliente = Client()
+    cliente.force_login(User.objects.create_user('bench', password='bench'))
+    html = cliente.get('/').content.decode()
+
+    def tamano(url):
+        respuesta = cliente.get(url)
+        return sum(len(parte) for parte in respuesta.streaming_content)
+
+    originales = sum(p.imagen.size for p in Producto.objects.all()[:24])
+    filas = [{'escenario': 'original (antes)', 'kb': originales / 1024, 'ahorro': '-'}]
+    for nombre, ventana, densidad, aceptados in ESCENARIOS:
+        necesario = ancho_tarjeta(ventana) * densidad
+        total = 0
+        for picture in _PICTURE.findall(html):
+            fuentes = dict(_SOURCE.findall(picture))
+            srcset = next((fuentes[tipo] for tipo in aceptados if tipo in fuentes), None)
+            total += tamano(elegir(srcset or _IMG_SRCSET.search(picture).group(1), necesario))
+        filas.append({
+            'escenario': nombre, 'kb': total / 1024, 'ahorro': f'{100 * (1 - total / originales):.0f}%',
+        })
+    imprimir_tabla(filas, ['escenario', 'kb', 'ahorro'])
+
+    # Primera petición (genera la variante) contra las siguientes (archivo en disco)
+    producto = Producto.objects.first()
+    primeras, siguientes = [], []
+    for formato in imagenes.formatos():
+        shutil.rmtree(imagenes.directorio_variantes(), ignore_errors=True)
+        url = imagenes.url_variante(producto.imagen_huella, 1200, formato)
+        resultado = {}
+        with cronometro(resultado):
+            tamano(url)
+        primeras.append({'formato': formato, 'ms': resultado['segundos'] * 1000})
+        for _ in range(20):
+            with cronometro(resultado):
+                tamano(url)
+            siguientes.append(resultado['segundos'] * 1000)
+    print()
+    imprimir_tabla(primeras, ['formato', 'ms'])
+    print(f'variante ya en disco: mediana {statistics.median(siguientes):.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
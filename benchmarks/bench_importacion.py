@@ -0,0 +1,90 @@
+"""
+Importación de productos: un create() por fila contra importar_productos.
+
+Genera un CSV sintético por cada tamaño, lo importa dos veces (la primera
+crea todo, la segunda actualiza todo vía upsert) y muestra filas por
+segundo y el pico de memoria del proceso, que no debería crecer con el
+tamaño del archivo. El flujo anterior (Producto.objects.create fila a
+fila) se mide solo sobre las primeras filas, porque no escala.
+
+    python benchmarks/bench_importacion.py [--filas 100000 1000000] [--legado 5000]
+"""
+import argparse
+import csv
+import random
+import resource
+from pathlib import Path
+
+from _entorno import cronometro, imprimir_tabla, preparar_django
+
+
+def generar_csv(ruta, filas, prefijo):
+    azar = random.Random(filas)
+    with open(ruta, 'w', newline='') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(['sku', 'nombre', 'descripcion', 'precio', 'inventario'])
+        for i in range(filas):
+            escritor.writerow([
+                f'{prefijo}-{i:08d}', f'Producto {i}', 'Importado desde el benchmark',
+                f'{azar.uniform(1, 500):.2f}', azar.randint(0, 100)
+            ])
+
+
+def pico_memoria_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def importar_legado(ruta, limite):
+    """Reproduce carrito/commands/crear_productos.py: un create() por fila"""
+    from carrito.models import Producto
+
+    with open(ruta, newline='') as archivo:
+        for numero, fila in enumerate(csv.DictReader(archivo)):
+            if numero >= limite:
+                break
+            fila['sku'] = f"LEGADO-{fila['sku']}"
+            Producto.objects.create(**fila)
+    return limite
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--filas', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--legado', type=int, default=5000)
+    args = parser.parse_args()
+
+    directorio = preparar_django()
+
+    from carrito.importacion import importar_productos, leer_filas
+
+    filas = []
+    for tamano in sorted(args.filas):
+        ruta = Path(directorio) / f'productos-{tamano}.csv'
+        generar_csv(ruta, tamano, prefijo=f'T{tamano}')
+
+        for pasada in ('alta', 'upsert'):
+            with open(ruta, newline='') as archivo:
+                resultado = importar_productos(leer_filas(archivo, 'csv'))
+            filas.append({
+                'estrategia': f'importar ({pasada})',
+                'filas': tamano,
+                'filas_s': resultado.filas_por_segundo,
+                'segundos': resultado.segundos,
+                'pico_mb': pico_memoria_mb(),
+            })
+
+        medicion = {}
+        with cronometro(medicion):
+            importadas = importar_legado(ruta, min(args.legado, tamano))
+        filas.append({
+            'estrategia': 'create por fila',
+            'filas': importadas,
+            'filas_s': importadas / medicion['segundos'],
+            'segundos': medicion['segundos'],
+            'pico_mb': pico_memoria_mb(),
+        })
+    imprimir_tabla(filas, ['estrategia', 'filas', 'filas_s', 'segundos', 'pico_mb'])
+
+
+if __name__ == '__main__':
+    main()
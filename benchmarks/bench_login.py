@@ -0,0 +1,92 @@
+"""
+Logins por segundo en un núcleo según el hasher y el camino de la vista.
+
+Cada escenario valida LoginForm (que ya autentica) como login_view:
+
+- antes:  PBKDF2 de Django y después authenticate() otra vez (dos hashes
+          por login, lo que hacían login_view y registro);
+- pbkdf2, scrypt, argon2: form.get_user(), un hash por login, con los
+          parámetros de settings.HASHERS_PARAMETROS (argon2 solo si
+          argon2-cffi está instalado).
+
+Corre en un solo hilo, así que el número es por núcleo. Al final muestra
+el rehash transparente: un usuario con hash PBKDF2 inicia sesión y queda
+con el hasher preferido.
+
+    python benchmarks/bench_login.py
+"""
+import argparse
+
+from _entorno import cronometro, imprimir_tabla, preparar_django
+
+CLAVE = 'clave-segura-123'
+HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'carrito.hashers.ScryptAjustado',
+    'argon2': 'carrito.hashers.Argon2Ajustado',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--logins', type=int, default=30)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.conf import settings
+    from django.contrib.auth import authenticate
+    from django.contrib.auth.hashers import get_hashers, get_hashers_by_algorithm
+    from django.contrib.auth.models import User
+    from carrito.forms import LoginForm
+
+    def usar(hasher):
+        # _entorno deja MD5 para el resto de los benchmarks
+        settings.PASSWORD_HASHERS = [HASHERS[hasher]] + [
+            ruta for nombre, ruta in HASHERS.items() if nombre != hasher
+        ]
+        get_hashers.cache_clear()
+        get_hashers_by_algorithm.cache_clear()
+
+    def medir(escenario, hasher, dos_hashes):
+        usar(hasher)
+        try:
+            get_hashers()[0].encode('x', get_hashers()[0].salt())
+        except ValueError:
+            return None  # biblioteca no instalada
+        usuario = User.objects.create_user(f'bench-{escenario}', password=CLAVE)
+        datos = {'username': usuario.username, 'password': CLAVE}
+        resultado = {}
+        with cronometro(resultado):
+            for _ in range(args.logins):
+                form = LoginForm(None, data=datos)
+                assert form.is_valid()
+                if dos_hashes:
+                    usuario = authenticate(username=datos['username'], password=CLAVE)
+                else:
+                    usuario = form.get_user()
+        return {
+            'escenario': escenario,
+            'hasher': usuario.password.split('$', 1)[0],
+            'ms_por_login': resultado['segundos'] * 1000 / args.logins,
+            'logins_por_s': args.logins / resultado['segundos'],
+        }
+
+    filas = [
+        medir('antes', 'pbkdf2', True),
+        medir('pbkdf2', 'pbkdf2', False),
+        medir('scrypt', 'scrypt', False),
+        medir('argon2', 'argon2', False),
+    ]
+    imprimir_tabla([fila for fila in filas if fila], ['escenario', 'hasher', 'ms_por_login', 'logins_por_s'])
+
+    usar('pbkdf2')
+    User.objects.create_user('bench-rehash', password=CLAVE)
+    usar('scrypt')
+    antes = User.objects.get(username='bench-rehash').password.split('$', 1)[0]
+    LoginForm(None, data={'username': 'bench-rehash', 'password': CLAVE}).is_valid()
+    despues = User.objects.get(username='bench-rehash').password.split('$', 1)[0]
+    print(f'\nRehash al iniciar sesión: {antes} -> {despues}')
+
+
+if __name__ == '__main__':
+    main()
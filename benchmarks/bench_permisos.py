@@ -0,0 +1,73 @@
+"""
+Segundos y consultas para dar todos los permisos a muchos usuarios a la vez.
+
+Compara lo que hacía la acción "Asignar todos los permisos" del admin
+(user_permissions.set(Permission.objects.all()) usuario por usuario) con
+agregar_en_lote sobre la tabla intermedia, la misma operación repetida
+(el diff no encuentra nada que insertar), fijar_en_lote con la mitad de
+los permisos (un DELETE) y la asignación por grupo, que guarda una fila
+por usuario en lugar de una por usuario y permiso.
+
+    python benchmarks/bench_permisos.py --usuarios 10000
+"""
+import argparse
+
+from _entorno import cronometro, imprimir_tabla, preparar_django
+
+
+def medir(nombre, operacion):
+    from django.contrib.auth.models import User
+    from django.db import connection
+
+    consultas = []
+    resultado = {}
+    with connection.execute_wrapper(lambda execute, *args: consultas.append(1) or execute(*args)):
+        with cronometro(resultado):
+            operacion()
+    return {
+        'escenario': nombre,
+        'segundos': resultado['segundos'],
+        'consultas': len(consultas),
+        'filas_permisos': User.user_permissions.through.objects.count(),
+        'filas_grupos': User.groups.through.objects.count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--usuarios', type=int, default=10000)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.contrib.auth.models import Group, Permission, User
+    from carrito.permisos import GRUPO_TOTAL, agregar_en_lote, fijar_en_lote, quitar_en_lote
+
+    User.objects.bulk_create(
+        (User(username=f'bench{i}') for i in range(args.usuarios)), batch_size=1000
+    )
+    usuarios = User.objects.all()
+    permisos = Permission.objects.all()
+    print(f'{args.usuarios} usuarios, {permisos.count()} permisos\n')
+
+    def uno_por_uno():
+        for usuario in usuarios:
+            usuario.user_permissions.set(Permission.objects.all())
+
+    filas = [
+        medir('set() por usuario (antes)', uno_por_uno),
+        medir('quitar_en_lote (todos)', lambda: quitar_en_lote(User.user_permissions, usuarios)),
+        medir('agregar_en_lote', lambda: agregar_en_lote(User.user_permissions, usuarios, permisos)),
+        medir('agregar_en_lote repetido', lambda: agregar_en_lote(User.user_permissions, usuarios, permisos)),
+        medir('fijar_en_lote (mitad)', lambda: fijar_en_lote(
+            User.user_permissions, usuarios, permisos.order_by('pk')[:permisos.count() // 2]
+        )),
+        medir('quitar_en_lote (todos)', lambda: quitar_en_lote(User.user_permissions, usuarios)),
+        medir('grupo Administradores Totales', lambda: agregar_en_lote(
+            User.groups, usuarios, [Group.objects.get(name=GRUPO_TOTAL)]
+        )),
+    ]
+    imprimir_tabla(filas, ['escenario', 'segundos', 'consultas', 'filas_permisos', 'filas_grupos'])
+
+
+if __name__ == '__main__':
+    main()
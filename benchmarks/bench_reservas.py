@@ -0,0 +1,106 @@
+"""
+Estrés concurrente de reservas de stock sobre un único producto "caliente".
+
+Compara la lectura-modificación-escritura histórica (get + save) con el
+UPDATE condicional de carrito.inventario.reservar_stock. Cada hilo intenta
+llevarse unidades de a una hasta que se agotan; al final se compara lo
+vendido con el stock inicial para detectar sobreventa.
+
+    python benchmarks/bench_reservas.py [--stock 500] [--hilos 8 32]
+"""
+import argparse
+import threading
+from decimal import Decimal
+
+from _entorno import cronometro, imprimir_tabla, preparar_django
+
+
+def reserva_legada(producto_id):
+    """Reproduce el Producto.disminuir_inventario anterior (get + save)"""
+    from carrito.models import Producto
+
+    producto = Producto.objects.get(pk=producto_id)
+    if producto.inventario < 1:
+        return False
+    producto.inventario -= 1
+    producto.save()
+    return True
+
+
+def reserva_condicional(producto_id):
+    from carrito.inventario import reservar_stock
+
+    return reservar_stock(producto_id, 1)
+
+
+def correr(estrategia, stock, hilos):
+    from django.db import OperationalError, connection
+    from carrito.models import Producto
+
+    producto = Producto.objects.create(
+        nombre='Producto caliente',
+        descripcion='Benchmark',
+        precio=Decimal('10.00'),
+        inventario=stock
+    )
+    vendidos = [0] * hilos
+    bloqueos = [0] * hilos
+    salida = threading.Barrier(hilos)
+
+    def trabajador(indice):
+        salida.wait()
+        try:
+            while True:
+                try:
+                    if not estrategia(producto.pk):
+                        break
+                    vendidos[indice] += 1
+                except OperationalError:
+                    # "database is locked": se reintenta igual que haría el usuario
+                    bloqueos[indice] += 1
+        finally:
+            connection.close()
+
+    resultado = {}
+    with cronometro(resultado):
+        trabajadores = [threading.Thread(target=trabajador, args=(i,)) for i in range(hilos)]
+        for t in trabajadores:
+            t.start()
+        for t in trabajadores:
+            t.join()
+
+    producto.refresh_from_db()
+    total = sum(vendidos)
+    return {
+        'estrategia': estrategia.__name__,
+        'hilos': hilos,
+        'vendidos': total,
+        'sobreventa': total - stock,
+        'stock_final': producto.inventario,
+        'bloqueos': sum(bloqueos),
+        'reservas/s': total / resultado['segundos'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--stock', type=int, default=500)
+    parser.add_argument('--hilos', type=int, nargs='+', default=[8, 32])
+    args = parser.parse_args()
+
+    preparar_django()
+
+    filas = []
+    for hilos in args.hilos:
+        for estrategia in (reserva_legada, reserva_condicional):
+            filas.append(correr(estrategia, args.stock, hilos))
+
+    imprimir_tabla(filas, ['estrategia', 'hilos', 'vendidos', 'sobreventa',
+                           'stock_final', 'bloqueos', 'reservas/s'])
+
+    if any(f['sobreventa'] for f in filas if f['estrategia'] == 'reserva_condicional'):
+        raise SystemExit('La reserva condicional vendió más stock del disponible')
+
+
+if __name__ == '__main__':
+    main()
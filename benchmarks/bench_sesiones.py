@@ -0,0 +1,129 @@
+"""
+Escrituras en la base por cada 1000 páginas vistas con sesión iniciada.
+
+Un usuario autenticado recorre catálogo, detalle y carrito durante
+`--dias` días (el reloj de carrito.sesiones se adelanta de forma pareja
+entre visita y visita) con cada combinación de motor y middleware:
+
+- antes:     motor db + SessionMiddleware + SESSION_SAVE_EVERY_REQUEST;
+- db:        motor db + SesionMiddleware (renovación por umbral);
+- cached_db: el motor por defecto, lecturas desde la caché;
+- cookie:    signed_cookies, la sesión viaja en la cookie.
+
+Se cuentan las sentencias contra django_session (lecturas y escrituras),
+el total de escrituras de cualquier tabla y las respuestas que reenviaron
+la cookie de sesión.
+
+    python benchmarks/bench_sesiones.py
+"""
+import argparse
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from _entorno import cronometro, imprimir_tabla, preparar_django
+
+SESIONES = 'django.contrib.sessions.middleware.SessionMiddleware'
+DESLIZANTE = 'carrito.sesiones.SesionMiddleware'
+ESCENARIOS = [
+    ('antes', 'django.contrib.sessions.backends.db', SESIONES, True),
+    ('db', 'django.contrib.sessions.backends.db', DESLIZANTE, False),
+    ('cached_db', 'django.contrib.sessions.backends.cached_db', DESLIZANTE, False),
+    ('cookie', 'django.contrib.sessions.backends.signed_cookies', DESLIZANTE, False),
+]
+
+
+class Contador:
+    """execute_wrapper que clasifica cada sentencia"""
+
+    def __init__(self):
+        self.lecturas_sesion = self.escrituras_sesion = self.escrituras = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        escritura = sql.lstrip().split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE')
+        self.escrituras += escritura
+        if 'django_session' in sql:
+            if escritura:
+                self.escrituras_sesion += 1
+            else:
+                self.lecturas_sesion += 1
+        return execute(sql, params, many, context)
+
+
+def preparar_datos():
+    from django.contrib.auth.models import User
+    from carrito.models import Carrito, Producto
+
+    Producto.objects.bulk_create(
+        Producto(nombre=f'Producto {i}', descripcion='Benchmark', precio=Decimal('9.99'), inventario=100)
+        for i in range(50)
+    )
+    usuario = User.objects.create_user('bench', password='bench')
+    carrito = Carrito.objects.create(usuario=usuario)
+    for producto in Producto.objects.all()[:3]:
+        carrito.agregar_producto(producto, 1)
+    detalle = f'/producto/{Producto.objects.order_by("pk").first().pk}/'
+    return usuario, ['/', detalle, '/carrito/']
+
+
+def medir(nombre, motor, middleware, guardar_siempre, usuario, rutas, vistas, dias):
+    from django.conf import settings
+    from django.db import connection
+    from django.test import Client
+
+    settings.SESSION_ENGINE = motor
+    settings.SESSION_SAVE_EVERY_REQUEST = guardar_siempre
+    settings.MIDDLEWARE = [
+        middleware if clase in (SESIONES, DESLIZANTE) else clase for clase in settings.MIDDLEWARE
+    ]
+    # Un cliente nuevo carga los middlewares con los ajustes del escenario
+    cliente = Client()
+    cliente.force_login(usuario)
+
+    # El login selló la sesión con la hora real: de ahí en adelante manda el reloj falso
+    inicio = time.time()
+    paso = dias * 24 * 60 * 60 / vistas
+    reloj = SimpleNamespace(time=lambda: inicio + paso * i)
+    contador = Contador()
+    reenviadas = 0
+    resultado = {}
+    with mock.patch('carrito.sesiones.time', reloj), connection.execute_wrapper(contador), \
+            cronometro(resultado):
+        for i in range(vistas):
+            respuesta = cliente.get(rutas[i % len(rutas)])
+            assert respuesta.status_code == 200, respuesta.status_code
+            reenviadas += settings.SESSION_COOKIE_NAME in respuesta.cookies
+
+    por_mil = 1000 / vistas
+    return {
+        'escenario': nombre,
+        'lecturas_sesion': contador.lecturas_sesion * por_mil,
+        'escrituras_sesion': contador.escrituras_sesion * por_mil,
+        'escrituras_totales': contador.escrituras * por_mil,
+        'cookies_reenviadas': reenviadas * por_mil,
+        'ms_por_vista': resultado['segundos'] * 1000 / vistas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--vistas', type=int, default=3000)
+    parser.add_argument('--dias', type=int, default=7)
+    args = parser.parse_args()
+
+    preparar_django(ALLOWED_HOSTS=['*'])
+    usuario, rutas = preparar_datos()
+
+    filas = [
+        medir(*escenario, usuario, rutas, args.vistas, args.dias) for escenario in ESCENARIOS
+    ]
+    print(f'Por cada 1000 páginas vistas, {args.vistas} vistas repartidas en {args.dias} días\n')
+    imprimir_tabla(filas, [
+        'escenario', 'lecturas_sesion', 'escrituras_sesion', 'escrituras_totales',
+        'cookies_reenviadas', 'ms_por_vista',
+    ])
+
+
+if __name__ == '__main__':
+    main()
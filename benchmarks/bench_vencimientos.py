@@ -0,0 +1,99 @@
+"""
+Segundos y consultas para devolver al inventario las reservas de carritos abandonados.
+
+Llena muchos carritos con reservas ya vencidas y las libera de dos formas:
+
+- por línea:  Carrito.remover_producto en cada línea vencida (SELECT FOR
+              UPDATE, DELETE, UPDATE del producto y UPDATE del carrito por
+              cada una), lo único que había antes;
+- en lotes:   liberar_reservas_vencidas, que hace cuatro sentencias por lote
+              sin importar cuántas líneas ni productos traiga.
+
+Al final se comprueba que el inventario vuelve al stock inicial.
+
+    python benchmarks/bench_vencimientos.py --carritos 2000 --lineas 5
+"""
+import argparse
+import datetime
+from decimal import Decimal
+
+from _entorno import cronometro, imprimir_tabla, preparar_django
+
+STOCK = 1_000_000
+
+
+def llenar(carritos, lineas, productos):
+    """Crea los carritos con sus reservas y las deja vencidas"""
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from carrito.models import Carrito, ItemCarrito, Producto
+
+    User.objects.all().delete()
+    usuarios = User.objects.bulk_create(User(username=f'abandono{i}') for i in range(carritos))
+    for i, usuario in enumerate(usuarios):
+        carrito = Carrito.objects.create(usuario=usuario)
+        for j in range(lineas):
+            carrito.agregar_producto(productos[(i + j) % len(productos)], 1)
+    ItemCarrito.objects.update(reserva_vence=timezone.now() - datetime.timedelta(seconds=1))
+    return Producto.objects.filter(pk__in=[p.pk for p in productos])
+
+
+def por_linea():
+    from django.utils import timezone
+    from carrito.models import ItemCarrito
+
+    liberadas = 0
+    vencidas = ItemCarrito.objects.filter(reserva_vence__lt=timezone.now()).select_related('carrito', 'producto')
+    for item in vencidas:
+        liberadas += item.cantidad_reservada
+        item.carrito.remover_producto(item.producto)
+    return liberadas
+
+
+def en_lotes(tamano_lote):
+    from carrito.reservas import liberar_reservas_vencidas
+
+    return liberar_reservas_vencidas(tamano_lote=tamano_lote).unidades
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--carritos', type=int, default=2000)
+    parser.add_argument('--lineas', type=int, default=5)
+    parser.add_argument('--productos', type=int, default=200)
+    parser.add_argument('--lote', type=int, default=1000)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.db import connection
+    from carrito.models import Producto
+    from carrito.movimientos import agrupar_movimientos
+
+    productos = Producto.objects.bulk_create(
+        Producto(nombre=f'Producto {i}', descripcion='Bench', precio=Decimal('9.99'), inventario=STOCK)
+        for i in range(args.productos)
+    )
+    print(f'{args.carritos} carritos x {args.lineas} líneas vencidas sobre {args.productos} productos\n')
+
+    filas = []
+    for escenario, liberar in [('por línea', por_linea), ('en lotes', lambda: en_lotes(args.lote))]:
+        with agrupar_movimientos():
+            inventario = llenar(args.carritos, args.lineas, productos)
+        consultas = []
+        resultado = {}
+        with connection.execute_wrapper(lambda execute, *a: consultas.append(1) or execute(*a)):
+            with cronometro(resultado), agrupar_movimientos():
+                unidades = liberar()
+        filas.append({
+            'escenario': escenario,
+            'segundos': resultado['segundos'],
+            'consultas': len(consultas),
+            'unidades': unidades,
+            'unidades_por_s': unidades / resultado['segundos'],
+            'stock_ok': all(p.inventario == STOCK for p in inventario),
+        })
+    imprimir_tabla(filas, ['escenario', 'segundos', 'consultas', 'unidades', 'unidades_por_s', 'stock_ok'])
+
+
+if __name__ == '__main__':
+    main()
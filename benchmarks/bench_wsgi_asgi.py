@@ -0,0 +1,157 @@
+"""
+Pedidos por segundo y latencia p99 de las páginas de lectura, WSGI contra ASGI.
+
+Cada modo corre en un proceso aparte con su propia base temporal:
+
+- wsgi:       tienda.wsgi con las vistas sync, atendida por un pool de
+              hilos (como gunicorn --threads o mod_wsgi);
+- asgi-sync:  tienda.asgi con las vistas sync (cada request salta al
+              hilo único de sync_to_async);
+- asgi-async: tienda.asgi con alista_productos, adetalle_producto y
+              aver_carrito (TIENDA_VISTAS_ASYNC=1).
+
+La carga es de `--concurrencia` clientes pidiendo sin pausa, hilos en
+WSGI y tareas en el mismo loop en ASGI; no hay red de por medio, así que
+los números miden el costo de Django y no el del servidor.
+
+    python benchmarks/bench_wsgi_asgi.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from _entorno import imprimir_tabla, pedir_asgi, pedir_wsgi, preparar_django
+
+MODOS = ('wsgi', 'asgi-sync', 'asgi-async')
+
+
+def preparar_datos(productos):
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from carrito.models import Carrito, Producto
+
+    Producto.objects.bulk_create(
+        Producto(nombre=f'Producto {i}', descripcion='Benchmark', precio=Decimal('9.99'), inventario=100)
+        for i in range(productos)
+    )
+    usuario = User.objects.create_user('bench', password='bench')
+    carrito = Carrito.objects.create(usuario=usuario)
+    for producto in Producto.objects.all()[:5]:
+        carrito.agregar_producto(producto, 2)
+
+    cliente = Client()
+    cliente.force_login(usuario)
+    sesion = {'HTTP_COOKIE': f'sessionid={cliente.cookies["sessionid"].value}'}
+    detalle = f'/producto/{Producto.objects.order_by("pk").first().pk}/'
+    return [
+        ('catálogo anónimo', '/', {}),
+        ('catálogo', '/', sesion),
+        ('detalle', detalle, sesion),
+        ('carrito', '/carrito/', sesion),
+    ]
+
+
+def resumir(latencias, segundos, errores):
+    return {
+        'pedidos_por_s': len(latencias) / segundos,
+        'p50_ms': statistics.median(latencias) * 1000,
+        'p99_ms': statistics.quantiles(latencias, n=100)[98] * 1000,
+        'errores': errores,
+    }
+
+
+def cargar_wsgi(aplicacion, ruta, encabezados, pedidos, concurrencia):
+    def cliente(cantidad):
+        latencias, errores = [], 0
+        for _ in range(cantidad):
+            inicio = time.perf_counter()
+            estado, _ = pedir_wsgi(aplicacion, ruta, encabezados)
+            latencias.append(time.perf_counter() - inicio)
+            errores += estado != '200'
+        return latencias, errores
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concurrencia) as pool:
+        resultados = list(pool.map(cliente, [pedidos // concurrencia] * concurrencia))
+    segundos = time.perf_counter() - inicio
+    return resumir(
+        [lat for latencias, _ in resultados for lat in latencias], segundos,
+        sum(errores for _, errores in resultados),
+    )
+
+
+def cargar_asgi(aplicacion, ruta, encabezados, pedidos, concurrencia):
+    async def cliente(cantidad):
+        latencias, errores = [], 0
+        for _ in range(cantidad):
+            inicio = time.perf_counter()
+            estado, _ = await pedir_asgi(aplicacion, ruta, encabezados)
+            latencias.append(time.perf_counter() - inicio)
+            errores += estado != '200'
+        return latencias, errores
+
+    async def todos():
+        return await asyncio.gather(*(cliente(pedidos // concurrencia) for _ in range(concurrencia)))
+
+    inicio = time.perf_counter()
+    resultados = asyncio.run(todos())
+    segundos = time.perf_counter() - inicio
+    return resumir(
+        [lat for latencias, _ in resultados for lat in latencias], segundos,
+        sum(errores for _, errores in resultados),
+    )
+
+
+def correr_modo(modo, args):
+    """Corre dentro del proceso hijo e imprime una línea JSON por página"""
+    os.environ['TIENDA_VISTAS_ASYNC'] = '1' if modo == 'asgi-async' else '0'
+    preparar_django(DEBUG=False, ALLOWED_HOSTS=['*'])
+    paginas = preparar_datos(args.productos)
+
+    if modo == 'wsgi':
+        from django.core.wsgi import get_wsgi_application
+        aplicacion, cargar = get_wsgi_application(), cargar_wsgi
+    else:
+        from django.core.asgi import get_asgi_application
+        aplicacion, cargar = get_asgi_application(), cargar_asgi
+
+    for pagina, ruta, encabezados in paginas:
+        # Calienta la caché del catálogo y las plantillas
+        cargar(aplicacion, ruta, encabezados, args.concurrencia, args.concurrencia)
+        resultado = cargar(aplicacion, ruta, encabezados, args.pedidos, args.concurrencia)
+        print(json.dumps({'modo': modo, 'pagina': pagina, **resultado}), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pedidos', type=int, default=2000)
+    parser.add_argument('--concurrencia', type=int, default=16)
+    parser.add_argument('--productos', type=int, default=200)
+    parser.add_argument('--modo', choices=MODOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        correr_modo(args.modo, args)
+        return
+
+    filas = []
+    for modo in MODOS:
+        salida = subprocess.run(
+            [sys.executable, __file__, '--modo', modo, '--pedidos', str(args.pedidos),
+             '--concurrencia', str(args.concurrencia), '--productos', str(args.productos)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        filas.extend(json.loads(linea) for linea in salida.splitlines() if linea.startswith('{'))
+    filas.sort(key=lambda fila: (fila['pagina'], MODOS.index(fila['modo'])))
+    imprimir_tabla(filas, ['pagina', 'modo', 'pedidos_por_s', 'p50_ms', 'p99_ms', 'errores'])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,21 @@
 from django.contrib import admin
-from django.contrib.auth.models import Group, User, Permission
+from django.contrib.auth.models import Group, User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Producto, Carrito, ItemCarrito
+from django.contrib.admin import helpers
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.contenttypes.models import ContentType
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from .models import (
+    Producto, Carrito, ItemCarrito, Pedido, LineaPedido, InventarioMovimiento, ResumenInventarioDiario
+)
 from django.utils.html import format_html
+from .forms import AjusteInventarioForm, AsignarGrupoForm, CambioPrecioForm
+from .inventario import MODOS_AJUSTE, ajustar_stock_en_lote
+from .estadisticas import UMBRAL_BAJO_STOCK
+from .permisos import GRUPO_TOTAL, agregar_en_lote, asegurar_grupos, quitar_en_lote
+from .precios import cambiar_precios_en_lote
+from .imagenes import fuentes
 
 # Configuración del sitio admin
 admin.site.site_header = "Administración de ElectroStore"
@@ -13,17 +26,33 @@ admin.site.index_title = "Bienvenido al sistema de administración"
 admin.site.unregister(Group)
 admin.site.unregister(User)
 
-class ProductoAdmin(admin.ModelAdmin):
+class AccionEnLoteMixin:
+    """Página intermedia para las acciones en bloque que piden datos"""
+
+    def _pedir_datos(self, request, queryset, form, titulo):
+        """Muestra el formulario de la acción; reenvía la selección al confirmar"""
+        return TemplateResponse(request, 'admin/carrito/accion_en_lote.html', {
+            **self.admin_site.each_context(request),
+            'title': titulo,
+            'opts': self.model._meta,
+            'form': form,
+            'accion': request.POST.get('action'),
+            'seleccionados': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'total': queryset.count(),
+        })
+
+class ProductoAdmin(AccionEnLoteMixin, admin.ModelAdmin):
     list_display = ('nombre', 'precio_formateado', 'inventario', 'estado_stock', 'imagen_previa', 'fechas_creacion')
     list_filter = ('creado', 'actualizado', 'inventario')
-    search_fields = ('nombre', 'descripcion')
+    search_fields = ('sku', 'nombre', 'descripcion')
     readonly_fields = ('creado', 'actualizado', 'creado_por', 'imagen_previa_admin')
     list_editable = ('inventario',)
-    actions = ['aumentar_inventario']
+    actions = ['ajustar_inventario', 'cambiar_precios']
     
     fieldsets = (
         ('Información Básica', {
-            'fields': ('nombre', 'descripcion')
+            'fields': ('sku', 'nombre', 'descripcion')
         }),
         ('Precio y Stock', {
             'fields': ('precio', 'inventario')
@@ -46,14 +75,18 @@ class ProductoAdmin(admin.ModelAdmin):
     def estado_stock(self, obj):
         if obj.inventario == 0:
             return format_html('<span style="color:red;">⛔ Agotado</span>')
-        elif obj.inventario < 5:
+        elif obj.inventario < UMBRAL_BAJO_STOCK:
             return format_html('<span style="color:orange;">⚠️ Bajo stock</span>')
         return format_html('<span style="color:green;">✓ Disponible</span>')
     estado_stock.short_description = 'Estado'
 
     def imagen_previa(self, obj):
-        if obj.imagen:
-            return format_html('<img src="{}" style="max-height: 50px;"/>', obj.imagen.url)
+        imagen = fuentes(obj, 'miniatura')
+        if imagen:
+            return format_html(
+                '<img src="{}" srcset="{}" sizes="{}" style="max-height: 50px;" loading="lazy"/>',
+                imagen['src'], imagen['srcset'], imagen['sizes']
+            )
         return "Sin imagen"
     imagen_previa.short_description = 'Vista Previa'
 
@@ -69,19 +102,54 @@ class ProductoAdmin(admin.ModelAdmin):
         )
     fechas_creacion.short_description = 'Fechas'
 
-    def aumentar_inventario(self, request, queryset):
-        cantidad = 10  # Puedes hacer esto configurable
-        for producto in queryset:
-            producto.aumentar_inventario(cantidad)
-        self.message_user(request, f"Inventario aumentado en {cantidad} unidades para {queryset.count()} productos")
-    aumentar_inventario.short_description = "Aumentar inventario (+10)"
+    def _registrar_historial(self, request, pks, mensaje):
+        """Deja en el historial del admin una entrada por producto, con un bulk_create"""
+        nombres = Producto.objects.filter(pk__in=pks).values_list('pk', 'nombre')
+        tipo = ContentType.objects.get_for_model(Producto)
+        ahora = timezone.now()
+        LogEntry.objects.bulk_create([
+            LogEntry(
+                action_time=ahora,
+                user_id=request.user.pk,
+                content_type=tipo,
+                object_id=str(pk),
+                object_repr=nombre[:200],
+                action_flag=CHANGE,
+                change_message=mensaje
+            )
+            for pk, nombre in nombres
+        ], batch_size=500)
+
+    @admin.action(description="Ajustar inventario de los seleccionados", permissions=['change'])
+    def ajustar_inventario(self, request, queryset):
+        form = AjusteInventarioForm(request.POST if 'aplicar' in request.POST else None)
+        if not form.is_valid():
+            return self._pedir_datos(request, queryset, form, "Ajustar inventario")
 
-    def save_model(self, request, obj, form, change):
-    # Solo asignar permisos si es una creación nueva
-        if not change and obj.username == 'carlos':
-            obj.is_staff = True
-            obj.is_superuser = True
-            super().save_model(request, obj, form, change)
+        modo, cantidad = form.cleaned_data['modo'], form.cleaned_data['cantidad']
+        deltas = ajustar_stock_en_lote(queryset, modo, cantidad)
+        descripcion = f"{dict(MODOS_AJUSTE)[modo]} {cantidad} unidades"
+        self._registrar_historial(request, deltas, f"Inventario: {descripcion.lower()}")
+        self.message_user(request, f"{descripcion}: {len(deltas)} productos modificados")
+
+    @admin.action(description="Cambiar precio de los seleccionados (%%)", permissions=['change'])
+    def cambiar_precios(self, request, queryset):
+        form = CambioPrecioForm(request.POST if 'aplicar' in request.POST else None)
+        if not form.is_valid():
+            return self._pedir_datos(request, queryset, form, "Cambiar precios")
+
+        porcentaje = form.cleaned_data['porcentaje']
+        pks = cambiar_precios_en_lote(queryset, porcentaje)
+        self._registrar_historial(request, pks, f"Precio: {porcentaje:+}%")
+        self.message_user(request, f"Precio cambiado en {porcentaje:+}% para {len(pks)} productos")
+
+    def delete_queryset(self, request, queryset):
+        # El borrado en bloque no pasa por Producto.delete()
+        carritos = list(
+            Carrito.objects.filter(items__producto__in=queryset).values_list('pk', flat=True)
+        )
+        super().delete_queryset(request, queryset)
+        Carrito.reconciliar_totales(Carrito.objects.filter(pk__in=carritos))
 
 class ItemCarritoInline(admin.TabularInline):
     model = ItemCarrito
@@ -94,9 +162,15 @@ class ItemCarritoInline(admin.TabularInline):
 
 class CarritoAdmin(admin.ModelAdmin):
     list_display = ('usuario', 'total_formateado', 'cantidad_items', 'fechas')
+    list_select_related = ('usuario',)
     inlines = [ItemCarritoInline]
     readonly_fields = ('creado', 'actualizado', 'total_formateado')
 
+    def save_related(self, request, form, formsets, change):
+        # Los ítems editados en línea no pasan por agregar_producto
+        super().save_related(request, form, formsets, change)
+        form.instance.recalcular_totales()
+
     def total_formateado(self, obj):
         return f"${obj.total():,.2f}"
     total_formateado.short_description = 'Total'
@@ -113,10 +187,66 @@ class CarritoAdmin(admin.ModelAdmin):
         )
     fechas.short_description = 'Fechas'
 
-class UserAdmin(BaseUserAdmin):
+class ItemCarritoAdmin(admin.ModelAdmin):
+    list_display = ('carrito', 'producto', 'cantidad', 'agregado', 'reserva_vence')
+    list_select_related = ('carrito__usuario', 'producto')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        obj.carrito.recalcular_totales()
+
+    def delete_model(self, request, obj):
+        carrito = obj.carrito
+        super().delete_model(request, obj)
+        carrito.recalcular_totales()
+
+    def delete_queryset(self, request, queryset):
+        carritos = list(queryset.values_list('carrito_id', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        Carrito.reconciliar_totales(Carrito.objects.filter(pk__in=carritos))
+
+class LineaPedidoInline(admin.TabularInline):
+    model = LineaPedido
+    extra = 0
+    can_delete = False
+    readonly_fields = ('producto', 'nombre_producto', 'precio_unitario', 'cantidad')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+class PedidoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'usuario', 'total', 'total_items', 'creado')
+    list_select_related = ('usuario',)
+    list_filter = ('creado',)
+    readonly_fields = ('usuario', 'total', 'total_items', 'creado')
+    inlines = [LineaPedidoInline]
+
+class SoloLecturaAdmin(admin.ModelAdmin):
+    """El libro de movimientos y sus consolidados no se editan a mano"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class InventarioMovimientoAdmin(SoloLecturaAdmin):
+    list_display = ('creado', 'producto', 'delta', 'motivo', 'usuario')
+    list_select_related = ('producto', 'usuario')
+    list_filter = ('motivo', 'creado')
+    date_hierarchy = 'creado'
+
+class ResumenInventarioDiarioAdmin(SoloLecturaAdmin):
+    list_display = ('fecha', 'movimientos', 'productos_modificados', 'unidades_entrada', 'unidades_salida', 'inventario_total')
+    date_hierarchy = 'fecha'
+
+class UserAdmin(AccionEnLoteMixin, BaseUserAdmin):
     list_display = ('username', 'email', 'is_active', 'is_staff', 'date_joined')
     list_filter = ('is_staff', 'is_superuser', 'is_active')
-    actions = ['activar_staff', 'asignar_permisos_completos']
+    actions = ['activar_staff', 'asignar_grupo', 'asignar_permisos_completos']
     
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
@@ -132,42 +262,44 @@ class UserAdmin(BaseUserAdmin):
         self.message_user(request, f"{queryset.count()} usuarios marcados como staff")
     activar_staff.short_description = "Convertir en administradores"
 
+    @admin.action(description="Agregar los seleccionados a un grupo", permissions=['change'])
+    def asignar_grupo(self, request, queryset):
+        form = AsignarGrupoForm(request.POST if 'aplicar' in request.POST else None)
+        if not form.is_valid():
+            return self._pedir_datos(request, queryset, form, "Agregar a un grupo")
+
+        grupo = form.cleaned_data['grupo']
+        agregados = agregar_en_lote(User.groups, queryset, [grupo])
+        mensaje = f"{agregados} usuarios agregados a {grupo.name}"
+        if form.cleaned_data['quitar_individuales']:
+            quitados = quitar_en_lote(User.user_permissions, queryset, grupo.permissions.all())
+            mensaje += f"; {quitados} permisos individuales quitados"
+        self.message_user(request, mensaje)
+
+    @admin.action(description="Dar todos los permisos (grupo Administradores Totales)", permissions=['change'])
     def asignar_permisos_completos(self, request, queryset):
-        for user in queryset:
-            user.user_permissions.set(Permission.objects.all())
-        self.message_user(request, f"Permisos completos asignados a {queryset.count()} usuarios")
-    asignar_permisos_completos.short_description = "Asignar todos los permisos"
+        # Una fila por usuario en lugar de copiarle cada permiso
+        grupo = Group.objects.filter(name=GRUPO_TOTAL).first()
+        if grupo is None:
+            # Base restaurada sin migrate o grupo borrado: se recrea con sus permisos
+            asegurar_grupos()
+            grupo = Group.objects.get(name=GRUPO_TOTAL)
+        agregados = agregar_en_lote(User.groups, queryset, [grupo])
+        self.message_user(request, f"{agregados} usuarios agregados a {grupo.name}")
 
     def save_model(self, request, obj, form, change):
-        """Auto-asignar permisos si es el usuario carlos"""
+        """carlos siempre es superusuario (y un superusuario ya tiene todos los permisos)"""
         if obj.username == 'carlos':
             obj.is_staff = True
             obj.is_superuser = True
-            obj.user_permissions.set(Permission.objects.all())
         super().save_model(request, obj, form, change)
 
-def setup_admin_group():
-    """Configuración inicial de grupos de permisos"""
-    try:
-        admin_group, created = Group.objects.get_or_create(name='Administradores Totales')
-        if created:
-            admin_group.permissions.set(Permission.objects.all())
-
-        product_group, created = Group.objects.get_or_create(name='Gestores de Productos')
-        if created:
-            product_perms = Permission.objects.filter(
-                content_type__model__in=['producto'],
-                codename__in=['add_producto', 'change_producto', 'delete_producto', 'view_producto']
-            )
-            product_group.permissions.set(product_perms)
-    except:
-        pass
-
 # Registrar modelos
 admin.site.register(Producto, ProductoAdmin)
 admin.site.register(Carrito, CarritoAdmin)
-admin.site.register(ItemCarrito)
+admin.site.register(ItemCarrito, ItemCarritoAdmin)
+admin.site.register(Pedido, PedidoAdmin)
+admin.site.register(InventarioMovimiento, InventarioMovimientoAdmin)
+admin.site.register(ResumenInventarioDiario, ResumenInventarioDiarioAdmin)
 admin.site.register(User, UserAdmin)
 
-# Configurar grupos al iniciar
-setup_admin_group()
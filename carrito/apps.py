@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CarritoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'carrito'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals  # noqa: F401  (registra los receptores)
+
+        # carrito es la última app: para entonces ya existen todos los permisos
+        post_migrate.connect(signals.crear_grupos, sender=self)
@@ -0,0 +1,343 @@
+"""
+Archivos estáticos y multimedia servidos por la propia aplicación.
+
+collectstatic deja en STATIC_ROOT cada archivo con el hash del contenido en
+el nombre (ManifestStaticFilesStorage) y, para los de texto, copias
+precomprimidas .gz (y .br si está instalado el paquete brotli).
+ArchivosMiddleware atiende STATIC_URL y MEDIA_URL antes que el resto de la
+pila, tanto detrás de tienda.wsgi como de tienda.asgi, sin un servidor web
+aparte:
+
+- los nombres con hash (estáticos y variantes de imagen) van con caché
+  "immutable" de un año; el resto con un max-age corto y revalidación;
+- ETag y Last-Modified con respuestas 304 (get_conditional_response);
+- la versión precomprimida que acepte el cliente (Accept-Encoding);
+- pedidos parciales (Range, If-Range) con 206 o 416.
+
+El índice de estáticos se arma una vez al iniciar el proceso (después de
+collectstatic hay que reiniciar); los archivos multimedia cambian con las
+subidas y se consultan en disco en cada pedido.
+"""
+import gzip
+import json
+import mimetypes
+import os
+import re
+import stat
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # opcional: sin él solo hay .gz
+    brotli = None
+
+UN_ANO = 31536000
+CACHE_INMUTABLE = f'public, max-age={UN_ANO}, immutable'
+# Extensiones que vale la pena comprimir (las imágenes ya vienen comprimidas)
+COMPRIMIBLES = ('.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico')
+TAMANO_MINIMO_COMPRESION = 256
+# Del preferido al menos: (token de Accept-Encoding, sufijo en disco)
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+TROZO = 64 * 1024
+
+_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def comprimir(ruta):
+    """Escribe junto a `ruta` sus versiones .gz y .br cuando ahorran algo"""
+    ruta = Path(ruta)
+    if ruta.suffix.lower() not in COMPRIMIBLES:
+        return []
+    contenido = ruta.read_bytes()
+    if len(contenido) < TAMANO_MINIMO_COMPRESION:
+        return []
+    # mtime=0: el .gz sale idéntico en cada collectstatic
+    versiones = {'.gz': gzip.compress(contenido, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        versiones['.br'] = brotli.compress(contenido, quality=11)
+    escritas = []
+    for sufijo, comprimido in versiones.items():
+        # Si casi no reduce, descomprimir en el cliente cuesta más de lo que ahorra
+        if len(comprimido) < len(contenido) * 0.95:
+            destino = ruta.with_name(ruta.name + sufijo)
+            destino.write_bytes(comprimido)
+            escritas.append(destino)
+    return escritas
+
+
+class AlmacenEstaticos(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage que además precomprime los archivos de texto"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        nombres = set()
+        for original, procesado, hecho in super().post_process(paths, dry_run, **options):
+            yield original, procesado, hecho
+            if not isinstance(hecho, Exception):
+                nombres.add(original)
+                if procesado:
+                    nombres.add(procesado)
+        if not dry_run:
+            for nombre in sorted(nombres):
+                comprimir(self.path(nombre))
+
+    def stored_name(self, name):
+        # Sin collectstatic (desarrollo, tests) no hay manifiesto: nombre sin hash.
+        # Con manifiesto, una entrada faltante sigue siendo un error.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+
+@dataclass
+class Archivo:
+    """Un archivo servible con sus versiones precomprimidas"""
+    ruta: Path
+    tamano: int
+    modificado: float
+    tipo: str
+    cache_control: str
+    comprimidos: dict = field(default_factory=dict)  # token -> (ruta, tamaño)
+
+    @classmethod
+    def desde_disco(cls, ruta, cache_control):
+        try:
+            datos = os.stat(ruta)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if not stat.S_ISREG(datos.st_mode):
+            return None
+        tipo, _ = mimetypes.guess_type(ruta.name)
+        archivo = cls(ruta, datos.st_size, datos.st_mtime, tipo or 'application/octet-stream', cache_control)
+        if ruta.suffix.lower() in COMPRIMIBLES:
+            for token, sufijo in CODIFICACIONES:
+                comprimido = ruta.with_name(ruta.name + sufijo)
+                if comprimido.is_file():
+                    archivo.comprimidos[token] = (comprimido, comprimido.stat().st_size)
+        return archivo
+
+    def etag(self, token=None):
+        valor = f'{self.tamano:x}-{int(self.modificado):x}'
+        return f'"{valor}-{token}"' if token else f'"{valor}"'
+
+
+def _aceptadas(request):
+    tokens = set()
+    for parte in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        token, _, parametros = parte.strip().partition(';')
+        if parametros.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        tokens.add(token.strip().lower())
+    return tokens
+
+
+def _rango(request, archivo):
+    """(inicio, fin) del Range pedido, None para responder completo, ValueError si es insatisfacible"""
+    valor = request.META.get('HTTP_RANGE')
+    if not valor or request.method not in ('GET', 'HEAD'):
+        return None
+    si_rango = request.META.get('HTTP_IF_RANGE')
+    if si_rango and si_rango not in (archivo.etag(), http_date(archivo.modificado)):
+        # El recurso cambió desde que el cliente bajó la primera parte
+        return None
+    coincidencia = _RANGO.match(valor.strip())
+    # Varios rangos (multipart/byteranges) o sintaxis inválida: se ignora el encabezado
+    if not coincidencia or coincidencia.groups() == ('', ''):
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio:
+        largo = int(fin)
+        if largo == 0 or archivo.tamano == 0:
+            raise ValueError(valor)
+        return max(0, archivo.tamano - largo), archivo.tamano - 1
+    inicio = int(inicio)
+    if fin and int(fin) < inicio:
+        return None
+    if inicio >= archivo.tamano:
+        raise ValueError(valor)
+    return inicio, min(int(fin), archivo.tamano - 1) if fin else archivo.tamano - 1
+
+
+def _trozos(ruta, inicio, largo):
+    with open(ruta, 'rb') as archivo:
+        archivo.seek(inicio)
+        while largo > 0:
+            trozo = archivo.read(min(TROZO, largo))
+            if not trozo:
+                break
+            largo -= len(trozo)
+            yield trozo
+
+
+async def _trozos_asincronicos(ruta, inicio, largo):
+    # La lectura va a un hilo aparte para no bloquear el loop de ASGI
+    trozos = _trozos(ruta, inicio, largo)
+    siguiente = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (trozo := await siguiente(trozos, None)) is not None:
+            yield trozo
+    finally:
+        trozos.close()
+
+
+def _cuerpo(request, ruta, inicio, largo, completo):
+    if isinstance(request, ASGIRequest):
+        return StreamingHttpResponse(_trozos_asincronicos(ruta, inicio, largo))
+    if completo:
+        # FileResponse usa wsgi.file_wrapper (sendfile) cuando el servidor lo ofrece
+        respuesta = FileResponse(open(ruta, 'rb'))
+        del respuesta['Content-Disposition']
+        return respuesta
+    return StreamingHttpResponse(_trozos(ruta, inicio, largo))
+
+
+def servir_archivo(request, archivo):
+    """Respuesta para `archivo` con validadores, compresión y rangos"""
+    if request.method not in ('GET', 'HEAD'):
+        respuesta = HttpResponse(status=405)
+        respuesta['Allow'] = 'GET, HEAD'
+        return respuesta
+
+    try:
+        rango = _rango(request, archivo)
+    except ValueError:
+        respuesta = HttpResponse(status=416)
+        respuesta['Content-Range'] = f'bytes */{archivo.tamano}'
+        return respuesta
+
+    token, ruta, tamano = None, archivo.ruta, archivo.tamano
+    if rango is None:
+        aceptadas = _aceptadas(request)
+        token = next((t for t, _ in CODIFICACIONES if t in aceptadas and t in archivo.comprimidos), None)
+        if token:
+            ruta, tamano = archivo.comprimidos[token]
+
+    encabezados = HttpResponse()
+    encabezados['ETag'] = archivo.etag(token)
+    encabezados['Last-Modified'] = http_date(archivo.modificado)
+    encabezados['Cache-Control'] = archivo.cache_control
+    if archivo.comprimidos:
+        encabezados['Vary'] = 'Accept-Encoding'
+    condicional = get_conditional_response(
+        request, etag=encabezados['ETag'], last_modified=int(archivo.modificado), response=encabezados
+    )
+    if condicional is not encabezados:
+        return condicional
+
+    inicio, largo = 0, tamano
+    if rango is not None:
+        inicio, largo = rango[0], rango[1] - rango[0] + 1
+    if request.method == 'HEAD':
+        respuesta = HttpResponse()
+    else:
+        respuesta = _cuerpo(request, ruta, inicio, largo, completo=rango is None)
+    for nombre, valor in encabezados.items():
+        respuesta[nombre] = valor
+    respuesta['Content-Type'] = archivo.tipo
+    respuesta['Content-Length'] = str(largo)
+    respuesta['Accept-Ranges'] = 'bytes'
+    if token:
+        respuesta['Content-Encoding'] = token
+    if rango is not None:
+        respuesta.status_code = 206
+        respuesta['Content-Range'] = f'bytes {rango[0]}-{rango[1]}/{tamano}'
+    return respuesta
+
+
+def _prefijo(url):
+    return '/' + url.strip('/') + '/' if url else None
+
+
+class ServidorArchivos:
+    """Resuelve rutas de STATIC_URL y MEDIA_URL a objetos Archivo"""
+
+    def __init__(self, static_root, static_url, media_root, media_url, variantes_root, max_age):
+        self.prefijo_estaticos = _prefijo(static_url) if static_root else None
+        self.prefijo_media = _prefijo(media_url) if media_root else None
+        self.media_root = Path(media_root) if media_root else None
+        self.variantes_root = Path(variantes_root).resolve() if variantes_root else None
+        self.cache_corta = f'public, max-age={max_age}'
+        self.estaticos = self._indexar(Path(static_root)) if static_root else {}
+
+    @classmethod
+    def desde_settings(cls):
+        return cls(
+            settings.STATIC_ROOT, settings.STATIC_URL, settings.MEDIA_ROOT, settings.MEDIA_URL,
+            getattr(settings, 'IMAGENES_VARIANTES_ROOT', None),
+            getattr(settings, 'ARCHIVOS_MAX_AGE', 60),
+        )
+
+    def _indexar(self, raiz):
+        if not raiz.is_dir():
+            return {}
+        try:
+            manifiesto = json.loads((raiz / AlmacenEstaticos.manifest_name).read_text())
+            con_hash = set(manifiesto.get('paths', {}).values())
+        except (OSError, ValueError):
+            con_hash = set()
+        indice = {}
+        for carpeta, _, nombres in os.walk(raiz):
+            for nombre in nombres:
+                ruta = Path(carpeta) / nombre
+                relativo = ruta.relative_to(raiz).as_posix()
+                if relativo == AlmacenEstaticos.manifest_name or ruta.suffix in ('.gz', '.br'):
+                    continue
+                cache_control = CACHE_INMUTABLE if relativo in con_hash else self.cache_corta
+                archivo = Archivo.desde_disco(ruta, cache_control)
+                if archivo is not None:
+                    indice[relativo] = archivo
+        return indice
+
+    def buscar(self, ruta_url):
+        """Archivo para la ruta pedida, o None si no es de estáticos ni de media"""
+        if self.prefijo_estaticos and ruta_url.startswith(self.prefijo_estaticos):
+            return self.estaticos.get(ruta_url[len(self.prefijo_estaticos):])
+        if self.prefijo_media and ruta_url.startswith(self.prefijo_media):
+            try:
+                ruta = Path(safe_join(self.media_root, ruta_url[len(self.prefijo_media):]))
+            except (SuspiciousFileOperation, ValueError):
+                return None
+            # Las variantes llevan la huella del original en el nombre
+            if self.variantes_root and self.variantes_root in ruta.resolve().parents:
+                return Archivo.desde_disco(ruta, CACHE_INMUTABLE)
+            return Archivo.desde_disco(ruta, self.cache_corta)
+        return None
+
+
+class ArchivosMiddleware:
+    """Sirve estáticos y media antes de sesiones, autenticación y vistas"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'ARCHIVOS_SERVIR', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.servidor = ServidorArchivos.desde_settings()
+        self.asincronico = iscoroutinefunction(get_response)
+        if self.asincronico:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincronico:
+            return self.__acall__(request)
+        archivo = self.servidor.buscar(request.path_info)
+        if archivo is not None:
+            return servir_archivo(request, archivo)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        archivo = self.servidor.buscar(request.path_info)
+        if archivo is not None:
+            return servir_archivo(request, archivo)
+        return await self.get_response(request)
@@ -0,0 +1,174 @@
+"""
+Consultas calientes y el plan con que las resuelve la base.
+
+Cada consulta registrada con @consulta_caliente reproduce un filtro que
+corre en cada página vista o en cada reporte. auditar_indices pide el plan
+de todas y falla si alguna recorre una tabla entera: un índice que alguien
+borra o una consulta que deja de coincidir con el suyo se ve en el plan
+antes que en la latencia.
+"""
+import datetime
+import re
+from types import SimpleNamespace
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .estadisticas import LIMITE_LISTAS, UMBRAL_BAJO_STOCK
+from .models import Carrito, InventarioMovimiento, ItemCarrito, Producto, ResumenInventarioDiario
+from .paginacion import _desde_cursor, codificar_cursor
+from .reservas import TAMANO_LOTE as LOTE_RESERVAS
+from .usuarios import USUARIOS_POR_PAGINA, buscar_usuarios
+
+CONSULTAS_CALIENTES = {}
+
+# "SCAN tabla" sin "USING ... INDEX" en SQLite; "Seq Scan on tabla" en Postgres
+ESCANEO_COMPLETO = {
+    'sqlite': re.compile(r'\bSCAN (\w+)(?!.*\bUSING\b)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+def consulta_caliente(nombre):
+    """Registra una función que arma el queryset de una consulta caliente"""
+    def registrar(funcion):
+        CONSULTAS_CALIENTES[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def plan(queryset):
+    """El plan de la consulta como lo devuelve QuerySet.explain()"""
+    conexion = connections[queryset.db]
+    with transaction.atomic(using=queryset.db):
+        if conexion.vendor == 'postgresql':
+            # Con tablas chicas Postgres elige Seq Scan aunque haya índice:
+            # así solo queda el recorrido completo si no hay índice que sirva
+            with conexion.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def escaneos_completos(queryset, texto_plan):
+    """Tablas que el plan recorre enteras"""
+    patron = ESCANEO_COMPLETO.get(connections[queryset.db].vendor)
+    if patron is None:
+        return []
+    return [m.group(1) for linea in texto_plan.splitlines() for m in patron.finditer(linea)]
+
+
+def auditar():
+    """(nombre, plan, tablas recorridas enteras) de cada consulta registrada"""
+    resultados = []
+    for nombre, armar in CONSULTAS_CALIENTES.items():
+        queryset = armar()
+        texto_plan = plan(queryset)
+        resultados.append((nombre, texto_plan, escaneos_completos(queryset, texto_plan)))
+    return resultados
+
+
+def _ahora():
+    return timezone.now()
+
+
+# -------------------------------
+# Catálogo
+# -------------------------------
+
+@consulta_caliente('catálogo: primera página')
+def _catalogo():
+    return _desde_cursor(Producto.objects.filter(inventario__gt=0), None)[:24]
+
+
+@consulta_caliente('catálogo: página siguiente')
+def _catalogo_siguiente():
+    cursor = codificar_cursor(SimpleNamespace(creado=_ahora(), pk=1))
+    return _desde_cursor(Producto.objects.filter(inventario__gt=0), cursor)[:24]
+
+
+# -------------------------------
+# Panel y listado de administración
+# -------------------------------
+
+@consulta_caliente('panel: últimos productos')
+def _ultimos_productos():
+    return Producto.objects.order_by('-creado', '-id')[:5]
+
+
+@consulta_caliente('panel: bajo stock')
+def _panel_bajo_stock():
+    return Producto.objects.filter(inventario__lt=UMBRAL_BAJO_STOCK).order_by('inventario', 'id')[:LIMITE_LISTAS]
+
+
+@consulta_caliente('admin: productos')
+def _admin_productos():
+    return Producto.objects.order_by('-creado')[:25]
+
+
+@consulta_caliente('admin: agotados')
+def _admin_agotados():
+    return Producto.objects.filter(inventario=0).order_by('-creado')[:25]
+
+
+@consulta_caliente('admin: bajo stock')
+def _admin_bajo_stock():
+    return Producto.objects.filter(inventario__lt=UMBRAL_BAJO_STOCK, inventario__gt=0).order_by('-creado')[:25]
+
+
+@consulta_caliente('admin: usuarios por prefijo')
+def _usuarios_por_prefijo():
+    return buscar_usuarios('ana')[:USUARIOS_POR_PAGINA]
+
+
+# -------------------------------
+# Carrito
+# -------------------------------
+
+@consulta_caliente('carrito: línea de un producto')
+def _linea_carrito():
+    return ItemCarrito.objects.filter(carrito_id=1, producto_id=1)
+
+
+@consulta_caliente('carrito: líneas con su producto')
+def _lineas_carrito():
+    return ItemCarrito.objects.filter(carrito_id=1).select_related('producto')
+
+
+@consulta_caliente('producto: líneas en carritos')
+def _producto_en_carritos():
+    # eliminar_producto y los cambios de precio buscan por producto solo
+    return ItemCarrito.objects.filter(producto_id=1)
+
+
+@consulta_caliente('carrito: reservas vencidas')
+def _reservas_vencidas():
+    # Los carritos de cada lote de liberar_reservas_vencidas
+    vencidas = ItemCarrito.objects.filter(reserva_vence__lt=_ahora()).order_by('reserva_vence')
+    return Carrito.objects.filter(
+        pk__in=vencidas.values('carrito_id')[:LOTE_RESERVAS]
+    ).values_list('pk', flat=True)
+
+
+# -------------------------------
+# Reportes
+# -------------------------------
+
+@consulta_caliente('reportes: movimientos desde una fecha')
+def _movimientos_desde():
+    return InventarioMovimiento.objects.filter(creado__gte=_ahora())
+
+
+@consulta_caliente('reportes: primer movimiento')
+def _primer_movimiento():
+    return InventarioMovimiento.objects.order_by('creado').values_list('creado', flat=True)[:1]
+
+
+@consulta_caliente('reportes: historia de un producto')
+def _historia_producto():
+    return InventarioMovimiento.objects.filter(producto_id=1, creado__gte=_ahora())
+
+
+@consulta_caliente('reportes: consolidados recientes')
+def _consolidados():
+    desde = timezone.localdate() - datetime.timedelta(days=30)
+    return ResumenInventarioDiario.objects.filter(fecha__gte=desde).order_by('fecha')
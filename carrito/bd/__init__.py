@@ -0,0 +1,99 @@
+"""
+Configuración de base de datos: réplica de lectura y backend SQLite propio.
+
+Las lecturas van a la réplica solo dentro de leer_de_replica() (o en las
+vistas decoradas con desde_replica) y solo para MODELOS_REPLICA: el
+catálogo y los reportes toleran unos segundos de atraso, mientras que la
+sesión, el usuario y el carrito se leen siempre de 'default' para no ver
+datos viejos justo después de escribirlos. Sin una base 'replica' en
+settings.DATABASES todo queda en 'default'.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = 'replica'
+MODELOS_REPLICA = {'carrito.producto', 'carrito.lineapedido'}
+
+_en_replica = contextvars.ContextVar('en_replica', default=False)
+
+
+@contextmanager
+def leer_de_replica():
+    """Manda a la réplica las lecturas de MODELOS_REPLICA dentro del bloque"""
+    # set() con el valor anterior y no reset(token): un generador en
+    # streaming puede cerrar el bloque en otro contexto (ASGI)
+    anterior = _en_replica.get()
+    _en_replica.set(True)
+    try:
+        yield
+    finally:
+        _en_replica.set(anterior)
+
+
+def iterar_de_replica(bloques):
+    """Como leer_de_replica, para el cuerpo de una respuesta en streaming"""
+    with leer_de_replica():
+        yield from bloques
+
+
+async def aiterar_de_replica(bloques):
+    """
+    iterar_de_replica para una respuesta bajo ASGI.
+
+    Django lee un cuerpo sync en streaming con sync_to_async(list), es decir
+    todo en memoria antes de mandar el primer byte. Aquí cada bloque se pide
+    con sync_to_async (en el hilo de la request, donde vive el cursor) y se
+    manda apenas sale.
+    """
+    bloques = iterar_de_replica(bloques)
+    siguiente = sync_to_async(next)
+    try:
+        while (bloque := await siguiente(bloques, None)) is not None:
+            yield bloque
+    finally:
+        await sync_to_async(bloques.close)()
+
+
+def desde_replica(vista):
+    """Decorador de vistas (sync o async) que leen de la réplica"""
+    if iscoroutinefunction(vista):
+        @wraps(vista)
+        async def envoltura(*args, **kwargs):
+            with leer_de_replica():
+                return await vista(*args, **kwargs)
+    else:
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            with leer_de_replica():
+                return vista(*args, **kwargs)
+    return envoltura
+
+
+class RouterReplica:
+    """Lecturas marcadas a 'replica'; escrituras y migraciones a 'default'"""
+
+    def db_for_read(self, model, **hints):
+        if (
+            _en_replica.get() and REPLICA in settings.DATABASES
+            and model._meta.label_lower in MODELOS_REPLICA
+        ):
+            return REPLICA
+        # Explícito: si no, Django sigue la base de la instancia de la pista
+        # y un producto leído de la réplica arrastraría sus relaciones (o su
+        # save()) hacia ella
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica tiene las mismas filas que 'default'
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
@@ -0,0 +1,44 @@
+"""
+Backend SQLite de Django con las opciones `init_command` y
+`transaction_mode` que Django agregó recién en 5.1.
+
+- init_command: sentencias separadas por ';' que corren en cada conexión
+  nueva (los PRAGMA de WAL, synchronous y mmap de settings).
+- transaction_mode: 'IMMEDIATE' abre cada atomic() con BEGIN IMMEDIATE. Con
+  BEGIN a secas una transacción que lee y después escribe puede chocar con
+  otra escritora y fallar con "database is locked" sin esperar el timeout;
+  pidiendo el lock de escritura al entrar, la espera la cubre el timeout.
+
+Al pasar a Django 5.1 alcanza con volver a django.db.backends.sqlite3:
+las opciones se llaman igual.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+MODOS_TRANSACCION = (None, 'DEFERRED', 'EXCLUSIVE', 'IMMEDIATE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        parametros = super().get_connection_params()
+        self.init_command = parametros.pop('init_command', None)
+        self.transaction_mode = parametros.pop('transaction_mode', None)
+        if self.transaction_mode not in MODOS_TRANSACCION:
+            raise ImproperlyConfigured(
+                f"transaction_mode debe ser uno de {MODOS_TRANSACCION}"
+            )
+        return parametros
+
+    def get_new_connection(self, conn_params):
+        conexion = super().get_new_connection(conn_params)
+        for sentencia in (self.init_command or '').split(';'):
+            if sentencia.strip():
+                conexion.execute(sentencia)
+        return conexion
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,230 @@
+"""
+Índice de búsqueda de texto completo para productos.
+
+El motor se elige según la base de datos (FTS5 en SQLite, tsvector en
+PostgreSQL) o con el ajuste BUSQUEDA_MOTOR (ruta a una clase). Los
+motores solo devuelven IDs ordenados por relevancia; ordenar y paginar
+sigue siendo trabajo del ORM (ver buscar_productos). Los filtros del
+queryset (stock, agotados, ...) van dentro de la consulta del motor como
+subconsulta, así el tope de resultados se aplica a lo que se va a mostrar.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection as conexion_por_defecto, connections, router
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.module_loading import import_string
+
+# Tope de resultados rankeados: ordenar por relevancia más allá no aporta
+LIMITE_RESULTADOS = 500
+
+_PALABRA = re.compile(r'\w+', re.UNICODE)
+
+
+def terminos(texto):
+    """Palabras de la consulta, sin operadores ni comillas que romperían el MATCH"""
+    return _PALABRA.findall((texto or '').lower())[:10]
+
+
+class MotorBusqueda:
+    """Motor por defecto: LIKE sobre nombre y descripción, sin índice"""
+
+    def __init__(self, conexion=None):
+        self.conexion = conexion or conexion_por_defecto
+
+    def crear_estructura(self):
+        pass
+
+    def eliminar_estructura(self):
+        pass
+
+    def indexar(self, productos):
+        pass
+
+    def eliminar(self, ids):
+        pass
+
+    def reconstruir(self):
+        pass
+
+    def _restriccion(self, entre, columna):
+        """SQL 'AND columna IN (subconsulta)' para limitar la búsqueda a un queryset de productos"""
+        if entre is None:
+            return '', []
+        sql, params = entre.order_by().values('pk').query.get_compiler(connection=self.conexion).as_sql()
+        return f' AND {columna} IN ({sql})', list(params)
+
+    def buscar(self, texto, limite=LIMITE_RESULTADOS, entre=None):
+        from .models import Producto
+
+        consulta = Q()
+        for termino in terminos(texto):
+            consulta &= Q(nombre__icontains=termino) | Q(descripcion__icontains=termino)
+        if not consulta:
+            return []
+        productos = Producto.objects.using(self.conexion.alias).filter(consulta)
+        if entre is not None:
+            productos = productos.filter(pk__in=entre.order_by().values('pk'))
+        return list(productos.order_by('-creado').values_list('pk', flat=True)[:limite])
+
+
+class MotorFTS5(MotorBusqueda):
+    """Tabla virtual FTS5 de SQLite, rankeada con bm25 (el nombre pesa más)"""
+
+    tabla = 'carrito_producto_fts'
+    peso_nombre = 10.0
+    peso_descripcion = 1.0
+
+    def crear_estructura(self):
+        with self.conexion.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.tabla} USING fts5("
+                "nombre, descripcion, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+
+    def eliminar_estructura(self):
+        with self.conexion.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.tabla}")
+
+    def indexar(self, productos):
+        filas = [(p.pk, p.nombre, p.descripcion) for p in productos]
+        if not filas:
+            return
+        with self.conexion.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.tabla} WHERE rowid = %s", [(f[0],) for f in filas])
+            cursor.executemany(
+                f"INSERT INTO {self.tabla} (rowid, nombre, descripcion) VALUES (%s, %s, %s)",
+                filas
+            )
+
+    def eliminar(self, ids):
+        with self.conexion.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.tabla} WHERE rowid = %s", [(pk,) for pk in ids])
+
+    def reconstruir(self):
+        with self.conexion.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.tabla}")
+            cursor.execute(
+                f"INSERT INTO {self.tabla} (rowid, nombre, descripcion) "
+                "SELECT id, nombre, descripcion FROM carrito_producto"
+            )
+
+    def buscar(self, texto, limite=LIMITE_RESULTADOS, entre=None):
+        palabras = terminos(texto)
+        if not palabras:
+            return []
+        # Cada palabra como prefijo: "bate" encuentra "batería"
+        consulta = ' AND '.join(f'"{palabra}"*' for palabra in palabras)
+        restriccion, params = self._restriccion(entre, 'rowid')
+        with self.conexion.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.tabla} WHERE {self.tabla} MATCH %s{restriccion} "
+                f"ORDER BY bm25({self.tabla}, %s, %s) LIMIT %s",
+                [consulta, *params, self.peso_nombre, self.peso_descripcion, limite]
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+
+
+class MotorPostgres(MotorBusqueda):
+    """Tabla auxiliar con tsvector e índice GIN, rankeada con ts_rank"""
+
+    tabla = 'carrito_producto_busqueda'
+    configuracion = 'spanish'
+
+    def _documento(self, prefijo=''):
+        return (
+            f"setweight(to_tsvector('{self.configuracion}', {prefijo}nombre), 'A') || "
+            f"setweight(to_tsvector('{self.configuracion}', {prefijo}descripcion), 'B')"
+        )
+
+    def crear_estructura(self):
+        with self.conexion.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.tabla} ("
+                "producto_id bigint PRIMARY KEY REFERENCES carrito_producto (id) ON DELETE CASCADE, "
+                "documento tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.tabla}_gin ON {self.tabla} USING gin (documento)"
+            )
+
+    def eliminar_estructura(self):
+        with self.conexion.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.tabla}")
+
+    def indexar(self, productos):
+        filas = [(p.pk, p.nombre, p.descripcion) for p in productos]
+        if not filas:
+            return
+        with self.conexion.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.tabla} (producto_id, documento) "
+                f"SELECT %s, {self._documento('v.')} FROM (SELECT %s AS nombre, %s AS descripcion) v "
+                "ON CONFLICT (producto_id) DO UPDATE SET documento = EXCLUDED.documento",
+                filas
+            )
+
+    def eliminar(self, ids):
+        with self.conexion.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.tabla} WHERE producto_id = ANY(%s)", [list(ids)])
+
+    def reconstruir(self):
+        with self.conexion.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.tabla}")
+            cursor.execute(
+                f"INSERT INTO {self.tabla} (producto_id, documento) "
+                f"SELECT id, {self._documento()} FROM carrito_producto"
+            )
+
+    def buscar(self, texto, limite=LIMITE_RESULTADOS, entre=None):
+        palabras = terminos(texto)
+        if not palabras:
+            return []
+        consulta = ' & '.join(f'{palabra}:*' for palabra in palabras)
+        restriccion, params = self._restriccion(entre, 'producto_id')
+        with self.conexion.cursor() as cursor:
+            cursor.execute(
+                f"SELECT producto_id FROM {self.tabla}, to_tsquery(%s, %s) consulta "
+                f"WHERE documento @@ consulta{restriccion} "
+                "ORDER BY ts_rank(documento, consulta) DESC LIMIT %s",
+                [self.configuracion, consulta, *params, limite]
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+
+
+MOTORES_POR_BASE = {
+    'sqlite': MotorFTS5,
+    'postgresql': MotorPostgres,
+}
+
+
+def obtener_motor(conexion=None):
+    """Instancia el motor configurado o el que corresponde a la base de datos"""
+    conexion = conexion or conexion_por_defecto
+    ruta = getattr(settings, 'BUSQUEDA_MOTOR', None)
+    clase = import_string(ruta) if ruta else MOTORES_POR_BASE.get(conexion.vendor, MotorBusqueda)
+    return clase(conexion)
+
+
+def buscar_productos(texto, queryset=None, limite=LIMITE_RESULTADOS):
+    """
+    Restringe el queryset a los productos que coinciden, en orden de relevancia.
+
+    Los `limite` más relevantes se eligen entre los del queryset, no entre
+    todo el catálogo: con el filtro dentro del motor un producto agotado
+    nunca le quita el lugar a uno disponible. El motor lee de la base que el
+    router elige para Producto (la réplica dentro de desde_replica).
+    """
+    from .models import Producto
+
+    entre = queryset
+    if queryset is None:
+        queryset = Producto.objects.all()
+    ids = obtener_motor(connections[router.db_for_read(Producto)]).buscar(texto, limite, entre=entre)
+    if not ids:
+        return queryset.none()
+    relevancia = Case(
+        *(When(pk=pk, then=Value(posicion)) for posicion, pk in enumerate(ids)),
+        output_field=IntegerField()
+    )
+    return queryset.filter(pk__in=ids).order_by(relevancia)
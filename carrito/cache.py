@@ -0,0 +1,236 @@
+"""
+Caché de la tienda con claves versionadas.
+
+Nada se borra al invalidar: cada producto (y el catálogo completo) tiene un
+número de versión que forma parte de las claves, y cambiarlo deja huérfanas
+las entradas viejas hasta que expiran solas. Las versiones se cambian desde
+las señales de Producto y desde carrito.inventario, siempre al confirmar la
+transacción para no volver a cachear datos que todavía no son visibles.
+
+Las funciones con prefijo "a" son las equivalentes para vistas async.
+Usan la API async de la caché salvo con backends en memoria (locmem,
+dummy), que no hacen I/O y se llaman directo para no pagar un salto de
+hilo por lectura.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+CLAVE_CATALOGO = 'catalogo:version'
+CLAVE_PANEL = 'panel:version'
+CLAVE_ACIERTOS = 'estadisticas:aciertos'
+CLAVE_FALLOS = 'estadisticas:fallos'
+
+
+def _ttl():
+    return getattr(settings, 'CACHE_TTL_CATALOGO', 300)
+
+
+def _clave_version(pk):
+    return f'producto:{pk}:version'
+
+
+def _nueva_version():
+    # Una versión perdida (desalojo) nunca debe reutilizar un número anterior
+    return time.time_ns()
+
+
+def _version(clave):
+    version = cache.get(clave)
+    if version is None:
+        version = _nueva_version()
+        if not cache.add(clave, version, None):
+            # Otra request la creó entretanto: usar la guardada, no la nuestra
+            version = cache.get(clave, version)
+    return version
+
+
+def version_catalogo():
+    return _version(CLAVE_CATALOGO)
+
+
+def versiones_productos(pks):
+    """Versión actual de cada producto, en un solo get_many"""
+    claves = {_clave_version(pk): pk for pk in pks}
+    encontradas = cache.get_many(claves)
+    faltantes = {clave: _nueva_version() for clave in claves if clave not in encontradas}
+    if faltantes:
+        cache.set_many(faltantes, None)
+        encontradas.update(faltantes)
+    return {claves[clave]: version for clave, version in encontradas.items()}
+
+
+def invalidar_productos(pks):
+    """Cambia la versión de los productos y del catálogo al confirmar la transacción"""
+    pks = list(pks)
+
+    def invalidar():
+        version = _nueva_version()
+        versiones = {_clave_version(pk): version for pk in pks}
+        versiones[CLAVE_CATALOGO] = version
+        versiones[CLAVE_PANEL] = version
+        cache.set_many(versiones, None)
+
+    transaction.on_commit(invalidar)
+
+
+def invalidar_panel():
+    """Cambia solo la versión de las estadísticas del panel (altas y bajas de usuarios)"""
+    transaction.on_commit(lambda: cache.set(CLAVE_PANEL, _nueva_version(), None))
+
+
+def registrar(aciertos=0, fallos=0):
+    """Suma aciertos y fallos a los contadores globales"""
+    for clave, cantidad in ((CLAVE_ACIERTOS, aciertos), (CLAVE_FALLOS, fallos)):
+        if not cantidad:
+            continue
+        try:
+            cache.incr(clave, cantidad)
+        except ValueError:
+            # incr falla si la clave no existe; add evita pisar otro proceso
+            if not cache.add(clave, cantidad, None):
+                cache.incr(clave, cantidad)
+
+
+def estadisticas():
+    """Aciertos, fallos y porcentaje de aciertos para el panel de administración"""
+    valores = cache.get_many([CLAVE_ACIERTOS, CLAVE_FALLOS])
+    aciertos = valores.get(CLAVE_ACIERTOS, 0)
+    fallos = valores.get(CLAVE_FALLOS, 0)
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'porcentaje': round(100 * aciertos / total, 1) if total else 0,
+        'backend': settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1],
+    }
+
+
+def obtener_o_calcular(clave, calcular, ttl=None):
+    """cache.get con cálculo y guardado en caso de fallo, contando el resultado"""
+    valor = cache.get(clave)
+    if valor is not None:
+        registrar(aciertos=1)
+        return valor
+    valor = calcular()
+    cache.set(clave, valor, ttl or _ttl())
+    registrar(fallos=1)
+    return valor
+
+
+def pagina_catalogo(cursor, calcular):
+    """Página del catálogo (productos y cursor siguiente) para la versión actual"""
+    clave = f'catalogo:{version_catalogo()}:pagina:{cursor or "inicio"}'
+    return obtener_o_calcular(clave, calcular)
+
+
+def panel(calcular, ttl):
+    """Estadísticas del panel de administración para la versión actual"""
+    return obtener_o_calcular(f'panel:{_version(CLAVE_PANEL)}', calcular, ttl)
+
+
+def producto(pk, calcular):
+    """Un producto completo, guardado con su versión"""
+    version = versiones_productos([pk])[pk]
+    return obtener_o_calcular(f'producto:{pk}:{version}', calcular)
+
+
+def fragmentos_productos(productos, renderizar):
+    """
+    HTML de la parte fija de cada tarjeta, leyendo y escribiendo en bloque.
+
+    `renderizar` recibe un producto y devuelve su fragmento; solo se llama
+    para los que faltan en la caché. Devuelve {pk: html}.
+    """
+    versiones = versiones_productos([p.pk for p in productos])
+    claves = {f'tarjeta:{p.pk}:{versiones[p.pk]}': p for p in productos}
+    encontrados = cache.get_many(claves)
+
+    nuevos = {clave: renderizar(p) for clave, p in claves.items() if clave not in encontrados}
+    if nuevos:
+        cache.set_many(nuevos, _ttl())
+    registrar(aciertos=len(encontrados), fallos=len(nuevos))
+
+    encontrados.update(nuevos)
+    return {p.pk: encontrados[clave] for clave, p in claves.items()}
+
+
+# -------------------------------
+# Equivalentes async
+# -------------------------------
+
+async def _acache(metodo, *args):
+    if isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return getattr(cache, metodo)(*args)
+    return await getattr(cache, 'a' + metodo)(*args)
+
+
+async def _aversion(clave):
+    version = await _acache('get', clave)
+    if version is None:
+        version = _nueva_version()
+        if not await _acache('add', clave, version, None):
+            version = await _acache('get', clave, version)
+    return version
+
+
+async def aversiones_productos(pks):
+    claves = {_clave_version(pk): pk for pk in pks}
+    encontradas = await _acache('get_many', claves)
+    faltantes = {clave: _nueva_version() for clave in claves if clave not in encontradas}
+    if faltantes:
+        await _acache('set_many', faltantes, None)
+        encontradas.update(faltantes)
+    return {claves[clave]: version for clave, version in encontradas.items()}
+
+
+async def aregistrar(aciertos=0, fallos=0):
+    for clave, cantidad in ((CLAVE_ACIERTOS, aciertos), (CLAVE_FALLOS, fallos)):
+        if not cantidad:
+            continue
+        try:
+            await _acache('incr', clave, cantidad)
+        except ValueError:
+            if not await _acache('add', clave, cantidad, None):
+                await _acache('incr', clave, cantidad)
+
+
+async def aobtener_o_calcular(clave, calcular, ttl=None):
+    """Como obtener_o_calcular, con `calcular` async"""
+    valor = await _acache('get', clave)
+    if valor is not None:
+        await aregistrar(aciertos=1)
+        return valor
+    valor = await calcular()
+    await _acache('set', clave, valor, ttl or _ttl())
+    await aregistrar(fallos=1)
+    return valor
+
+
+async def apagina_catalogo(cursor, calcular):
+    clave = f'catalogo:{await _aversion(CLAVE_CATALOGO)}:pagina:{cursor or "inicio"}'
+    return await aobtener_o_calcular(clave, calcular)
+
+
+async def aproducto(pk, calcular):
+    version = (await aversiones_productos([pk]))[pk]
+    return await aobtener_o_calcular(f'producto:{pk}:{version}', calcular)
+
+
+async def afragmentos_productos(productos, renderizar):
+    """Como fragmentos_productos; `renderizar` sigue siendo sync (solo plantillas)"""
+    versiones = await aversiones_productos([p.pk for p in productos])
+    claves = {f'tarjeta:{p.pk}:{versiones[p.pk]}': p for p in productos}
+    encontrados = await _acache('get_many', claves)
+
+    nuevos = {clave: renderizar(p) for clave, p in claves.items() if clave not in encontrados}
+    if nuevos:
+        await _acache('set_many', nuevos, _ttl())
+    await aregistrar(aciertos=len(encontrados), fallos=len(nuevos))
+
+    encontrados.update(nuevos)
+    return {p.pk: encontrados[clave] for clave, p in claves.items()}
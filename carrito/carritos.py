@@ -0,0 +1,326 @@
+"""
+El carrito de cada request: en la base para usuarios autenticados y en una
+cookie firmada para los anónimos.
+
+El carrito anónimo es solo {producto_id: cantidad} firmado con la
+SECRET_KEY, así que navegar y llenar el carrito sin cuenta no escribe nada
+en la base (ni sesión, ni Carrito, ni reservas). Al agregar se valida
+contra el inventario libre; las unidades se reservan recién al iniciar
+sesión, cuando fusionar_carrito_anonimo pasa las líneas al Carrito del
+usuario con un solo upsert. Un usuario autenticado tampoco crea su Carrito
+hasta que agrega algo. CarritoMiddleware escribe o borra la cookie al
+final de la request.
+"""
+import json
+from dataclasses import dataclass
+from decimal import Decimal
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from .consultas import ResumenCarrito, aresumen_carrito, resumen_carrito
+from .inventario import StockInsuficiente, reservar_stock_en_lote
+from .models import Carrito, InventarioMovimiento, ItemCarrito, Producto
+from .reservas import vencimiento_reserva
+
+COOKIE = 'carrito'
+SAL = 'carrito.anonimo'
+DURACION = 60 * 60 * 24 * 30
+# Una cookie no puede pasar de ~4 KB
+MAXIMO_LINEAS = 50
+
+
+@dataclass
+class LineaAnonima:
+    """Línea del carrito anónimo con los mismos atributos que items_con_totales"""
+    producto: Producto
+    cantidad: int
+
+    @property
+    def id(self):
+        # Sin fila propia: las vistas identifican la línea por su producto
+        return self.producto.pk
+
+    @property
+    def subtotal_linea(self):
+        return self.producto.precio * self.cantidad
+
+    @property
+    def maximo_disponible(self):
+        return self.producto.inventario
+
+    @property
+    def stock_suficiente(self):
+        return self.cantidad <= self.producto.inventario
+
+
+class CarritoAnonimo:
+    """Carrito en cookie firmada: ninguna operación escribe en la base"""
+
+    def __init__(self, request):
+        self.request = request
+        self.lineas = self._leer()
+        self.modificado = False
+
+    def _leer(self):
+        crudo = self.request.get_signed_cookie(COOKIE, default=None, salt=SAL, max_age=DURACION)
+        try:
+            lineas = {int(pk): int(cantidad) for pk, cantidad in json.loads(crudo or '{}').items()}
+        except (AttributeError, TypeError, ValueError):
+            return {}
+        return {pk: cantidad for pk, cantidad in lineas.items() if cantidad > 0}
+
+    def guardar(self, respuesta):
+        if not self.modificado:
+            return
+        if self.lineas:
+            respuesta.set_signed_cookie(
+                COOKIE, json.dumps(self.lineas, separators=(',', ':')), salt=SAL,
+                max_age=DURACION, httponly=True, samesite='Lax',
+            )
+        else:
+            respuesta.delete_cookie(COOKIE, samesite='Lax')
+
+    def unidades(self):
+        return sum(self.lineas.values())
+
+    async def aunidades(self):
+        return self.unidades()
+
+    def contiene(self, producto):
+        return producto.pk in self.lineas
+
+    async def acontiene(self, producto):
+        return self.contiene(producto)
+
+    def agregar(self, producto, cantidad=1):
+        if cantidad <= 0:
+            raise ValueError("La cantidad debe ser mayor a cero")
+        nueva = self.lineas.get(producto.pk, 0) + cantidad
+        if nueva > producto.inventario:
+            raise StockInsuficiente(f"No hay suficiente inventario de {producto.nombre}", [producto.pk])
+        if producto.pk not in self.lineas and len(self.lineas) >= MAXIMO_LINEAS:
+            raise ValueError(f"El carrito admite hasta {MAXIMO_LINEAS} productos distintos")
+        self.lineas[producto.pk] = nueva
+        self.modificado = True
+
+    def _producto(self, linea_id):
+        if linea_id not in self.lineas:
+            raise Http404("El producto no está en el carrito")
+        return get_object_or_404(Producto, pk=linea_id)
+
+    def actualizar(self, linea_id, cantidad):
+        """Fija la cantidad de una línea (0 la quita) y devuelve su producto"""
+        producto = self._producto(linea_id)
+        if cantidad <= 0:
+            return self.eliminar(linea_id)
+        if cantidad > producto.inventario:
+            raise StockInsuficiente(f"No hay suficiente inventario de {producto.nombre}", [producto.pk])
+        self.lineas[linea_id] = cantidad
+        self.modificado = True
+        return producto
+
+    def eliminar(self, linea_id):
+        producto = self._producto(linea_id)
+        del self.lineas[linea_id]
+        self.modificado = True
+        return producto
+
+    def limpiar(self):
+        self.lineas = {}
+        self.modificado = True
+
+    def _resumen(self, productos):
+        items = [
+            LineaAnonima(productos[pk], cantidad)
+            for pk, cantidad in self.lineas.items() if pk in productos
+        ]
+        return ResumenCarrito(
+            items=items,
+            total=sum((item.subtotal_linea for item in items), Decimal('0')),
+            unidades=sum(item.cantidad for item in items),
+        )
+
+    def resumen(self):
+        if not self.lineas:
+            return ResumenCarrito()
+        return self._resumen(Producto.objects.in_bulk(list(self.lineas)))
+
+    async def aresumen(self):
+        if not self.lineas:
+            return ResumenCarrito()
+        productos = {p.pk: p async for p in Producto.objects.filter(pk__in=list(self.lineas))}
+        return self._resumen(productos)
+
+
+class CarritoUsuario:
+    """Carrito en la base; la fila Carrito se crea con el primer producto"""
+
+    def __init__(self, usuario):
+        self.usuario = usuario
+
+    def existente(self):
+        try:
+            return self.usuario.carrito
+        except Carrito.DoesNotExist:
+            return None
+
+    async def aexistente(self):
+        if not hasattr(self, '_existente'):
+            self._existente = await Carrito.objects.filter(usuario=self.usuario).afirst()
+        return self._existente
+
+    def guardar(self, respuesta):
+        pass
+
+    def unidades(self):
+        carrito = self.existente()
+        return carrito.cantidad_items() if carrito else 0
+
+    async def aunidades(self):
+        carrito = await self.aexistente()
+        return carrito.cantidad_items() if carrito else 0
+
+    def contiene(self, producto):
+        carrito = self.existente()
+        return bool(carrito) and carrito.items.filter(producto=producto).exists()
+
+    async def acontiene(self, producto):
+        carrito = await self.aexistente()
+        return bool(carrito) and await carrito.items.filter(producto=producto).aexists()
+
+    def agregar(self, producto, cantidad=1):
+        # get_or_create tolera dos primeras altas simultáneas
+        carrito, _ = Carrito.objects.get_or_create(usuario=self.usuario)
+        self.usuario.carrito = carrito
+        carrito.agregar_producto(producto, cantidad)
+
+    def _item(self, linea_id):
+        carrito = self.existente()
+        if carrito is None:
+            raise Http404("El carrito está vacío")
+        return carrito, get_object_or_404(
+            ItemCarrito.objects.select_related('producto'), id=linea_id, carrito=carrito
+        )
+
+    def actualizar(self, linea_id, cantidad):
+        """Fija la cantidad de una línea (0 la quita) y devuelve su producto"""
+        carrito, item = self._item(linea_id)
+        if cantidad <= 0:
+            carrito.remover_producto(item.producto)
+        elif cantidad > item.cantidad:
+            carrito.agregar_producto(item.producto, cantidad - item.cantidad)
+        elif cantidad < item.cantidad:
+            carrito.remover_producto(item.producto, item.cantidad - cantidad)
+        return item.producto
+
+    def eliminar(self, linea_id):
+        carrito, item = self._item(linea_id)
+        carrito.remover_producto(item.producto)
+        return item.producto
+
+    def limpiar(self):
+        carrito = self.existente()
+        if carrito:
+            carrito.limpiar()
+
+    def resumen(self):
+        carrito = self.existente()
+        return resumen_carrito(carrito) if carrito else ResumenCarrito()
+
+    async def aresumen(self):
+        carrito = await self.aexistente()
+        return await aresumen_carrito(carrito) if carrito else ResumenCarrito()
+
+
+def carrito_de(request):
+    """El carrito de la request (uno por request, según esté autenticado o no)"""
+    if not hasattr(request, '_carrito'):
+        if request.user.is_authenticated:
+            request._carrito = CarritoUsuario(request.user)
+        else:
+            request._carrito = CarritoAnonimo(request)
+    return request._carrito
+
+
+def fusionar_carrito_anonimo(request, usuario):
+    """
+    Pasa el carrito de la cookie al Carrito del usuario al iniciar sesión.
+
+    Las unidades se reservan con un UPDATE (recortadas a lo que haya libre)
+    y las líneas se suman a las existentes con un solo upsert. Devuelve las
+    unidades que quedaron en el carrito.
+    """
+    lineas = CarritoAnonimo(request).lineas
+    if not lineas:
+        return 0
+    # La cookie se borra aunque no quede nada que pasar (productos agotados o eliminados)
+    request._carrito_fusionado = True
+    request.__dict__.pop('_carrito', None)
+
+    with transaction.atomic():
+        carrito, _ = Carrito.objects.get_or_create(usuario=usuario)
+        # Serializa con otro login o checkout del mismo usuario
+        Carrito.objects.select_for_update().only('pk').get(pk=carrito.pk)
+        libres = dict(
+            Producto.objects.select_for_update().filter(pk__in=lineas).values_list('pk', 'inventario')
+        )
+        reservas = {pk: min(cantidad, libres[pk]) for pk, cantidad in lineas.items() if libres.get(pk)}
+        if not reservas:
+            return 0
+        existentes = {
+            pk: (cantidad, reservada)
+            for pk, cantidad, reservada in carrito.items.filter(producto__in=reservas).values_list(
+                'producto_id', 'cantidad', 'cantidad_reservada'
+            )
+        }
+        reservar_stock_en_lote(reservas, motivo=InventarioMovimiento.RESERVA)
+        ahora = timezone.now()
+        ItemCarrito.objects.bulk_create(
+            [
+                ItemCarrito(
+                    carrito=carrito, producto_id=pk,
+                    cantidad=existentes.get(pk, (0, 0))[0] + n,
+                    cantidad_reservada=existentes.get(pk, (0, 0))[1] + n,
+                    reserva_vence=vencimiento_reserva(ahora),
+                    actualizado=ahora,
+                )
+                for pk, n in reservas.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['carrito', 'producto'],
+            update_fields=['cantidad', 'cantidad_reservada', 'reserva_vence', 'actualizado'],
+        )
+        Carrito.reconciliar_totales(Carrito.objects.filter(pk=carrito.pk))
+    return sum(reservas.values())
+
+
+class CarritoMiddleware:
+    """Escribe la cookie del carrito anónimo si la request la cambió"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincronico = iscoroutinefunction(get_response)
+        if self.asincronico:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincronico:
+            return self.__acall__(request)
+        return self._guardar(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._guardar(request, await self.get_response(request))
+
+    def _guardar(self, request, respuesta):
+        carrito = getattr(request, '_carrito', None)
+        if carrito is not None:
+            carrito.guardar(respuesta)
+        if getattr(request, '_carrito_fusionado', False):
+            respuesta.delete_cookie(COOKIE, samesite='Lax')
+        return respuesta
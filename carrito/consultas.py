@@ -0,0 +1,67 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db.models import BooleanField, DecimalField, ExpressionWrapper, F, Q, Sum, Window
+
+from .models import ItemCarrito
+
+
+@dataclass
+class ResumenCarrito:
+    """Lo que necesitan las páginas del carrito, leído en una sola consulta"""
+    items: list = field(default_factory=list)
+    total: Decimal = Decimal('0')
+    unidades: int = 0
+
+    @property
+    def vacio(self):
+        return not self.items
+
+    @property
+    def stock_suficiente(self):
+        return all(item.stock_suficiente for item in self.items)
+
+    @property
+    def sin_stock(self):
+        return [item for item in self.items if not item.stock_suficiente]
+
+
+def items_con_totales(carrito):
+    """
+    Ítems del carrito con el producto unido y los importes calculados en SQL.
+
+    Cada fila trae subtotal_linea, maximo_disponible (stock libre más lo que
+    la línea ya reserva), stock_suficiente y, como función de ventana, el
+    total y las unidades de todo el carrito.
+    """
+    importe = DecimalField(max_digits=12, decimal_places=2)
+    subtotal = ExpressionWrapper(F('cantidad') * F('producto__precio'), output_field=importe)
+    maximo = F('producto__inventario') + F('cantidad_reservada')
+
+    return ItemCarrito.objects.filter(carrito=carrito).select_related('producto').annotate(
+        subtotal_linea=subtotal,
+        maximo_disponible=maximo,
+        stock_suficiente=ExpressionWrapper(Q(cantidad__lte=maximo), output_field=BooleanField()),
+        total_carrito=Window(Sum(subtotal), output_field=importe),
+        unidades_carrito=Window(Sum('cantidad')),
+    )
+
+
+def _armar_resumen(items):
+    if not items:
+        return ResumenCarrito()
+    return ResumenCarrito(
+        items=items,
+        total=items[0].total_carrito,
+        unidades=items[0].unidades_carrito,
+    )
+
+
+def resumen_carrito(carrito):
+    """Evalúa items_con_totales y arma el ResumenCarrito (un solo round trip)"""
+    return _armar_resumen(list(items_con_totales(carrito)))
+
+
+async def aresumen_carrito(carrito):
+    """resumen_carrito para vistas async"""
+    return _armar_resumen([item async for item in items_con_totales(carrito).aiterator()])
@@ -0,0 +1,39 @@
+from django.contrib.auth.models import User
+from django.db.models import Count, Q
+
+from . import cache as cache_tienda
+from .models import Producto
+
+# Umbral de "bajo stock" que usan el panel y el listado de administración
+UMBRAL_BAJO_STOCK = 5
+
+# Cuántas filas muestra cada lista del panel; el resto se ve paginado
+LIMITE_LISTAS = 10
+
+# Las estadísticas se invalidan por señales; el TTL solo acota el peor caso
+TTL_PANEL = 30
+
+
+def calcular_estadisticas():
+    """
+    Contadores del panel con una sola consulta de agregación condicional.
+
+    Las listas (últimos productos, bajo stock) se limitan a LIMITE_LISTAS
+    filas; el detalle completo está en admin_lista_productos?filter=...
+    """
+    contadores = Producto.objects.aggregate(
+        total_productos=Count('id'),
+        bajo_stock=Count('id', filter=Q(inventario__lt=UMBRAL_BAJO_STOCK)),
+        agotados=Count('id', filter=Q(inventario=0)),
+    )
+    contadores['total_usuarios'] = User.objects.count()
+    contadores['ultimos_productos'] = list(Producto.objects.order_by('-creado', '-id')[:5])
+    contadores['productos_bajo_stock'] = list(
+        Producto.objects.filter(inventario__lt=UMBRAL_BAJO_STOCK).order_by('inventario', 'id')[:LIMITE_LISTAS]
+    )
+    return contadores
+
+
+def estadisticas_panel():
+    """Estadísticas del panel desde la caché (se recalculan al cambiar productos o usuarios)"""
+    return cache_tienda.panel(calcular_estadisticas, TTL_PANEL)
@@ -0,0 +1,151 @@
+"""
+Exportación de datos en CSV o JSON Lines sin cargar las tablas en memoria.
+
+Cada conjunto es un queryset de tuplas (values_list) que se recorre con
+.iterator(chunk_size) y se serializa en bloques de texto, así que la misma
+función alimenta un StreamingHttpResponse (vistas de staff) y el comando
+exportar_datos, con memoria constante sin importar el tamaño de la tabla.
+"""
+import csv
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, DecimalField, F, Sum
+
+from .models import ItemCarrito, LineaPedido, Producto, ResumenInventarioDiario
+from .reportes import estadisticas_inventario
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+TAMANO_BLOQUE = 2000
+CENTAVOS = Decimal('0.01')
+
+
+@dataclass(frozen=True)
+class Conjunto:
+    """Un conjunto exportable: columnas y cómo obtener sus filas como tuplas"""
+    descripcion: str
+    columnas: tuple
+    filas: object
+
+    def recorrer(self):
+        return self.filas(self.columnas)
+
+
+def _centavos(valor):
+    # SQLite no redondea los decimales calculados (sumas, promedios)
+    return valor.quantize(CENTAVOS) if isinstance(valor, Decimal) else valor
+
+
+def _productos(columnas):
+    return Producto.objects.order_by('pk').values_list(*columnas).iterator(chunk_size=TAMANO_BLOQUE)
+
+
+def _carritos(columnas):
+    filas = ItemCarrito.objects.values(
+        'producto_id', 'producto__sku', 'producto__nombre'
+    ).annotate(
+        carritos=Count('carrito', distinct=True),
+        unidades=Sum('cantidad'),
+        unidades_reservadas=Sum('cantidad_reservada'),
+        importe=Sum(
+            F('cantidad') * F('producto__precio'),
+            output_field=DecimalField(max_digits=14, decimal_places=2)
+        ),
+    ).order_by('producto_id').values_list(*columnas).iterator(chunk_size=TAMANO_BLOQUE)
+    return ((*fila[:-1], _centavos(fila[-1])) for fila in filas)
+
+
+def _pedidos(columnas):
+    return LineaPedido.objects.order_by('pedido_id', 'pk').values_list(
+        *columnas
+    ).iterator(chunk_size=TAMANO_BLOQUE)
+
+
+def _inventario_diario(columnas):
+    return ResumenInventarioDiario.objects.order_by('fecha').values_list(
+        *columnas
+    ).iterator(chunk_size=TAMANO_BLOQUE)
+
+
+def _estadisticas(columnas):
+    estadisticas = estadisticas_inventario()
+    return iter([tuple(_centavos(estadisticas[columna]) for columna in columnas)])
+
+
+CONJUNTOS = {
+    'productos': Conjunto(
+        'Catálogo completo',
+        ('id', 'sku', 'nombre', 'descripcion', 'precio', 'inventario', 'creado', 'actualizado'),
+        _productos,
+    ),
+    'carritos': Conjunto(
+        'Unidades e importe en carritos, por producto',
+        ('producto_id', 'producto__sku', 'producto__nombre', 'carritos', 'unidades',
+         'unidades_reservadas', 'importe'),
+        _carritos,
+    ),
+    'pedidos': Conjunto(
+        'Líneas de todos los pedidos',
+        ('pedido_id', 'pedido__creado', 'pedido__usuario__username', 'producto_id',
+         'nombre_producto', 'precio_unitario', 'cantidad'),
+        _pedidos,
+    ),
+    'inventario_diario': Conjunto(
+        'Consolidado diario del inventario',
+        ('fecha', 'movimientos', 'productos_modificados', 'unidades_entrada',
+         'unidades_salida', 'inventario_total'),
+        _inventario_diario,
+    ),
+    'estadisticas': Conjunto(
+        'Estadísticas actuales del reporte de productos',
+        ('total_inventario', 'valor_total', 'precio_promedio', 'productos_sin_imagen'),
+        _estadisticas,
+    ),
+}
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve lo escrito en vez de guardarlo"""
+
+    def write(self, valor):
+        return valor
+
+
+def _en_bloques(lineas, tamano=TAMANO_BLOQUE):
+    # Menos trozos que una línea por yield, sin dejar de ser constante en memoria
+    bloque = []
+    for linea in lineas:
+        bloque.append(linea)
+        if len(bloque) >= tamano:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+def _lineas_csv(columnas, filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(columnas)
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def _lineas_jsonl(columnas, filas):
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+    for fila in filas:
+        yield codificador.encode(dict(zip(columnas, fila))) + '\n'
+
+
+def exportar(nombre, formato):
+    """Genera el conjunto `nombre` como bloques de texto en `formato`"""
+    if nombre not in CONJUNTOS:
+        raise KeyError(nombre)
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}")
+    conjunto = CONJUNTOS[nombre]
+    lineas = _lineas_csv if formato == 'csv' else _lineas_jsonl
+    return _en_bloques(lineas(conjunto.columnas, conjunto.recorrer()))
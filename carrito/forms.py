@@ -1,7 +1,10 @@
+from decimal import Decimal
+
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, Permission, User
 from .models import Producto
+from .inventario import AJUSTE_AUMENTAR, MODOS_AJUSTE
 
 class RegistroForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -25,7 +28,37 @@ class LoginForm(AuthenticationForm):
 class ProductoForm(forms.ModelForm):
     class Meta:
         model = Producto
-        fields = ['nombre', 'descripcion', 'precio', 'inventario', 'imagen']
+        fields = ['sku', 'nombre', 'descripcion', 'precio', 'inventario', 'imagen']
         widgets = {
             'descripcion': forms.Textarea(attrs={'rows': 3}),
-        }
\ No newline at end of file
+        }
+
+
+class AjusteInventarioForm(forms.Form):
+    """Datos de la acción de admin que ajusta el stock de varios productos"""
+    modo = forms.ChoiceField(choices=MODOS_AJUSTE, initial=AJUSTE_AUMENTAR)
+    cantidad = forms.IntegerField(min_value=0, initial=10, label="Unidades")
+
+class AsignarGrupoForm(forms.Form):
+    """Datos de la acción de admin que agrega varios usuarios a un grupo"""
+    grupo = forms.ModelChoiceField(queryset=Group.objects.order_by('name'))
+    quitar_individuales = forms.BooleanField(
+        required=False,
+        label="Quitar permisos individuales",
+        help_text="Borra los permisos directos que el grupo ya otorga"
+    )
+
+class PermisosUsuarioForm(forms.Form):
+    """Grupos y permisos individuales que quedan asignados a un usuario"""
+    grupos = forms.ModelMultipleChoiceField(queryset=Group.objects.all(), required=False)
+    permisos = forms.ModelMultipleChoiceField(queryset=Permission.objects.all(), required=False)
+
+class CambioPrecioForm(forms.Form):
+    """Datos de la acción de admin que cambia el precio de varios productos"""
+    porcentaje = forms.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        min_value=Decimal('-99.99'),
+        max_value=Decimal('1000'),
+        help_text="Positivo para aumentar, negativo para rebajar (por ejemplo -15)"
+    )
@@ -0,0 +1,31 @@
+"""
+Hashers de contraseñas con los costos de settings.HASHERS_PARAMETROS.
+
+Mantienen el nombre de algoritmo de Django ('scrypt', 'argon2'), así que
+verifican los hashes ya guardados. Al iniciar sesión Django vuelve a
+hashear la contraseña si el hasher preferido (TIENDA_HASHER) es otro o si
+sus parámetros cambiaron (must_update), sin que el usuario note nada.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, ScryptPasswordHasher
+
+
+class _ConParametros:
+    """Toma los atributos de costo de HASHERS_PARAMETROS[algorithm]"""
+
+    def __init__(self):
+        for nombre, valor in getattr(settings, 'HASHERS_PARAMETROS', {}).get(self.algorithm, {}).items():
+            setattr(self, nombre, valor)
+
+
+class ScryptAjustado(_ConParametros, ScryptPasswordHasher):
+
+    def __init__(self):
+        super().__init__()
+        # hashlib limita scrypt a 32 MiB por defecto: con n * r * 128 más
+        # grande falla; se deja el doble de lo que pide el costo configurado
+        self.maxmem = 2 * 128 * self.block_size * self.work_factor
+
+
+class Argon2Ajustado(_ConParametros, Argon2PasswordHasher):
+    pass
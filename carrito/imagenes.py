@@ -0,0 +1,166 @@
+"""
+Variantes redimensionadas de Producto.imagen (miniaturas, tarjetas, detalle).
+
+Cada variante se nombra con la huella del original (sha256 truncado), el
+ancho y el formato: <huella>-<ancho>.<formato>. Como el nombre cambia si
+cambia la imagen, se sirven con caché "immutable" de un año. Al subir una
+imagen se generan las de los perfiles de IMAGENES_PERFILES_AL_SUBIR (las
+que usan los listados); el resto se genera en el primer pedido a la vista
+imagen_variante. En ambos casos quedan en disco bajo
+IMAGENES_VARIANTES_ROOT y las siguientes lecturas no tocan la base ni
+Pillow. El comando generar_imagenes rellena las que falten.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.urls import reverse
+from PIL import Image, ImageOps, features
+
+# Anchos que se generan; la vista rechaza cualquier otro
+ANCHOS = (50, 100, 320, 480, 640, 800, 1200)
+
+PERFILES = {
+    'miniatura': {'anchos': (50, 100), 'sizes': '50px'},
+    # Las tarjetas del catálogo ocupan col-md-4 (un tercio) y 200px de alto
+    'tarjeta': {'anchos': (320, 480, 640), 'sizes': '(min-width: 768px) 33vw, 100vw'},
+    'detalle': {'anchos': (480, 800, 1200), 'sizes': '(min-width: 768px) 50vw, 100vw'},
+}
+
+# Del más liviano al más compatible: el navegador toma el primero que entiende
+CALIDAD = {'avif': 55, 'webp': 80, 'jpg': 82}
+FORMATOS_PIL = {'avif': 'AVIF', 'webp': 'WEBP', 'jpg': 'JPEG'}
+TIPOS = {'avif': 'image/avif', 'webp': 'image/webp', 'jpg': 'image/jpeg'}
+
+
+def formatos():
+    """Formatos disponibles en esta instalación de Pillow (AVIF es opcional)"""
+    disponibles = [formato for formato in ('avif', 'webp') if features.check(formato)]
+    return disponibles + ['jpg']
+
+
+def directorio_variantes():
+    return Path(getattr(settings, 'IMAGENES_VARIANTES_ROOT', Path(settings.MEDIA_ROOT) / 'variantes'))
+
+
+def huella_archivo(archivo):
+    """sha256 truncado del contenido de un archivo (FieldFile o UploadedFile)"""
+    resumen = hashlib.sha256()
+    for bloque in archivo.chunks():
+        resumen.update(bloque)
+    return resumen.hexdigest()[:16]
+
+
+def nombre_variante(huella, ancho, formato):
+    return f'{huella}-{ancho}.{formato}'
+
+
+def ruta_variante(huella, ancho, formato):
+    return directorio_variantes() / nombre_variante(huella, ancho, formato)
+
+
+def url_variante(huella, ancho, formato):
+    return reverse('carrito:imagen_variante', args=[huella, ancho, formato])
+
+
+def _abrir(origen):
+    imagen = Image.open(origen)
+    imagen.load()
+    return ImageOps.exif_transpose(imagen)
+
+
+def _escribir(imagen, huella, ancho, formato):
+    """Redimensiona una imagen ya abierta y la guarda como variante (escritura atómica)"""
+    destino = ruta_variante(huella, ancho, formato)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+
+    # Nunca se agranda: si el original es más angosto queda a su tamaño
+    if imagen.width > ancho:
+        alto = max(1, round(imagen.height * ancho / imagen.width))
+        imagen = imagen.resize((ancho, alto), Image.LANCZOS)
+    if formato == 'jpg' or imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGB' if formato == 'jpg' else 'RGBA')
+
+    # Temporal + os.replace: dos pedidos simultáneos nunca ven un archivo a medias
+    descriptor, temporal = tempfile.mkstemp(dir=destino.parent, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as salida:
+            opciones = {'quality': CALIDAD[formato]}
+            if formato == 'jpg':
+                opciones.update(optimize=True, progressive=True)
+            elif formato == 'webp':
+                opciones['method'] = 4
+            imagen.save(salida, FORMATOS_PIL[formato], **opciones)
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, destino)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+    return destino
+
+
+def generar_variante(origen, huella, ancho, formato):
+    """Escribe una sola variante a disco (la vista la usa en un fallo de caché)"""
+    with _abrir(origen) as imagen:
+        return _escribir(imagen, huella, ancho, formato)
+
+
+def generar_variantes(producto, perfiles=None, forzar=False):
+    """
+    Genera las variantes que falten de un producto y devuelve cuántas escribió.
+
+    El original se decodifica una sola vez. `perfiles` limita los anchos a
+    los de esos perfiles; por defecto se generan todos.
+    """
+    if not producto.imagen or not producto.imagen_huella:
+        return 0
+    if perfiles is None:
+        anchos = ANCHOS
+    else:
+        anchos = sorted({ancho for perfil in perfiles for ancho in PERFILES[perfil]['anchos']})
+    pendientes = [
+        (ancho, formato)
+        for ancho in anchos
+        for formato in formatos()
+        if forzar or not ruta_variante(producto.imagen_huella, ancho, formato).exists()
+    ]
+    if not pendientes:
+        return 0
+
+    with producto.imagen.open('rb') as archivo, _abrir(archivo) as imagen:
+        for ancho, formato in pendientes:
+            _escribir(imagen, producto.imagen_huella, ancho, formato)
+    return len(pendientes)
+
+
+def fuentes(producto, perfil):
+    """
+    Atributos para <picture>: un srcset por formato, el src de respaldo y sizes.
+
+    Sin huella (imágenes anteriores a las variantes, antes del backfill) se
+    usa el original tal cual.
+    """
+    if not producto.imagen:
+        return None
+    configuracion = PERFILES[perfil]
+    if not producto.imagen_huella:
+        return {'fuentes': [], 'src': producto.imagen.url, 'srcset': '', 'sizes': configuracion['sizes']}
+
+    anchos = configuracion['anchos']
+
+    def srcset(formato):
+        return ', '.join(
+            f'{url_variante(producto.imagen_huella, ancho, formato)} {ancho}w' for ancho in anchos
+        )
+
+    return {
+        'fuentes': [
+            {'tipo': TIPOS[formato], 'srcset': srcset(formato)}
+            for formato in formatos() if formato != 'jpg'
+        ],
+        'src': url_variante(producto.imagen_huella, anchos[0], 'jpg'),
+        'srcset': srcset('jpg'),
+        'sizes': configuracion['sizes'],
+    }
@@ -0,0 +1,207 @@
+"""
+Importación masiva de productos desde CSV o JSON Lines.
+
+Los archivos se leen fila a fila y se escriben en lotes con un upsert
+(bulk_create con update_conflicts) sobre el SKU, así que la memoria no
+depende del tamaño del archivo. Cada fila se valida con los campos de
+ProductoForm (mismos límites y validadores que el alta manual) salvo la
+unicidad del SKU, que resuelve el propio upsert. Por cada lote se anotan
+los cambios de stock en el libro y se recalculan los carritos afectados
+por cambios de precio; el índice de búsqueda se reconstruye al final.
+"""
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.db import reset_queries, transaction
+
+from .cache import invalidar_productos
+from .movimientos import registrar_movimientos
+
+CAMPOS = ('sku', 'nombre', 'descripcion', 'precio', 'inventario')
+FORMATOS = ('csv', 'jsonl')
+TAMANO_LOTE = 2000
+# Para no acumular en memoria los errores de un archivo entero
+MAXIMO_ERRORES_GUARDADOS = 50
+
+
+@dataclass
+class ResultadoImportacion:
+    """Contadores de una importación, actualizados lote a lote"""
+    leidas: int = 0
+    creadas: int = 0
+    actualizadas: int = 0
+    invalidas: int = 0
+    errores: list = field(default_factory=list)
+    inicio: float = field(default_factory=time.perf_counter)
+
+    @property
+    def segundos(self):
+        return time.perf_counter() - self.inicio
+
+    @property
+    def filas_por_segundo(self):
+        return self.leidas / self.segundos if self.segundos else 0
+
+    def anotar_error(self, linea, mensaje):
+        self.invalidas += 1
+        if len(self.errores) < MAXIMO_ERRORES_GUARDADOS:
+            self.errores.append((linea, mensaje))
+
+
+def detectar_formato(ruta):
+    """Formato a partir de la extensión (.csv, .jsonl o .ndjson)"""
+    sufijo = Path(ruta).suffix.lower()
+    if sufijo == '.csv':
+        return 'csv'
+    if sufijo in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f"No se reconoce el formato de {ruta}; indícalo explícitamente")
+
+
+def leer_filas(archivo, formato):
+    """Genera (número de línea, dict) sin cargar el archivo completo"""
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila
+    elif formato == 'jsonl':
+        for numero, linea in enumerate(archivo, start=1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except json.JSONDecodeError as error:
+                fila = error
+            yield numero, fila
+    else:
+        raise ValueError(f"Formato desconocido: {formato}")
+
+
+class ValidadorProductos:
+    """Limpia filas con los campos de ProductoForm, sin instanciar un formulario por fila"""
+
+    def __init__(self):
+        from .forms import ProductoForm
+        from .models import Producto
+
+        self.campos = {nombre: ProductoForm.base_fields[nombre] for nombre in CAMPOS}
+        # Los validadores del modelo (precio mínimo) los corre el ModelForm en _post_clean
+        self.campos_modelo = {nombre: Producto._meta.get_field(nombre) for nombre in CAMPOS}
+
+    def limpiar(self, fila):
+        if not isinstance(fila, dict):
+            raise ValidationError(f"Fila ilegible: {fila}")
+        datos, errores = {}, {}
+        for nombre, campo in self.campos.items():
+            valor = fila.get(nombre)
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                valor = str(valor)
+            try:
+                datos[nombre] = campo.clean(valor)
+                if datos[nombre] not in campo.empty_values:
+                    self.campos_modelo[nombre].run_validators(datos[nombre])
+            except ValidationError as error:
+                errores[nombre] = error.messages
+        if not errores and not datos['sku']:
+            errores['sku'] = ["El SKU es obligatorio para importar"]
+        if errores:
+            raise ValidationError(errores)
+        return datos
+
+
+def _describir(error):
+    if not hasattr(error, 'error_dict'):
+        return ' '.join(error.messages)
+    return '; '.join(f"{campo}: {' '.join(mensajes)}" for campo, mensajes in error.message_dict.items())
+
+
+def _guardar_lote(lote, resultado):
+    """Upsert de un lote {sku: datos} con su libro de stock y los carritos afectados"""
+    from .models import Carrito, InventarioMovimiento, ItemCarrito, Producto
+
+    with transaction.atomic():
+        anteriores = {
+            sku: (pk, precio, inventario)
+            for sku, pk, precio, inventario in Producto.objects.filter(
+                sku__in=lote
+            ).values_list('sku', 'pk', 'precio', 'inventario')
+        }
+        Producto.objects.bulk_create(
+            [Producto(**datos) for datos in lote.values()],
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=['nombre', 'descripcion', 'precio', 'inventario', 'actualizado'],
+        )
+        # update_conflicts no devuelve los IDs de las filas nuevas
+        nuevos = dict(
+            Producto.objects.filter(
+                sku__in=[sku for sku in lote if sku not in anteriores]
+            ).values_list('sku', 'pk')
+        )
+
+        altas, ajustes, con_otro_precio = {}, {}, []
+        for sku, datos in lote.items():
+            if sku in nuevos:
+                altas[nuevos[sku]] = datos['inventario']
+                continue
+            pk, precio, inventario = anteriores[sku]
+            ajustes[pk] = datos['inventario'] - inventario
+            if datos['precio'] != precio:
+                con_otro_precio.append(pk)
+
+        registrar_movimientos(altas, InventarioMovimiento.ALTA)
+        registrar_movimientos(ajustes, InventarioMovimiento.AJUSTE)
+        if con_otro_precio:
+            Carrito.reconciliar_totales(
+                Carrito.objects.filter(
+                    pk__in=ItemCarrito.objects.filter(producto__in=con_otro_precio).values('carrito')
+                )
+            )
+        # Los productos nuevos no tienen nada en caché; basta con los existentes
+        invalidar_productos([pk for pk, _, _ in anteriores.values()])
+
+    resultado.creadas += len(nuevos)
+    resultado.actualizadas += len(anteriores)
+
+
+def importar_productos(filas, tamano_lote=TAMANO_LOTE, al_guardar_lote=None):
+    """
+    Importa productos desde un iterable de (línea, dict) como el de leer_filas.
+
+    Las filas inválidas se saltean y quedan anotadas en el resultado. Si un
+    SKU aparece dos veces en el mismo lote gana la última fila (PostgreSQL
+    no admite dos conflictos con la misma clave en un INSERT). `al_guardar_lote`
+    recibe el resultado parcial después de cada lote, para informar avance.
+    """
+    from .busqueda import obtener_motor
+
+    validador = ValidadorProductos()
+    resultado = ResultadoImportacion()
+    lote = {}
+    for linea, fila in filas:
+        resultado.leidas += 1
+        try:
+            datos = validador.limpiar(fila)
+        except ValidationError as error:
+            resultado.anotar_error(linea, _describir(error))
+            continue
+        lote[datos['sku']] = datos
+        if len(lote) >= tamano_lote:
+            _guardar_lote(lote, resultado)
+            lote = {}
+            # Con DEBUG=True Django guarda el SQL de cada lote: miles de INSERT enormes
+            reset_queries()
+            if al_guardar_lote:
+                al_guardar_lote(resultado)
+    if lote:
+        _guardar_lote(lote, resultado)
+        if al_guardar_lote:
+            al_guardar_lote(resultado)
+
+    if resultado.creadas or resultado.actualizadas:
+        obtener_motor().reconstruir()
+    return resultado
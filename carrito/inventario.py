@@ -0,0 +1,186 @@
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .cache import invalidar_productos
+from .movimientos import registrar_movimientos
+
+
+class StockInsuficiente(ValueError):
+    """No hay unidades libres suficientes para completar la reserva"""
+
+    def __init__(self, mensaje="No hay suficiente inventario", productos=()):
+        super().__init__(mensaje)
+        self.productos = list(productos)
+
+
+def _registrar_cambio(deltas, motivo):
+    """Anota el cambio en el libro de inventario e invalida la caché de esos productos"""
+    if motivo is not None:
+        registrar_movimientos(deltas, motivo)
+    invalidar_productos(deltas)
+
+
+def reservar_stock(producto_id, cantidad, motivo='reserva'):
+    """
+    Descuenta `cantidad` unidades del inventario solo si alcanzan.
+
+    Ejecuta un único UPDATE condicional (inventario >= cantidad), así que
+    dos peticiones concurrentes nunca pueden vender la misma unidad y no
+    hace falta leer ni volver a guardar la fila completa del producto.
+    Devuelve True si la reserva se hizo y False si no había stock.
+    """
+    from .models import Producto
+
+    if cantidad <= 0:
+        raise ValueError("La cantidad debe ser mayor a cero")
+
+    filas = Producto.objects.filter(
+        pk=producto_id,
+        inventario__gte=cantidad
+    ).update(
+        inventario=F('inventario') - cantidad,
+        actualizado=timezone.now()
+    )
+    if filas:
+        _registrar_cambio({producto_id: -cantidad}, motivo)
+    return filas == 1
+
+
+def liberar_stock(producto_id, cantidad, motivo='liberacion'):
+    """Devuelve `cantidad` unidades al inventario con un UPDATE atómico"""
+    from .models import Producto
+
+    if cantidad <= 0:
+        return False
+
+    filas = Producto.objects.filter(pk=producto_id).update(
+        inventario=F('inventario') + cantidad,
+        actualizado=timezone.now()
+    )
+    if filas:
+        _registrar_cambio({producto_id: cantidad}, motivo)
+    return filas == 1
+
+
+def _por_producto(cantidades):
+    """Filtra las cantidades nulas y devuelve {producto_id: unidades}"""
+    return {pk: n for pk, n in cantidades.items() if n > 0}
+
+
+def reservar_stock_en_lote(cantidades, motivo='venta'):
+    """
+    Reserva varias cantidades {producto_id: unidades} con un solo UPDATE.
+
+    Cada producto solo se descuenta si le alcanza el stock; si alguno no
+    alcanza, las filas ya actualizadas se deshacen con la transacción y se
+    lanza StockInsuficiente con los IDs que faltaron en `productos`.
+    Con motivo=None no anota nada en el libro (lo registra quien llama).
+    """
+    from .models import Producto
+
+    cantidades = _por_producto(cantidades)
+    if not cantidades:
+        return True
+
+    condicion = Q()
+    descuento = []
+    for pk, n in cantidades.items():
+        condicion |= Q(pk=pk, inventario__gte=n)
+        descuento.append(When(pk=pk, then=Value(n)))
+
+    try:
+        with transaction.atomic():
+            filas = Producto.objects.filter(condicion).update(
+                inventario=F('inventario') - Case(*descuento, default=Value(0)),
+                actualizado=timezone.now()
+            )
+            if filas != len(cantidades):
+                raise StockInsuficiente()
+            _registrar_cambio({pk: -n for pk, n in cantidades.items()}, motivo)
+    except StockInsuficiente:
+        # Ya se deshizo el UPDATE parcial; averiguamos qué productos no alcanzaron
+        existentes = dict(
+            Producto.objects.filter(pk__in=cantidades).values_list('pk', 'inventario')
+        )
+        faltantes = sorted(
+            pk for pk, n in cantidades.items() if existentes.get(pk, 0) < n
+        )
+        raise StockInsuficiente("No hay suficiente inventario", faltantes)
+    return True
+
+
+def liberar_stock_en_lote(cantidades, motivo='liberacion'):
+    """Devuelve varias cantidades {producto_id: unidades} con un solo UPDATE"""
+    from .models import Producto
+
+    cantidades = _por_producto(cantidades)
+    if not cantidades:
+        return 0
+
+    filas = Producto.objects.filter(pk__in=cantidades).update(
+        inventario=F('inventario') + Case(
+            *(When(pk=pk, then=Value(n)) for pk, n in cantidades.items()),
+            default=Value(0)
+        ),
+        actualizado=timezone.now()
+    )
+    _registrar_cambio(cantidades, motivo)
+    return filas
+
+
+AJUSTE_FIJAR = 'fijar'
+AJUSTE_AUMENTAR = 'aumentar'
+AJUSTE_DISMINUIR = 'disminuir'
+MODOS_AJUSTE = [
+    (AJUSTE_FIJAR, 'Fijar en'),
+    (AJUSTE_AUMENTAR, 'Aumentar en'),
+    (AJUSTE_DISMINUIR, 'Disminuir en'),
+]
+
+
+def _nuevo_inventario(modo, cantidad, actual):
+    if modo == AJUSTE_FIJAR:
+        return cantidad
+    if modo == AJUSTE_AUMENTAR:
+        return actual + cantidad
+    return max(actual - cantidad, 0)
+
+
+def ajustar_stock_en_lote(queryset, modo, cantidad, motivo=None):
+    """
+    Fija, suma o resta `cantidad` unidades en todos los productos del queryset.
+
+    Son siempre tres sentencias sin importar cuántos productos haya: la
+    lectura (bloqueante) del stock anterior para el libro, un único UPDATE
+    con F() y el bulk_create de los movimientos. Disminuir nunca deja un
+    producto por debajo de cero. Devuelve {producto_id: delta} de los que
+    cambiaron.
+    """
+    if cantidad < 0:
+        raise ValueError("La cantidad no puede ser negativa")
+    if modo == AJUSTE_FIJAR:
+        nuevo = Value(cantidad)
+    elif modo == AJUSTE_AUMENTAR:
+        nuevo = F('inventario') + cantidad
+    elif modo == AJUSTE_DISMINUIR:
+        nuevo = Greatest(F('inventario') - cantidad, Value(0))
+    else:
+        raise ValueError(f"Modo de ajuste desconocido: {modo}")
+    if motivo is None:
+        motivo = 'reposicion' if modo == AJUSTE_AUMENTAR else 'ajuste'
+
+    with transaction.atomic():
+        anteriores = queryset.order_by().select_for_update().values_list('pk', 'inventario')
+        deltas = {
+            pk: _nuevo_inventario(modo, cantidad, actual) - actual
+            for pk, actual in anteriores
+        }
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if deltas:
+            queryset.model.objects.filter(pk__in=deltas).update(
+                inventario=nuevo, actualizado=timezone.now()
+            )
+            _registrar_cambio(deltas, motivo)
+    return deltas
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from carrito.auditoria import auditar
+
+class Command(BaseCommand):
+    help = 'Pide el plan de cada consulta caliente y falla si alguna recorre una tabla entera'
+
+    def handle(self, *args, **options):
+        fallidas = []
+        for nombre, plan, escaneos in auditar():
+            if escaneos:
+                fallidas.append(nombre)
+                self.stdout.write(self.style.ERROR(f'{nombre}: recorre {", ".join(escaneos)}'))
+            else:
+                self.stdout.write(f'{nombre}: ok')
+            if escaneos or options['verbosity'] > 1:
+                for linea in plan.splitlines():
+                    self.stdout.write(f'    {linea}')
+
+        if fallidas:
+            raise CommandError(f'{len(fallidas)} consultas calientes sin índice')
+        self.stdout.write(self.style.SUCCESS('Todas las consultas calientes usan índices'))
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from carrito.sesiones import TAMANO_LOTE, barrer_sesiones_vencidas
+
+class Command(BaseCommand):
+    help = 'Borra en lotes las sesiones vencidas (como clearsessions, sin un DELETE gigante)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Sesiones por DELETE (por defecto {TAMANO_LOTE})'
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith('signed_cookies'):
+            self.stdout.write('Las sesiones viven en cookies firmadas: no hay filas que barrer')
+            return
+
+        inicio = time.perf_counter()
+        borradas = barrer_sesiones_vencidas(
+            tamano_lote=options['lote'],
+            al_borrar_lote=(
+                (lambda total: self.stdout.write(f'{total} sesiones borradas'))
+                if options['verbosity'] > 1 else None
+            )
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{borradas} sesiones vencidas borradas en {time.perf_counter() - inicio:.2f} s'
+        ))
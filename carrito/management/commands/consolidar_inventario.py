@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from carrito.reportes import consolidar_resumenes
+
+class Command(BaseCommand):
+    help = 'Actualiza los consolidados diarios de inventario a partir del libro de movimientos'
+
+    def handle(self, *args, **options):
+        dias = consolidar_resumenes()
+        self.stdout.write(self.style.SUCCESS(f'{dias} días consolidados'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from carrito.importacion import importar_productos
+
+PRODUCTOS_DEMO = [
+    {"sku": "DEMO-001", "nombre": "Smartphone X", "descripcion": "Último modelo", "precio": 899.99, "inventario": 50},
+    {"sku": "DEMO-002", "nombre": "Laptop Pro", "descripcion": "16GB RAM", "precio": 1299.99, "inventario": 30},
+    {"sku": "DEMO-003", "nombre": "Auriculares", "descripcion": "Cancelación de ruido", "precio": 199.99, "inventario": 100},
+    {"sku": "DEMO-004", "nombre": "Smart TV 55\"", "descripcion": "4K HDR", "precio": 599.99, "inventario": 20},
+    {"sku": "DEMO-005", "nombre": "Tablet 10\"", "descripcion": "128GB", "precio": 349.99, "inventario": 40},
+]
+
+class Command(BaseCommand):
+    help = 'Crea (o restablece) productos ficticios para pruebas'
+
+    def handle(self, *args, **options):
+        resultado = importar_productos(enumerate(PRODUCTOS_DEMO, start=1))
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.creadas} productos creados, {resultado.actualizadas} restablecidos'
+        ))
@@ -0,0 +1,33 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from carrito.exportacion import CONJUNTOS, FORMATOS, exportar
+
+class Command(BaseCommand):
+    help = 'Exporta productos, carritos, pedidos o reportes en CSV o JSON Lines, en streaming'
+
+    def add_arguments(self, parser):
+        parser.add_argument('conjunto', choices=CONJUNTOS)
+        parser.add_argument('--formato', choices=FORMATOS, default='csv')
+        parser.add_argument(
+            '--salida',
+            help='Archivo de destino. Por defecto, la salida estándar.'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        escritos = 0
+        destino = open(options['salida'], 'w', encoding='utf-8', newline='') if options['salida'] else sys.stdout
+        try:
+            for bloque in exportar(options['conjunto'], options['formato']):
+                destino.write(bloque)
+                escritos += len(bloque)
+        finally:
+            if destino is not sys.stdout:
+                destino.close()
+
+        if options['salida']:
+            self.stdout.write(self.style.SUCCESS(
+                f"{options['conjunto']}: {escritos:,} caracteres en {time.perf_counter() - inicio:.1f} s"
+            ))
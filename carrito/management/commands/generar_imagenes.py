@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from carrito.cache import invalidar_productos
+from carrito.imagenes import generar_variantes, huella_archivo
+from carrito.models import Producto
+
+class Command(BaseCommand):
+    help = 'Calcula las huellas de imagen que falten y genera las variantes (miniaturas, WebP, AVIF) pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Regenera también las variantes que ya existen (p. ej. tras cambiar la calidad)'
+        )
+
+    def _guardar_huellas(self, productos):
+        # bulk_update no pasa por las señales: las tarjetas cacheadas siguen con el original
+        invalidar_productos([producto.pk for producto in productos])
+        return Producto.objects.bulk_update(productos, ['imagen_huella'])
+
+    def handle(self, *args, **options):
+        productos = Producto.objects.exclude(imagen='').exclude(imagen__isnull=True).only(
+            'pk', 'imagen', 'imagen_huella'
+        ).order_by('pk')
+
+        huellas, variantes, faltantes = 0, 0, 0
+        sin_huella = []
+        for producto in productos.iterator(chunk_size=500):
+            if not producto.imagen_huella:
+                try:
+                    producto.imagen_huella = huella_archivo(producto.imagen)
+                except OSError:
+                    faltantes += 1
+                    self.stderr.write(f'Producto {producto.pk}: no se encuentra {producto.imagen.name}')
+                    continue
+                sin_huella.append(producto)
+            variantes += generar_variantes(producto, forzar=options['forzar'])
+            if len(sin_huella) >= 500:
+                huellas += self._guardar_huellas(sin_huella)
+                sin_huella = []
+        if sin_huella:
+            huellas += self._guardar_huellas(sin_huella)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{huellas} huellas calculadas, {variantes} variantes generadas, {faltantes} imágenes faltantes'
+        ))
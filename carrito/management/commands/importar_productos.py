@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from carrito.importacion import FORMATOS, TAMANO_LOTE, detectar_formato, importar_productos, leer_filas
+
+class Command(BaseCommand):
+    help = 'Importa o actualiza productos desde un archivo CSV o JSON Lines, usando el SKU como clave'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo (columnas: sku, nombre, descripcion, precio, inventario)')
+        parser.add_argument(
+            '--formato',
+            choices=FORMATOS,
+            help='Formato del archivo. Por defecto se deduce de la extensión.'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Filas por upsert (por defecto {TAMANO_LOTE})'
+        )
+
+    def _informar(self, resultado):
+        self.stdout.write(
+            f'{resultado.leidas} filas leídas ({resultado.filas_por_segundo:,.0f} filas/s)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            formato = options['formato'] or detectar_formato(options['archivo'])
+            archivo = open(options['archivo'], newline='', encoding='utf-8-sig')
+        except (ValueError, OSError) as error:
+            raise CommandError(error)
+
+        with archivo:
+            resultado = importar_productos(
+                leer_filas(archivo, formato),
+                tamano_lote=options['lote'],
+                al_guardar_lote=self._informar if options['verbosity'] > 1 else None
+            )
+
+        for linea, mensaje in resultado.errores:
+            self.stderr.write(f'Línea {linea}: {mensaje}')
+        if resultado.invalidas > len(resultado.errores):
+            self.stderr.write(f'... y {resultado.invalidas - len(resultado.errores)} filas inválidas más')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.creadas} productos creados, {resultado.actualizadas} actualizados, '
+            f'{resultado.invalidas} filas inválidas en {resultado.segundos:.1f} s '
+            f'({resultado.filas_por_segundo:,.0f} filas/s)'
+        ))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from carrito.reservas import TAMANO_LOTE, liberar_reservas_vencidas
+
+class Command(BaseCommand):
+    help = 'Devuelve al inventario las reservas vencidas de los carritos y borra esas líneas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Líneas por transacción (por defecto {TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--cada',
+            type=int,
+            metavar='SEGUNDOS',
+            help='Repite el barrido cada tantos segundos hasta que se interrumpa (Ctrl+C)'
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError('--lote debe ser mayor a cero')
+        if options['cada'] is not None and options['cada'] <= 0:
+            raise CommandError('--cada debe ser mayor a cero')
+
+        try:
+            while True:
+                self.barrer(options)
+                if options['cada'] is None:
+                    return
+                time.sleep(options['cada'])
+        except KeyboardInterrupt:
+            self.stdout.write('Barrido interrumpido')
+
+    def barrer(self, options):
+        barrido = liberar_reservas_vencidas(
+            tamano_lote=options['lote'],
+            al_liberar_lote=(
+                (lambda b: self.stdout.write(f'Lote {b.lotes}: {b.unidades} unidades, {b.lineas} líneas'))
+                if options['verbosity'] > 1 else None
+            )
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{barrido.unidades} unidades liberadas de {barrido.lineas} líneas vencidas '
+            f'({len(barrido.productos)} productos, {len(barrido.carritos)} carritos, '
+            f'{barrido.lotes} lotes) en {barrido.segundos:.2f} s'
+        ))
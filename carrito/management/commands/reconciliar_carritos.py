@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from carrito.models import Carrito
+
+class Command(BaseCommand):
+    help = 'Recalcula en bloque los totales cacheados (monto_total, total_items) de los carritos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--carrito',
+            type=int,
+            action='append',
+            dest='carritos',
+            help='ID de un carrito concreto (se puede repetir). Por defecto, todos.'
+        )
+
+    def handle(self, *args, **options):
+        carritos = Carrito.objects.all()
+        if options['carritos']:
+            carritos = carritos.filter(pk__in=options['carritos'])
+
+        actualizados = Carrito.reconciliar_totales(carritos)
+        self.stdout.write(self.style.SUCCESS(f'Totales recalculados para {actualizados} carritos'))
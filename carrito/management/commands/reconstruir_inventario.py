@@ -0,0 +1,50 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from carrito.models import Producto
+from carrito.reportes import inventario_en
+
+class Command(BaseCommand):
+    help = 'Reconstruye el stock de los productos en una fecha a partir del libro de movimientos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'momento',
+            help='Fecha (AAAA-MM-DD, se toma el final del día) o fecha y hora ISO 8601'
+        )
+        parser.add_argument(
+            '--producto',
+            type=int,
+            action='append',
+            dest='productos',
+            help='ID de un producto concreto (se puede repetir). Por defecto, todos.'
+        )
+        parser.add_argument(
+            '--detalle',
+            action='store_true',
+            help='Lista el stock de cada producto además del total'
+        )
+
+    def _momento(self, texto):
+        fecha = parse_date(texto)
+        momento = datetime.datetime.combine(fecha, datetime.time.max) if fecha else parse_datetime(texto)
+        if momento is None:
+            raise CommandError(f'Fecha no válida: {texto}')
+        if timezone.is_naive(momento):
+            momento = timezone.make_aware(momento)
+        return momento
+
+    def handle(self, *args, **options):
+        momento = self._momento(options['momento'])
+        stock = inventario_en(momento, options['productos'])
+
+        if options['detalle'] or options['productos']:
+            nombres = dict(Producto.objects.filter(pk__in=stock).values_list('pk', 'nombre'))
+            for pk, unidades in sorted(stock.items()):
+                self.stdout.write(f'{pk}\t{unidades}\t{nombres.get(pk, "")}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{momento:%Y-%m-%d %H:%M}: {sum(stock.values())} unidades en {len(stock)} productos'
+        ))
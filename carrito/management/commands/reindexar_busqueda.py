@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from carrito.busqueda import obtener_motor
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de productos (tras cargas masivas o update())'
+
+    def handle(self, *args, **options):
+        motor = obtener_motor()
+        motor.crear_estructura()
+        motor.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'Índice reconstruido con {type(motor).__name__}'))
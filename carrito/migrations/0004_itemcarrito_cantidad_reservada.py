@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0003_alter_producto_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemcarrito',
+            name='cantidad_reservada',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Unidades reservadas del inventario'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:06
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def calcular_totales(apps, schema_editor):
+    """Rellena los totales cacheados de los carritos existentes en un solo UPDATE"""
+    Carrito = apps.get_model('carrito', 'Carrito')
+    ItemCarrito = apps.get_model('carrito', 'ItemCarrito')
+    decimal = models.DecimalField(max_digits=12, decimal_places=2)
+    items = ItemCarrito.objects.filter(carrito=models.OuterRef('pk')).order_by().values('carrito')
+    Carrito.objects.update(
+        monto_total=Coalesce(
+            models.Subquery(items.annotate(
+                suma=models.Sum(models.F('cantidad') * models.F('producto__precio'), output_field=decimal)
+            ).values('suma')),
+            models.Value(0),
+            output_field=decimal
+        ),
+        total_items=Coalesce(
+            models.Subquery(items.annotate(suma=models.Sum('cantidad')).values('suma')),
+            0
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0004_itemcarrito_cantidad_reservada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carrito',
+            name='monto_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Total acumulado'),
+        ),
+        migrations.AddField(
+            model_name='carrito',
+            name='total_items',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Artículos acumulados'),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+    ]
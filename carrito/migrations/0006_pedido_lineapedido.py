@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:08
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('carrito', '0005_carrito_totales_cacheados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Pedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_items', models.PositiveIntegerField()),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pedidos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Pedido',
+                'verbose_name_plural': 'Pedidos',
+                'ordering': ['-creado'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LineaPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_producto', models.CharField(max_length=100)),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cantidad', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='carrito.pedido')),
+                ('producto', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lineas_pedido', to='carrito.producto')),
+            ],
+            options={
+                'verbose_name': 'Línea de pedido',
+                'verbose_name_plural': 'Líneas de pedido',
+            },
+        ),
+    ]
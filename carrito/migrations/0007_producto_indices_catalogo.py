@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0006_pedido_lineapedido'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['-creado', '-id'], name='producto_creado_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('inventario__gt', 0)), fields=['-creado', '-id'], name='producto_en_stock_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:40
+
+from django.db import migrations
+
+
+def crear_indice(apps, schema_editor):
+    from carrito.busqueda import obtener_motor
+
+    motor = obtener_motor(schema_editor.connection)
+    motor.crear_estructura()
+    motor.reconstruir()
+
+
+def eliminar_indice(apps, schema_editor):
+    from carrito.busqueda import obtener_motor
+
+    obtener_motor(schema_editor.connection).eliminar_estructura()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0007_producto_indices_catalogo'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def saldo_inicial(apps, schema_editor):
+    """El libro arranca con el stock actual de cada producto como alta"""
+    Producto = apps.get_model('carrito', 'Producto')
+    InventarioMovimiento = apps.get_model('carrito', 'InventarioMovimiento')
+    InventarioMovimiento.objects.bulk_create(
+        (
+            InventarioMovimiento(producto_id=pk, delta=inventario, motivo='alta')
+            for pk, inventario in Producto.objects.filter(inventario__gt=0).values_list('pk', 'inventario').iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0008_indice_busqueda_productos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenInventarioDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('movimientos', models.PositiveIntegerField(default=0)),
+                ('productos_modificados', models.PositiveIntegerField(default=0)),
+                ('unidades_entrada', models.PositiveIntegerField(default=0)),
+                ('unidades_salida', models.PositiveIntegerField(default=0)),
+                ('inventario_total', models.IntegerField(default=0, verbose_name='Unidades en inventario al cierre')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de inventario',
+                'verbose_name_plural': 'Resúmenes diarios de inventario',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventarioMovimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField(verbose_name='Variación de unidades')),
+                ('motivo', models.CharField(choices=[('alta', 'Alta de producto'), ('ajuste', 'Ajuste manual'), ('reposicion', 'Reposición'), ('reserva', 'Reserva en carrito'), ('liberacion', 'Liberación de reserva'), ('venta', 'Venta')], max_length=20)),
+                ('creado', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('producto', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='carrito.producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de inventario',
+                'verbose_name_plural': 'Movimientos de inventario',
+                'ordering': ['-creado'],
+            },
+        ),
+        migrations.RunPython(saldo_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('carrito', '0009_libro_inventario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventariomovimiento',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_inventario', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='inventariomovimiento',
+            index=models.Index(fields=['producto', 'creado'], name='movimiento_producto_creado_idx'),
+        ),
+    ]
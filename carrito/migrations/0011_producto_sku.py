@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0010_movimiento_usuario_indice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='SKU'),
+        ),
+    ]
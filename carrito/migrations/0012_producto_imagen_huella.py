@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0011_producto_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='imagen_huella',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=16),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0012_producto_imagen_huella'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='itemcarrito',
+            name='carrito',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='carrito.carrito'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['inventario', 'id'], name='producto_inventario_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:17
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fijar_vencimientos(apps, schema_editor):
+    """Las reservas que ya existían vencen dentro de un plazo completo, no al migrar"""
+    ItemCarrito = apps.get_model('carrito', 'ItemCarrito')
+    plazo = datetime.timedelta(seconds=getattr(settings, 'RESERVA_CARRITO_SEGUNDOS', 60 * 60 * 2))
+    ItemCarrito.objects.filter(cantidad_reservada__gt=0).update(reserva_vence=timezone.now() + plazo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0013_indices_consultas_calientes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemcarrito',
+            name='reserva_vence',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Vencimiento de la reserva'),
+        ),
+        migrations.AlterField(
+            model_name='inventariomovimiento',
+            name='motivo',
+            field=models.CharField(choices=[('alta', 'Alta de producto'), ('ajuste', 'Ajuste manual'), ('reposicion', 'Reposición'), ('reserva', 'Reserva en carrito'), ('liberacion', 'Liberación de reserva'), ('vencimiento', 'Reserva vencida'), ('venta', 'Venta')], max_length=20),
+        ),
+        migrations.RunPython(fijar_vencimientos, migrations.RunPython.noop),
+    ]
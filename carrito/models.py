@@ -1,8 +1,31 @@
-from django.db import models
+from decimal import Decimal
+from functools import partial
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from .movimientos import registrar_movimientos
+from .imagenes import generar_variantes, huella_archivo
+from .inventario import (
+    StockInsuficiente,
+    liberar_stock,
+    liberar_stock_en_lote,
+    reservar_stock,
+    reservar_stock_en_lote,
+)
+from .reservas import vencimiento_reserva
 
 class Producto(models.Model):
+    # Clave natural para importaciones (upsert); opcional para los productos cargados a mano
+    sku = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name="SKU"
+    )
     nombre = models.CharField(max_length=100, verbose_name="Nombre del producto")
     descripcion = models.TextField(verbose_name="Descripción")
     precio = models.DecimalField(
@@ -21,6 +44,8 @@ class Producto(models.Model):
         blank=True,
         verbose_name="Imagen del producto"
     )
+    # Huella del contenido de la imagen: nombra sus variantes (ver carrito.imagenes)
+    imagen_huella = models.CharField(max_length=16, blank=True, default='', editable=False, db_index=True)
     creado = models.DateTimeField(auto_now_add=True)
     actualizado = models.DateTimeField(auto_now=True)
     creado_por = models.ForeignKey(
@@ -36,6 +61,18 @@ class Producto(models.Model):
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['-creado']
+        indexes = [
+            # Paginación por cursor (creado, id) del catálogo
+            models.Index(fields=['-creado', '-id'], name='producto_creado_id_idx'),
+            models.Index(
+                fields=['-creado', '-id'],
+                condition=models.Q(inventario__gt=0),
+                name='producto_en_stock_idx'
+            ),
+            # Bajo stock del panel (ordenado por inventario) y los filtros
+            # "agotados" y "bajo stock" del listado de administración
+            models.Index(fields=['inventario', 'id'], name='producto_inventario_idx'),
+        ]
         permissions = [
             ("puede_ver_productos", "Puede ver listado de productos"),
             ("puede_editar_producto", "Puede editar cualquier producto"),
@@ -48,24 +85,84 @@ class Producto(models.Model):
     def __str__(self):
         return f"{self.nombre} (${self.precio})"
     
-    def disminuir_inventario(self, cantidad):
-        """Reduce el inventario y guarda el producto"""
-        if cantidad > self.inventario:
-            raise ValueError("No hay suficiente inventario")
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Precio e inventario tal como están en la base, para detectar cambios al guardar
+        instancia._precio_original = instancia.__dict__.get('precio')
+        instancia._inventario_original = instancia.__dict__.get('inventario')
+        instancia._imagen_original = instancia.__dict__.get('imagen')
+        return instancia
+    
+    def save(self, *args, **kwargs):
+        """Guarda el producto, ajusta los carritos si cambió el precio y registra el stock"""
+        precio_original = getattr(self, '_precio_original', None)
+        inventario_original = getattr(self, '_inventario_original', None)
+        es_alta = self._state.adding
+        imagen_nueva = self._actualizar_huella()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if imagen_nueva:
+                transaction.on_commit(partial(
+                    generar_variantes, self, getattr(settings, 'IMAGENES_PERFILES_AL_SUBIR', None)
+                ))
+            if precio_original is not None:
+                diferencia = Decimal(str(self.precio)) - precio_original
+                if diferencia:
+                    Carrito.ajustar_por_cambio_de_precio(self.pk, diferencia)
+            if es_alta:
+                registrar_movimientos({self.pk: self.inventario}, InventarioMovimiento.ALTA)
+            elif inventario_original is not None and self.inventario != inventario_original:
+                registrar_movimientos(
+                    {self.pk: self.inventario - inventario_original},
+                    InventarioMovimiento.AJUSTE
+                )
+        self._precio_original = Decimal(str(self.precio))
+        self._inventario_original = self.inventario
+        self._imagen_original = self.imagen.name or None
+    
+    def _actualizar_huella(self):
+        """Recalcula imagen_huella si la imagen cambió; devuelve True si hay una nueva"""
+        nombre = self.imagen.name or None
+        if nombre == getattr(self, '_imagen_original', None) and (self.imagen_huella or not nombre):
+            return False
+        try:
+            self.imagen_huella = huella_archivo(self.imagen) if nombre else ''
+        except OSError:
+            # El archivo no está (p. ej. fixtures sin media): se usa el original
+            self.imagen_huella = ''
+        return bool(self.imagen_huella)
+    
+    def delete(self, *args, **kwargs):
+        """Elimina el producto y recalcula los carritos que lo contenían"""
+        with transaction.atomic():
+            afectados = list(
+                Carrito.objects.filter(items__producto=self).values_list('pk', flat=True)
+            )
+            resultado = super().delete(*args, **kwargs)
+            if afectados:
+                Carrito.reconciliar_totales(Carrito.objects.filter(pk__in=afectados))
+        return resultado
+    
+    def disminuir_inventario(self, cantidad, motivo='ajuste'):
+        """Reduce el inventario con un UPDATE condicional (sin re-guardar la fila)"""
+        if not reservar_stock(self.pk, cantidad, motivo):
+            raise StockInsuficiente("No hay suficiente inventario")
         self.inventario -= cantidad
-        self.save()
     
-    def aumentar_inventario(self, cantidad):
-        """Aumenta el inventario y guarda el producto"""
+    def aumentar_inventario(self, cantidad, motivo='reposicion'):
+        """Aumenta el inventario con un UPDATE atómico (sin re-guardar la fila)"""
+        liberar_stock(self.pk, cantidad, motivo)
         self.inventario += cantidad
-        self.save()
 
     @property
     def estado_stock(self):
         """Devuelve el estado del stock como texto"""
+        from .estadisticas import UMBRAL_BAJO_STOCK
+
         if self.inventario == 0:
             return "Agotado"
-        elif self.inventario < 5:
+        elif self.inventario < UMBRAL_BAJO_STOCK:
             return "Bajo stock"
         return "Disponible"
 
@@ -75,6 +172,19 @@ class Carrito(models.Model):
         on_delete=models.CASCADE,
         related_name='carrito'
     )
+    # Totales desnormalizados: los mantiene cada operación sobre el carrito
+    monto_total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name="Total acumulado"
+    )
+    total_items = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Artículos acumulados"
+    )
     creado = models.DateTimeField(auto_now_add=True)
     actualizado = models.DateTimeField(auto_now=True)
     
@@ -90,64 +200,221 @@ class Carrito(models.Model):
         return f"Carrito de {self.usuario.username} (ID: {self.id})"
     
     def total(self):
-        """Calcula el total del carrito"""
-        return sum(item.subtotal() for item in self.items.all())
+        """Devuelve el total del carrito (columna cacheada, sin consultas)"""
+        return self.monto_total
     
     def cantidad_items(self):
-        """Devuelve la cantidad total de items en el carrito"""
-        return sum(item.cantidad for item in self.items.all())
+        """Devuelve la cantidad total de items en el carrito (columna cacheada)"""
+        return self.total_items
+    
+    def _acumular(self, unidades, precio):
+        """Suma (o resta) unidades al total cacheado con un UPDATE atómico"""
+        importe = Decimal(str(precio)) * unidades
+        Carrito.objects.filter(pk=self.pk).update(
+            monto_total=models.F('monto_total') + importe,
+            total_items=models.F('total_items') + unidades,
+            actualizado=timezone.now()
+        )
+        self.monto_total += importe
+        self.total_items += unidades
+    
+    def recalcular_totales(self):
+        """Recalcula desde los ítems los totales cacheados de este carrito"""
+        Carrito.reconciliar_totales(Carrito.objects.filter(pk=self.pk))
+        self.refresh_from_db(fields=['monto_total', 'total_items'])
+    
+    @classmethod
+    def reconciliar_totales(cls, queryset=None):
+        """Recalcula en un único UPDATE los totales de todos los carritos indicados"""
+        if queryset is None:
+            queryset = cls.objects.all()
+        items = ItemCarrito.objects.filter(carrito=models.OuterRef('pk')).order_by()
+        suma_montos = items.values('carrito').annotate(
+            suma=models.Sum(
+                models.F('cantidad') * models.F('producto__precio'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            )
+        ).values('suma')
+        suma_unidades = items.values('carrito').annotate(
+            suma=models.Sum('cantidad')
+        ).values('suma')
+        return queryset.update(
+            monto_total=Coalesce(
+                models.Subquery(suma_montos),
+                models.Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ),
+            total_items=Coalesce(models.Subquery(suma_unidades), 0)
+        )
+    
+    @classmethod
+    def ajustar_por_cambio_de_precio(cls, producto_id, diferencia):
+        """Aplica una diferencia de precio a todos los carritos que tienen el producto"""
+        cantidad = ItemCarrito.objects.filter(
+            carrito=models.OuterRef('pk'),
+            producto_id=producto_id
+        ).values('cantidad')[:1]
+        return cls.objects.filter(items__producto_id=producto_id).update(
+            monto_total=models.ExpressionWrapper(
+                models.F('monto_total') + models.Subquery(cantidad) * diferencia,
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
     
     def agregar_producto(self, producto, cantidad=1):
-        """Agrega un producto al carrito con la cantidad especificada"""
+        """Reserva stock y agrega el producto al carrito en una sola transacción"""
         if cantidad <= 0:
             raise ValueError("La cantidad debe ser mayor a cero")
         
-        if cantidad > producto.inventario:
-            raise ValueError(f"No hay suficiente inventario. Disponible: {producto.inventario}")
-        
-        item, created = ItemCarrito.objects.get_or_create(
-            carrito=self,
-            producto=producto,
-            defaults={'cantidad': cantidad}
-        )
-        
-        if not created:
-            item.cantidad += cantidad
-            item.save()
-        
-        producto.disminuir_inventario(cantidad)
-        self.save()
+        with transaction.atomic():
+            if not reservar_stock(producto.pk, cantidad):
+                raise StockInsuficiente(
+                    f"No hay suficiente inventario de {producto.nombre}"
+                )
+            producto.inventario -= cantidad
+            ahora = timezone.now()
+            
+            actualizados = self.items.filter(producto=producto).update(
+                cantidad=models.F('cantidad') + cantidad,
+                cantidad_reservada=models.F('cantidad_reservada') + cantidad,
+                reserva_vence=vencimiento_reserva(ahora),
+                actualizado=ahora
+            )
+            if not actualizados:
+                try:
+                    # Savepoint propio: si otra petición creó la línea primero
+                    # caemos al UPDATE en lugar de abortar la reserva
+                    with transaction.atomic():
+                        ItemCarrito.objects.create(
+                            carrito=self,
+                            producto=producto,
+                            cantidad=cantidad,
+                            cantidad_reservada=cantidad,
+                            reserva_vence=vencimiento_reserva(ahora)
+                        )
+                except IntegrityError:
+                    self.items.filter(producto=producto).update(
+                        cantidad=models.F('cantidad') + cantidad,
+                        cantidad_reservada=models.F('cantidad_reservada') + cantidad,
+                        reserva_vence=vencimiento_reserva(ahora),
+                        actualizado=ahora
+                    )
+            
+            self._acumular(cantidad, producto.precio)
     
     def remover_producto(self, producto, cantidad=None):
-        """Elimina un producto del carrito o reduce su cantidad"""
-        try:
-            item = self.items.get(producto=producto)
+        """Elimina un producto del carrito o reduce su cantidad liberando su reserva"""
+        with transaction.atomic():
+            try:
+                item = self.items.select_for_update().get(producto=producto)
+            except ItemCarrito.DoesNotExist:
+                return
+            
             if cantidad is None or cantidad >= item.cantidad:
-                producto.aumentar_inventario(item.cantidad)
+                quitar = item.cantidad
+            else:
+                quitar = cantidad
+            liberar = min(quitar, item.cantidad_reservada)
+            
+            if quitar >= item.cantidad:
                 item.delete()
             else:
-                producto.aumentar_inventario(cantidad)
-                item.cantidad -= cantidad
-                if item.cantidad <= 0:
-                    item.delete()
-                else:
-                    item.save()
-            self.save()
-        except ItemCarrito.DoesNotExist:
-            pass
+                ahora = timezone.now()
+                ItemCarrito.objects.filter(pk=item.pk).update(
+                    cantidad=models.F('cantidad') - quitar,
+                    cantidad_reservada=models.F('cantidad_reservada') - liberar,
+                    reserva_vence=vencimiento_reserva(ahora),
+                    actualizado=ahora
+                )
+            
+            if liberar:
+                liberar_stock(producto.pk, liberar)
+                producto.inventario += liberar
+            self._acumular(-quitar, producto.precio)
     
     def limpiar(self):
         """Vacía completamente el carrito y devuelve los productos al inventario"""
-        for item in self.items.all():
-            item.producto.aumentar_inventario(item.cantidad)
-            item.delete()
-        self.save()
+        with transaction.atomic():
+            reservas = dict(
+                self.items.select_for_update().values_list('producto_id', 'cantidad_reservada')
+            )
+            liberar_stock_en_lote(reservas)
+            self._vaciar()
+    
+    def _vaciar(self):
+        """Borra los ítems con un único DELETE y pone los totales a cero"""
+        self.items.all().delete()
+        Carrito.objects.filter(pk=self.pk).update(
+            monto_total=0,
+            total_items=0,
+            actualizado=timezone.now()
+        )
+        self.monto_total = Decimal('0')
+        self.total_items = 0
+    
+    def confirmar_pedido(self):
+        """
+        Convierte el carrito en un Pedido dentro de una sola transacción.
+
+        Las unidades que la línea ya reservó quedan vendidas tal cual; lo que
+        falte (ítems creados sin reserva) se descuenta con un único UPDATE
+        condicional. Las líneas se escriben con bulk_create y el carrito se
+        vacía con un solo DELETE. Lanza StockInsuficiente si algo no alcanza.
+
+        En el libro la venta sale completa: lo reservado vuelve como
+        'liberacion' y todas las unidades vendidas salen como 'venta'. Así
+        'venta' cuenta cada unidad vendida y reserva + liberación +
+        vencimiento es lo que sigue retenido en carritos.
+        """
+        with transaction.atomic():
+            # Bloquear el carrito serializa dos checkouts simultáneos del mismo
+            # usuario y hace que liberar_reservas_vencidas lo saltee mientras tanto
+            Carrito.objects.select_for_update().only('pk').get(pk=self.pk)
+            items = list(self.items.select_related('producto'))
+            if not items:
+                raise ValueError("El carrito está vacío")
+            
+            reservar_stock_en_lote({
+                item.producto_id: item.cantidad - item.cantidad_reservada
+                for item in items
+            }, motivo=None)
+            registrar_movimientos(
+                {item.producto_id: item.cantidad_reservada for item in items},
+                InventarioMovimiento.LIBERACION
+            )
+            registrar_movimientos(
+                {item.producto_id: -item.cantidad for item in items},
+                InventarioMovimiento.VENTA
+            )
+            
+            lineas = [
+                LineaPedido(
+                    producto=item.producto,
+                    nombre_producto=item.producto.nombre,
+                    precio_unitario=item.producto.precio,
+                    cantidad=item.cantidad
+                )
+                for item in items
+            ]
+            pedido = Pedido.objects.create(
+                usuario_id=self.usuario_id,
+                total=sum(linea.subtotal() for linea in lineas),
+                total_items=sum(linea.cantidad for linea in lineas)
+            )
+            for linea in lineas:
+                linea.pedido = pedido
+            LineaPedido.objects.bulk_create(lineas)
+            
+            self._vaciar()
+        return pedido
 
 class ItemCarrito(models.Model):
+    # Sin índice propio: lo cubre el único (carrito, producto) de Meta
     carrito = models.ForeignKey(
         Carrito,
         on_delete=models.CASCADE,
-        related_name='items'
+        related_name='items',
+        db_index=False
     )
     producto = models.ForeignKey(
         Producto,
@@ -158,6 +425,20 @@ class ItemCarrito(models.Model):
         default=1,
         validators=[MinValueValidator(1)]
     )
+    cantidad_reservada = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Unidades reservadas del inventario"
+    )
+    # Pasada esta fecha liberar_reservas_vencidas devuelve la reserva y borra
+    # la línea; nula si la línea no reserva nada (ítems cargados desde el admin)
+    reserva_vence = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name="Vencimiento de la reserva"
+    )
     agregado = models.DateTimeField(auto_now_add=True)
     actualizado = models.DateTimeField(auto_now=True)
     
@@ -180,12 +461,126 @@ class ItemCarrito(models.Model):
     
     def save(self, *args, **kwargs):
         """Valida la cantidad antes de guardar"""
-        inventario_disponible = self.producto.inventario
-        if self.pk:  # Si ya existe el item
-            item_original = ItemCarrito.objects.get(pk=self.pk)
-            inventario_disponible += item_original.cantidad
+        # Las unidades ya reservadas por esta línea cuentan como disponibles
+        inventario_disponible = self.producto.inventario + self.cantidad_reservada
         
         if self.cantidad > inventario_disponible:
             raise ValueError(f"No hay suficiente inventario. Máximo disponible: {inventario_disponible}")
         
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class Pedido(models.Model):
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='pedidos'
+    )
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    total_items = models.PositiveIntegerField()
+    creado = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Pedido"
+        verbose_name_plural = "Pedidos"
+        ordering = ['-creado']
+    
+    def __str__(self):
+        return f"Pedido #{self.id} (${self.total})"
+
+class LineaPedido(models.Model):
+    pedido = models.ForeignKey(
+        Pedido,
+        on_delete=models.CASCADE,
+        related_name='lineas'
+    )
+    # El nombre y el precio se copian: el pedido no cambia si el producto sí
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='lineas_pedido'
+    )
+    nombre_producto = models.CharField(max_length=100)
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    cantidad = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    
+    class Meta:
+        verbose_name = "Línea de pedido"
+        verbose_name_plural = "Líneas de pedido"
+    
+    def __str__(self):
+        return f"{self.cantidad} x {self.nombre_producto} (pedido {self.pedido_id})"
+    
+    def subtotal(self):
+        """Calcula el subtotal de la línea"""
+        return self.precio_unitario * self.cantidad
+
+class InventarioMovimiento(models.Model):
+    """Libro de movimientos de stock: solo se agregan filas, nunca se editan"""
+    ALTA = 'alta'
+    AJUSTE = 'ajuste'
+    REPOSICION = 'reposicion'
+    RESERVA = 'reserva'
+    LIBERACION = 'liberacion'
+    VENCIMIENTO = 'vencimiento'
+    VENTA = 'venta'
+    MOTIVOS = [
+        (ALTA, 'Alta de producto'),
+        (AJUSTE, 'Ajuste manual'),
+        (REPOSICION, 'Reposición'),
+        (RESERVA, 'Reserva en carrito'),
+        (LIBERACION, 'Liberación de reserva'),
+        (VENCIMIENTO, 'Reserva vencida'),
+        (VENTA, 'Venta'),
+    ]
+    
+    # SET_NULL: borrar un producto no debe reescribir la historia
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='movimientos'
+    )
+    delta = models.IntegerField(verbose_name="Variación de unidades")
+    motivo = models.CharField(max_length=20, choices=MOTIVOS)
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='movimientos_inventario'
+    )
+    creado = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    class Meta:
+        verbose_name = "Movimiento de inventario"
+        verbose_name_plural = "Movimientos de inventario"
+        ordering = ['-creado']
+        indexes = [
+            # Historia de un producto en un rango de fechas (y la reconstrucción)
+            models.Index(fields=['producto', 'creado'], name='movimiento_producto_creado_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_motivo_display()}: {self.delta:+d} (producto {self.producto_id})"
+
+class ResumenInventarioDiario(models.Model):
+    """Consolidado diario del libro de movimientos (lo arma consolidar_inventario)"""
+    fecha = models.DateField(unique=True)
+    movimientos = models.PositiveIntegerField(default=0)
+    productos_modificados = models.PositiveIntegerField(default=0)
+    unidades_entrada = models.PositiveIntegerField(default=0)
+    unidades_salida = models.PositiveIntegerField(default=0)
+    inventario_total = models.IntegerField(
+        default=0,
+        verbose_name="Unidades en inventario al cierre"
+    )
+    
+    class Meta:
+        verbose_name = "Resumen diario de inventario"
+        verbose_name_plural = "Resúmenes diarios de inventario"
+        ordering = ['-fecha']
+    
+    def __str__(self):
+        return f"Inventario al {self.fecha:%d/%m/%Y}: {self.inventario_total}"
@@ -0,0 +1,136 @@
+"""
+Libro de movimientos de inventario con escritura diferida.
+
+Los movimientos no se insertan en el momento: se arman en memoria, pasan al
+búfer cuando la transacción que los originó se confirma (si se revierte, se
+descartan con ella) y el búfer se escribe con un solo bulk_create al cerrar
+el ámbito abierto por agrupar_movimientos. MovimientosMiddleware abre ese
+ámbito por request y además recuerda el usuario que hizo el cambio. Fuera de
+un ámbito (shell, comandos sin agrupar) cada confirmación escribe lo suyo.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+_pendientes = contextvars.ContextVar('movimientos_pendientes', default=None)
+_usuario = contextvars.ContextVar('movimientos_usuario', default=None)
+
+
+def _escribir(movimientos):
+    from .models import InventarioMovimiento
+
+    if movimientos:
+        InventarioMovimiento.objects.bulk_create(movimientos, batch_size=500)
+
+
+def _encolar(movimientos):
+    pendientes = _pendientes.get()
+    if pendientes is None:
+        _escribir(movimientos)
+    else:
+        pendientes.extend(movimientos)
+
+
+def vaciar_movimientos():
+    """Escribe ya lo acumulado en el ámbito actual (para procesos largos)"""
+    pendientes = _pendientes.get()
+    if pendientes:
+        _escribir(pendientes[:])
+        del pendientes[:]
+
+
+def _abrir_ambito(usuario):
+    return _pendientes.set([]), _usuario.set(usuario)
+
+
+def _cerrar_ambito(tokens):
+    """Restaura el contexto y devuelve lo acumulado en el ámbito"""
+    token_pendientes, token_usuario = tokens
+    pendientes = _pendientes.get()
+    _pendientes.reset(token_pendientes)
+    _usuario.reset(token_usuario)
+    return pendientes
+
+
+@contextmanager
+def agrupar_movimientos(usuario=None):
+    """
+    Acumula los movimientos confirmados dentro del bloque y los escribe al salir.
+
+    `usuario` (un User o un callable que lo devuelve) queda como autor de
+    los movimientos que no indiquen otro. Los bloques anidados se suman al
+    ámbito exterior.
+    """
+    if _pendientes.get() is not None:
+        yield
+        return
+    tokens = _abrir_ambito(usuario)
+    try:
+        yield
+    finally:
+        # Lo acumulado ya está confirmado en la base: se escribe aunque el bloque falle
+        _escribir(_cerrar_ambito(tokens))
+
+
+def _usuario_actual():
+    usuario = _usuario.get()
+    if callable(usuario):
+        usuario = usuario()
+    if usuario is None or not getattr(usuario, 'is_authenticated', False):
+        return None
+    return usuario
+
+
+def registrar_movimientos(deltas, motivo, usuario=None):
+    """
+    Agrega al libro de inventario un movimiento por producto {producto_id: delta}.
+
+    Todas las mutaciones de stock pasan por aquí (ver carrito.inventario y
+    Producto.save), así el libro y los consolidados diarios ven cada cambio.
+    """
+    from .models import InventarioMovimiento
+
+    usuario = usuario or _usuario_actual()
+    ahora = timezone.now()
+    movimientos = [
+        InventarioMovimiento(
+            producto_id=pk, delta=delta, motivo=motivo, usuario=usuario, creado=ahora
+        )
+        for pk, delta in deltas.items()
+        if delta
+    ]
+    if movimientos:
+        transaction.on_commit(partial(_encolar, movimientos))
+
+
+class MovimientosMiddleware:
+    """Agrupa los movimientos de cada request en un bulk_create al final"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincronico = iscoroutinefunction(get_response)
+        if self.asincronico:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincronico:
+            return self.__acall__(request)
+        with agrupar_movimientos(usuario=lambda: getattr(request, 'user', None)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Las vistas sync corren en otro hilo, pero asgiref les copia el contexto
+        # y comparten la misma lista de pendientes
+        tokens = _abrir_ambito(lambda: getattr(request, 'user', None))
+        try:
+            return await self.get_response(request)
+        finally:
+            pendientes = _cerrar_ambito(tokens)
+            if pendientes:
+                await sync_to_async(_escribir)(pendientes)
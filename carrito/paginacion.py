@@ -0,0 +1,63 @@
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def codificar_cursor(producto):
+    """Cursor opaco con la posición (creado, id) del último producto mostrado"""
+    crudo = f"{producto.creado.isoformat()}|{producto.pk}"
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (creado, id) o None si el cursor no es válido"""
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        creado, pk = base64.urlsafe_b64decode(cursor + relleno).decode().split('|')
+        creado = parse_datetime(creado)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if creado is None:
+        return None
+    return creado, pk
+
+
+def _desde_cursor(queryset, cursor):
+    queryset = queryset.order_by('-creado', '-id')
+    posicion = decodificar_cursor(cursor)
+    if posicion:
+        creado, pk = posicion
+        # creado <= c va aparte para que el motor use el índice como rango;
+        # con solo el OR, SQLite recorre el índice desde el principio
+        queryset = queryset.filter(creado__lte=creado).filter(
+            Q(creado__lt=creado) | Q(id__lt=pk)
+        )
+    return queryset
+
+
+def _cortar(objetos, tamano):
+    if len(objetos) > tamano:
+        objetos = objetos[:tamano]
+        return objetos, codificar_cursor(objetos[-1])
+    return objetos, None
+
+
+def pagina_por_cursor(queryset, cursor, tamano):
+    """
+    Paginación por clave (keyset) sobre (creado, id), de más nuevo a más viejo.
+
+    A diferencia de OFFSET, el costo de cada página no crece con su número:
+    la condición "después de (creado, id)" se resuelve con el índice
+    compuesto de Producto. Devuelve (objetos, cursor_siguiente o None).
+    """
+    return _cortar(list(_desde_cursor(queryset, cursor)[:tamano + 1]), tamano)
+
+
+async def apagina_por_cursor(queryset, cursor, tamano):
+    """pagina_por_cursor para vistas async"""
+    consulta = _desde_cursor(queryset, cursor)[:tamano + 1]
+    return _cortar([objeto async for objeto in consulta.aiterator()], tamano)
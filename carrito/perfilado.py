@@ -0,0 +1,256 @@
+"""
+Perfilado de consultas por request y detección de N+1.
+
+PerfiladoMiddleware (activo con TIENDA_PERFILADO, ver settings) envuelve
+cada conexión con un execute_wrapper mientras dura la request y anota de
+cada consulta el tiempo, la firma (el SQL con los parámetros, literales y
+listas de IN normalizados) y el primer archivo del proyecto en la pila que
+la originó. Una firma que se repite PERFILADO_REPETIDAS veces o más es un
+N+1 casi seguro: la misma consulta dentro de un for o de un template.
+
+El resultado va en la respuesta (Server-Timing y los encabezados
+X-Consultas*) y se acumula por endpoint en memoria del proceso para la
+página /admin/perf/. En modo estricto una vista que pasa su presupuesto
+de consultas lanza PresupuestoExcedido, así los tests lo ven como error.
+Las respuestas en streaming solo cuentan lo que corrió antes del primer
+bloque.
+"""
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+_perfil = contextvars.ContextVar('perfil_consultas', default=None)
+
+# Cadenas, números y placeholders pasan a '?'; las listas de IN a '(...)'
+_LITERALES = re.compile(r"'(?:[^']|'')*'|%s|\b\d+\b")
+_LISTAS = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+
+class PresupuestoExcedido(Exception):
+    """Una vista hizo más consultas que su presupuesto (modo estricto)"""
+
+
+def firma(sql):
+    """El SQL sin valores: dos consultas con la misma firma solo difieren en parámetros"""
+    sql = _LISTAS.sub('(...)', _LITERALES.sub('?', sql))
+    return ' '.join(sql.split())
+
+
+def _origen():
+    """archivo:línea (función) del primer marco del proyecto que no sea de Django ni de aquí"""
+    raiz = str(settings.BASE_DIR) + os.sep
+    marco = sys._getframe(1)
+    while marco is not None:
+        archivo = marco.f_code.co_filename
+        if archivo.startswith(raiz) and archivo != __file__ and 'site-packages' not in archivo:
+            return f'{os.path.relpath(archivo, raiz)}:{marco.f_lineno} ({marco.f_code.co_name})'
+        marco = marco.f_back
+    return '?'
+
+
+@dataclass
+class Consulta:
+    firma: str
+    segundos: float
+    origen: str
+
+
+@dataclass
+class Perfil:
+    """Las consultas de un bloque perfilado (normalmente una request)"""
+    consultas: list = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.consultas)
+
+    @property
+    def segundos(self):
+        return sum(consulta.segundos for consulta in self.consultas)
+
+    def repetidas(self, umbral=None):
+        """[(veces, firma, origen más frecuente)] de las firmas que llegan al umbral"""
+        if umbral is None:
+            umbral = getattr(settings, 'PERFILADO_REPETIDAS', 3)
+        veces = Counter(consulta.firma for consulta in self.consultas)
+        resultado = []
+        for sql, n in veces.most_common():
+            if n < umbral:
+                break
+            origenes = Counter(c.origen for c in self.consultas if c.firma == sql)
+            resultado.append((n, sql, origenes.most_common(1)[0][0]))
+        return resultado
+
+
+def _medir(perfil, execute, sql, params, many, context):
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        perfil.consultas.append(Consulta(firma(sql), time.perf_counter() - inicio, _origen()))
+
+
+def _envolver_conexiones(pila, perfil):
+    """Agrega _medir a las conexiones de este hilo; se quitan al cerrar la pila"""
+    for alias in connections:
+        pila.enter_context(connections[alias].execute_wrapper(partial(_medir, perfil)))
+
+
+@contextmanager
+def perfilar():
+    """
+    Anota en un Perfil las consultas de todas las conexiones dentro del bloque.
+
+    Las conexiones son por hilo: solo se cuentan las consultas del hilo que
+    abre el bloque. Los bloques anidados comparten el perfil exterior.
+    """
+    perfil = _perfil.get()
+    if perfil is not None:
+        yield perfil
+        return
+    perfil = Perfil()
+    token = _perfil.set(perfil)
+    try:
+        with ExitStack() as pila:
+            _envolver_conexiones(pila, perfil)
+            yield perfil
+    finally:
+        _perfil.reset(token)
+
+
+# -------------------------------
+# Acumulado por endpoint
+# -------------------------------
+
+@dataclass
+class Endpoint:
+    nombre: str
+    peticiones: int = 0
+    consultas: int = 0
+    consultas_max: int = 0
+    segundos: float = 0.0
+    segundos_max: float = 0.0
+    presupuesto: int = None
+    # La request con más consultas: su ruta y sus firmas repetidas
+    peor_ruta: str = ''
+    peor_repetidas: list = field(default_factory=list)
+
+    @property
+    def consultas_promedio(self):
+        return self.consultas / self.peticiones if self.peticiones else 0
+
+    @property
+    def ms_promedio(self):
+        return self.segundos * 1000 / self.peticiones if self.peticiones else 0
+
+    @property
+    def ms_max(self):
+        return self.segundos_max * 1000
+
+
+_endpoints = {}
+_candado = threading.Lock()
+
+
+def _acumular(nombre, limite, ruta, perfil, repetidas):
+    with _candado:
+        endpoint = _endpoints.get(nombre)
+        if endpoint is None:
+            endpoint = _endpoints[nombre] = Endpoint(nombre, presupuesto=limite)
+        endpoint.peticiones += 1
+        endpoint.consultas += len(perfil)
+        endpoint.segundos += perfil.segundos
+        endpoint.segundos_max = max(endpoint.segundos_max, perfil.segundos)
+        if len(perfil) >= endpoint.consultas_max:
+            endpoint.consultas_max = len(perfil)
+            endpoint.peor_ruta = ruta
+            endpoint.peor_repetidas = repetidas
+
+
+def peores_endpoints(limite=50):
+    """Los endpoints ordenados por su peor request (consultas y luego tiempo)"""
+    with _candado:
+        endpoints = list(_endpoints.values())
+    endpoints.sort(key=lambda e: (e.consultas_max, e.segundos_max), reverse=True)
+    return endpoints[:limite]
+
+
+def reiniciar_endpoints():
+    with _candado:
+        _endpoints.clear()
+
+
+def presupuesto(metodo, vista):
+    """Máximo de consultas para 'METODO vista', o para la vista con cualquier método (None: sin límite)"""
+    presupuestos = getattr(settings, 'PERFILADO_PRESUPUESTOS', {})
+    for clave in (f'{metodo} {vista}', vista):
+        if clave in presupuestos:
+            return presupuestos[clave]
+    return getattr(settings, 'PERFILADO_PRESUPUESTO', None)
+
+
+class PerfiladoMiddleware:
+    """Cuenta y mide las consultas de cada request (solo con PERFILADO activo)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFILADO', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.asincronico = iscoroutinefunction(get_response)
+        if self.asincronico:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincronico:
+            return self.__acall__(request)
+        with perfilar() as perfil:
+            respuesta = self.get_response(request)
+        return self.reportar(request, respuesta, perfil)
+
+    async def __acall__(self, request):
+        # Las consultas corren en el hilo de sync_to_async de la request, no en
+        # el del event loop: los wrappers se ponen y se quitan en ese hilo
+        perfil = Perfil()
+        pila = ExitStack()
+        await sync_to_async(_envolver_conexiones)(pila, perfil)
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            await sync_to_async(pila.close)()
+        return self.reportar(request, respuesta, perfil)
+
+    def reportar(self, request, respuesta, perfil):
+        match = request.resolver_match
+        nombre = f'{request.method} {match.view_name if match else request.path}'
+        limite = presupuesto(request.method, match.view_name) if match else None
+        repetidas = perfil.repetidas()
+        _acumular(nombre, limite, request.get_full_path(), perfil, repetidas[:5])
+
+        ms = perfil.segundos * 1000
+        respuesta['Server-Timing'] = f'db;dur={ms:.1f};desc="{len(perfil)} consultas"'
+        respuesta['X-Consultas'] = str(len(perfil))
+        respuesta['X-Consultas-Ms'] = f'{ms:.1f}'
+        if repetidas:
+            respuesta['X-Consultas-Repetidas'] = '; '.join(
+                f'{veces}x {origen}' for veces, _, origen in repetidas[:3]
+            )
+
+        if getattr(settings, 'PERFILADO_ESTRICTO', False) and limite is not None and len(perfil) > limite:
+            detalle = ''.join(f'\n  {veces}x {origen}: {sql}' for veces, sql, origen in repetidas)
+            raise PresupuestoExcedido(
+                f'{nombre} hizo {len(perfil)} consultas (presupuesto {limite}){detalle}'
+            )
+        return respuesta
@@ -0,0 +1,120 @@
+"""
+Altas y bajas en bloque de permisos y grupos.
+
+Trabaja directo sobre la tabla intermedia de una relación muchos a muchos
+(User.user_permissions, User.groups, Group.permissions): lee en una pasada
+qué pares ya existen para todos los orígenes, inserta los que
+faltan con bulk_create(ignore_conflicts=True) en lotes y borra con un solo
+DELETE. `.set()` por usuario hacía dos o tres consultas por cada uno.
+
+Como no pasa por los related managers, no emite m2m_changed.
+"""
+from itertools import islice
+
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models import QuerySet
+
+TAMANO_LOTE = 1000
+
+GRUPO_TOTAL = 'Administradores Totales'
+
+# Grupos que se crean (y se mantienen al día) en cada migrate
+GRUPOS = {
+    GRUPO_TOTAL: None,  # todos los permisos
+    'Gestores de Productos': ['add_producto', 'change_producto', 'delete_producto', 'view_producto'],
+}
+
+
+def _tabla(relacion):
+    """(modelo intermedio, columna del origen, columna del destino) de un descriptor m2m"""
+    campo = relacion.field
+    intermedia = campo.remote_field.through
+    return (
+        intermedia,
+        intermedia._meta.get_field(campo.m2m_field_name()).attname,
+        intermedia._meta.get_field(campo.m2m_reverse_field_name()).attname,
+    )
+
+
+def _filtro(objetos):
+    """Para filtrar con __in: subconsulta si es un queryset, lista de pks si no"""
+    if isinstance(objetos, QuerySet):
+        return objetos.values('pk')
+    return [getattr(objeto, 'pk', objeto) for objeto in objetos]
+
+
+def _pks(objetos):
+    if isinstance(objetos, QuerySet):
+        return list(objetos.values_list('pk', flat=True))
+    return [getattr(objeto, 'pk', objeto) for objeto in objetos]
+
+
+def agregar_en_lote(relacion, origenes, destinos):
+    """
+    Agrega cada destino a cada origen (por ejemplo todos los permisos a los
+    usuarios seleccionados) y devuelve cuántas filas insertó.
+    """
+    intermedia, columna_origen, columna_destino = _tabla(relacion)
+    origenes, destinos = _pks(origenes), _pks(destinos)
+    if not origenes or not destinos:
+        return 0
+
+    with transaction.atomic():
+        existentes = _existentes(intermedia, columna_origen, columna_destino, origenes, destinos)
+        nuevas = (
+            intermedia(**{columna_origen: origen, columna_destino: destino})
+            for origen in origenes for destino in destinos
+            if (origen, destino) not in existentes
+        )
+        insertadas = 0
+        while lote := list(islice(nuevas, TAMANO_LOTE)):
+            # ignore_conflicts: otra request pudo agregar el mismo par entretanto
+            intermedia.objects.bulk_create(lote, ignore_conflicts=True)
+            insertadas += len(lote)
+    return insertadas
+
+
+def _existentes(intermedia, columna_origen, columna_destino, origenes, destinos):
+    """Pares ya presentes, consultando por tandas de orígenes"""
+    existentes = set()
+    for inicio in range(0, len(origenes), TAMANO_LOTE):
+        existentes.update(
+            intermedia.objects.filter(**{
+                f'{columna_origen}__in': origenes[inicio:inicio + TAMANO_LOTE],
+                f'{columna_destino}__in': destinos,
+            }).values_list(columna_origen, columna_destino)
+        )
+    return existentes
+
+
+def quitar_en_lote(relacion, origenes, destinos=None):
+    """Quita los destinos (todos si es None) de cada origen con un DELETE; devuelve cuántas filas"""
+    intermedia, columna_origen, columna_destino = _tabla(relacion)
+    filas = intermedia.objects.filter(**{f'{columna_origen}__in': _filtro(origenes)})
+    if destinos is not None:
+        filas = filas.filter(**{f'{columna_destino}__in': _filtro(destinos)})
+    # Sin receptores ni cascadas en la tabla intermedia: Django la borra con un DELETE
+    return filas.delete()[0]
+
+
+def fijar_en_lote(relacion, origenes, destinos):
+    """Deja a cada origen exactamente con `destinos`; devuelve (agregadas, quitadas)"""
+    intermedia, columna_origen, columna_destino = _tabla(relacion)
+    with transaction.atomic():
+        sobrantes = intermedia.objects.filter(
+            **{f'{columna_origen}__in': _filtro(origenes)}
+        ).exclude(**{f'{columna_destino}__in': _filtro(destinos)})
+        quitadas = sobrantes.delete()[0]
+        agregadas = agregar_en_lote(relacion, origenes, destinos)
+    return agregadas, quitadas
+
+
+def asegurar_grupos():
+    """Crea los GRUPOS que falten y les fija sus permisos"""
+    for nombre, codenames in GRUPOS.items():
+        grupo, _ = Group.objects.get_or_create(name=nombre)
+        permisos = Permission.objects.all()
+        if codenames is not None:
+            permisos = permisos.filter(content_type__app_label='carrito', codename__in=codenames)
+        fijar_en_lote(Group.permissions, [grupo], permisos)
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from .cache import invalidar_productos
+
+PRECIO_MINIMO = Decimal('0.01')
+
+
+def cambiar_precios_en_lote(queryset, porcentaje):
+    """
+    Aplica un cambio porcentual al precio de todos los productos del queryset.
+
+    Un único UPDATE con F() (redondeado a centavos y nunca por debajo del
+    precio mínimo) y otro que recalcula los totales de los carritos que
+    tienen alguno de esos productos. Devuelve la lista de IDs modificados.
+    """
+    from .models import Carrito, ItemCarrito
+
+    porcentaje = Decimal(str(porcentaje))
+    if porcentaje <= -100:
+        raise ValueError("El porcentaje debe ser mayor a -100")
+    factor = Value(1 + porcentaje / 100, output_field=DecimalField(max_digits=12, decimal_places=6))
+    precio = DecimalField(max_digits=10, decimal_places=2)
+
+    with transaction.atomic():
+        pks = list(queryset.order_by().select_for_update().values_list('pk', flat=True))
+        if not pks or not porcentaje:
+            return []
+        queryset.model.objects.filter(pk__in=pks).update(
+            precio=Greatest(
+                Round(F('precio') * factor, 2, output_field=precio),
+                Value(PRECIO_MINIMO, output_field=precio)
+            ),
+            actualizado=timezone.now()
+        )
+        Carrito.reconciliar_totales(
+            Carrito.objects.filter(
+                pk__in=ItemCarrito.objects.filter(producto__in=pks).values('carrito')
+            )
+        )
+        invalidar_productos(pks)
+    return pks
@@ -0,0 +1,113 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Avg, Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import InventarioMovimiento, ItemCarrito, Producto, ResumenInventarioDiario
+
+
+def estadisticas_inventario():
+    """Valor, unidades, precio promedio y productos sin imagen en una sola consulta"""
+    return Producto.objects.aggregate(
+        total_inventario=Coalesce(Sum('inventario'), 0),
+        valor_total=Coalesce(
+            Sum(F('inventario') * F('precio'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            0,
+            output_field=DecimalField(max_digits=14, decimal_places=2)
+        ),
+        precio_promedio=Avg('precio'),
+        productos_sin_imagen=Count('id', filter=Q(imagen__isnull=True) | Q(imagen='')),
+    )
+
+
+def productos_populares(limite=10):
+    """Productos con más unidades en carritos activos"""
+    return ItemCarrito.objects.values(
+        'producto__nombre'
+    ).annotate(
+        total_vendido=Sum('cantidad'),
+        veces_agregado=Count('id')
+    ).order_by('-total_vendido')[:limite]
+
+
+def historial_inventario(dias=30):
+    """Consolidados diarios de los últimos `dias` días (una fila por día con movimientos)"""
+    fecha_limite = timezone.localdate() - datetime.timedelta(days=dias)
+    return ResumenInventarioDiario.objects.filter(fecha__gte=fecha_limite).order_by('fecha')
+
+
+def inventario_en(momento, productos=None):
+    """
+    Stock de cada producto en `momento`, deshaciendo los movimientos posteriores.
+
+    Parte del inventario actual y resta lo que el libro registró después,
+    así que solo lee los movimientos del período a deshacer (índice por
+    producto y fecha). Devuelve {producto_id: unidades}; los productos
+    creados después de `momento` o ya borrados no aparecen.
+    """
+    actuales = Producto.objects.filter(creado__lte=momento)
+    posteriores = InventarioMovimiento.objects.filter(creado__gt=momento, producto__isnull=False)
+    if productos is not None:
+        actuales = actuales.filter(pk__in=productos)
+        posteriores = posteriores.filter(producto__in=productos)
+
+    deshacer = dict(
+        posteriores.values('producto').annotate(total=Sum('delta')).values_list('producto', 'total')
+    )
+    return {
+        pk: inventario - deshacer.get(pk, 0)
+        for pk, inventario in actuales.values_list('pk', 'inventario').iterator(chunk_size=2000)
+    }
+
+
+def consolidar_resumenes():
+    """
+    Agrega al consolidado diario los movimientos que todavía no están resumidos.
+
+    Retoma desde el último día consolidado, inclusive: esa fila pudo
+    escribirse antes de que terminara el día, así que se rehace con todo lo
+    movido desde su comienzo, partiendo del saldo del día anterior. Cada
+    corrida solo lee los movimientos desde ese día. Si no hay consolidado
+    previo, el saldo de partida se deduce del stock actual menos todo lo
+    movido desde entonces. Devuelve los días escritos.
+    """
+    desde = ResumenInventarioDiario.objects.order_by('-fecha').values_list('fecha', flat=True).first()
+    if desde:
+        anterior = ResumenInventarioDiario.objects.filter(fecha__lt=desde).order_by('-fecha').first()
+    else:
+        primero = InventarioMovimiento.objects.order_by('creado').values_list('creado', flat=True).first()
+        if primero is None:
+            return 0
+        desde = timezone.localdate(primero)
+        anterior = None
+    inicio = timezone.make_aware(datetime.datetime.combine(desde, datetime.time.min))
+
+    with transaction.atomic():
+        nuevos = InventarioMovimiento.objects.filter(creado__gte=inicio)
+        if anterior:
+            saldo = anterior.inventario_total
+        else:
+            saldo = (
+                Producto.objects.aggregate(total=Coalesce(Sum('inventario'), 0))['total']
+                - nuevos.aggregate(total=Coalesce(Sum('delta'), 0))['total']
+            )
+
+        por_dia = nuevos.annotate(
+            fecha=TruncDate('creado')
+        ).values('fecha').annotate(
+            movimientos=Count('id'),
+            productos_modificados=Count('producto', distinct=True),
+            unidades_entrada=Coalesce(Sum('delta', filter=Q(delta__gt=0)), 0),
+            unidades_salida=Coalesce(-Sum('delta', filter=Q(delta__lt=0)), 0),
+        ).order_by('fecha')
+
+        resumenes = []
+        for dia in por_dia:
+            saldo += dia['unidades_entrada'] - dia['unidades_salida']
+            resumenes.append(ResumenInventarioDiario(inventario_total=saldo, **dia))
+
+        ResumenInventarioDiario.objects.filter(fecha__gte=desde).delete()
+        ResumenInventarioDiario.objects.bulk_create(resumenes)
+    return len(resumenes)
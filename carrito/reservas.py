@@ -0,0 +1,114 @@
+"""
+Vencimiento de las reservas de stock de los carritos.
+
+Agregar al carrito descuenta las unidades del inventario en el momento, y
+antes solo volvían si el usuario las quitaba o compraba: un carrito
+abandonado las retenía para siempre. Cada ItemCarrito guarda ahora en
+reserva_vence hasta cuándo vale su reserva (RESERVA_CARRITO_SEGUNDOS desde
+la última vez que se agregó o quitó algo de esa línea), y
+liberar_reservas_vencidas borra las líneas vencidas en lotes devolviendo
+sus unidades al inventario.
+"""
+import datetime
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .inventario import liberar_stock_en_lote
+
+TAMANO_LOTE = 1000
+
+
+def _duracion():
+    return getattr(settings, 'RESERVA_CARRITO_SEGUNDOS', 60 * 60 * 2)
+
+
+def vencimiento_reserva(desde=None):
+    """Hasta cuándo vale una reserva hecha (o renovada) en `desde`"""
+    return (desde or timezone.now()) + datetime.timedelta(seconds=_duracion())
+
+
+@dataclass
+class Barrido:
+    """Lo que liberó una pasada de liberar_reservas_vencidas"""
+    lotes: int = 0
+    lineas: int = 0
+    unidades: int = 0
+    productos: set = field(default_factory=set)
+    carritos: set = field(default_factory=set)
+    segundos: float = 0.0
+
+
+def _liberar_lote(ahora, tamano_lote):
+    """Libera un lote de líneas vencidas; devuelve (líneas, unidades, productos, carritos)"""
+    from .models import Carrito, InventarioMovimiento, ItemCarrito, Producto
+
+    saltear = connection.features.has_select_for_update_skip_locked
+    vencidas = ItemCarrito.objects.filter(reserva_vence__lt=ahora)
+    with transaction.atomic():
+        # Se bloquea en el mismo orden que las requests (carrito, línea,
+        # producto) y todo con skip_locked: un carrito en checkout, una línea
+        # que se está agregando o quitando o un producto que otra transacción
+        # tiene tomado se saltean y caen en la próxima pasada. El barrido
+        # nunca espera un bloqueo, así que no puede trabarse con una request.
+        carritos = list(
+            Carrito.objects.select_for_update(skip_locked=saltear).filter(
+                pk__in=vencidas.order_by('reserva_vence').values('carrito_id')[:tamano_lote]
+            ).values_list('pk', flat=True)
+        )
+        if not carritos:
+            return 0, 0, set(), set()
+        lineas = list(
+            vencidas.select_for_update(skip_locked=saltear).filter(carrito__in=carritos).values_list(
+                'pk', 'carrito_id', 'producto_id', 'cantidad_reservada'
+            )
+        )
+        libres = set(
+            Producto.objects.select_for_update(skip_locked=saltear).filter(
+                pk__in={producto_id for _, _, producto_id, _ in lineas}
+            ).values_list('pk', flat=True)
+        )
+        lineas = [linea for linea in lineas if linea[2] in libres]
+        if not lineas:
+            return 0, 0, set(), set()
+
+        unidades = {}
+        for _, _, producto_id, reservada in lineas:
+            unidades[producto_id] = unidades.get(producto_id, 0) + reservada
+        liberar_stock_en_lote(unidades, motivo=InventarioMovimiento.VENCIMIENTO)
+        ItemCarrito.objects.filter(pk__in=[pk for pk, *_ in lineas]).delete()
+        carritos = {carrito_id for _, carrito_id, _, _ in lineas}
+        Carrito.reconciliar_totales(Carrito.objects.filter(pk__in=carritos))
+    return len(lineas), sum(unidades.values()), set(unidades), carritos
+
+
+def liberar_reservas_vencidas(tamano_lote=TAMANO_LOTE, al_liberar_lote=None, ahora=None):
+    """
+    Borra las líneas de carrito con la reserva vencida y devuelve un Barrido.
+
+    Cada lote es una transacción corta con la misma cantidad de sentencias
+    sin importar cuántas líneas traiga: los SELECT que bloquean carritos
+    (elegidos por el índice de reserva_vence), líneas y productos, un
+    único UPDATE que devuelve a cada producto la suma de sus unidades
+    (anotada en el libro como 'vencimiento'), el DELETE de las líneas y el
+    UPDATE que recalcula los totales de los carritos tocados.
+    """
+    ahora = ahora or timezone.now()
+    barrido = Barrido()
+    inicio = time.perf_counter()
+    while True:
+        lineas, unidades, productos, carritos = _liberar_lote(ahora, tamano_lote)
+        if not lineas:
+            break
+        barrido.lotes += 1
+        barrido.lineas += lineas
+        barrido.unidades += unidades
+        barrido.productos |= productos
+        barrido.carritos |= carritos
+        if al_liberar_lote:
+            al_liberar_lote(barrido)
+    barrido.segundos = time.perf_counter() - inicio
+    return barrido
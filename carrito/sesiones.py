@@ -0,0 +1,74 @@
+"""
+Sesiones con vencimiento deslizante sin escribir en cada request.
+
+SESSION_SAVE_EVERY_REQUEST renovaba el vencimiento guardando la sesión en
+cada página vista (un UPDATE a django_session por request). SesionMiddleware
+anota en la propia sesión cuándo se guardó por última vez y solo la vuelve
+a guardar cuando pasaron SESION_RENOVAR_CADA segundos: con dos semanas de
+vida y renovación diaria, una sesión activa vence entre 13 y 14 días
+después de la última visita, con a lo sumo una escritura por día.
+
+El motor se elige con TIENDA_SESIONES (ver settings): cached_db lee de la
+caché y solo va a la base al guardar; signed_cookies no toca la base. Las
+filas vencidas las borra barrer_sesiones_vencidas en lotes.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import transaction
+from django.utils import timezone
+
+CLAVE_RENOVADA = '_renovada'
+TAMANO_LOTE = 2000
+
+
+def _renovar_cada():
+    return getattr(settings, 'SESION_RENOVAR_CADA', 60 * 60 * 24)
+
+
+def sellar_sesion(sesion):
+    """Anota que la sesión se guarda ahora (la marca como modificada)"""
+    sesion[CLAVE_RENOVADA] = int(time.time())
+
+
+class SesionMiddleware(SessionMiddleware):
+    """SessionMiddleware que renueva el vencimiento solo al cruzar el umbral"""
+
+    def process_response(self, request, response):
+        sesion = getattr(request, 'session', None)
+        # Solo sesiones ya leídas: revisar el sello no debe provocar una lectura
+        if (
+            sesion is not None and sesion.accessed and not sesion.is_empty()
+            and not sesion.get_expire_at_browser_close()
+        ):
+            vencida = time.time() - sesion.get(CLAVE_RENOVADA, 0) >= _renovar_cada()
+            if sesion.modified or vencida:
+                # Al quedar modificada el padre la guarda y reenvía la cookie
+                sellar_sesion(sesion)
+        return super().process_response(request, response)
+
+
+def barrer_sesiones_vencidas(tamano_lote=TAMANO_LOTE, al_borrar_lote=None):
+    """
+    Borra las sesiones vencidas de django_session en lotes y devuelve cuántas.
+
+    Cada lote es una transacción corta (un SELECT por el índice de
+    expire_date y un DELETE por clave), así el barrido no bloquea la base
+    mientras atiende requests. No aplica a signed_cookies, que no guarda filas.
+    """
+    from django.contrib.sessions.models import Session
+
+    ahora = timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            claves = list(
+                Session.objects.filter(expire_date__lt=ahora).values_list('pk', flat=True)[:tamano_lote]
+            )
+            if not claves:
+                return total
+            Session.objects.filter(pk__in=claves).delete()
+        total += len(claves)
+        if al_borrar_lote:
+            al_borrar_lote(total)
@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .busqueda import obtener_motor
+from .cache import invalidar_panel, invalidar_productos
+from .carritos import fusionar_carrito_anonimo
+from .models import InventarioMovimiento, Producto
+from .movimientos import registrar_movimientos
+from .permisos import asegurar_grupos
+from .sesiones import sellar_sesion
+
+
+@receiver(post_save, sender=Producto)
+def indexar_producto(sender, instance, **kwargs):
+    """Mantiene el índice de búsqueda y la caché al día con cada guardado"""
+    obtener_motor().indexar([instance])
+    invalidar_productos([instance.pk])
+
+
+@receiver(pre_delete, sender=Producto)
+def cerrar_stock_en_libro(sender, instance, **kwargs):
+    """
+    El stock que se va con el producto sale del libro como un ajuste.
+
+    Sin él los saldos de ResumenInventarioDiario dejan de cuadrar con el
+    stock real. El movimiento se escribe al confirmar, cuando el producto ya
+    no existe: queda sin producto, como el resto de su historia (SET_NULL).
+    """
+    registrar_movimientos({None: -instance.inventario}, InventarioMovimiento.AJUSTE)
+
+
+@receiver(post_delete, sender=Producto)
+def desindexar_producto(sender, instance, **kwargs):
+    obtener_motor().eliminar([instance.pk])
+    invalidar_productos([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def contar_usuario_nuevo(sender, instance, created, **kwargs):
+    """El panel muestra el total de usuarios: solo cambia con altas y bajas"""
+    if created:
+        invalidar_panel()
+
+
+@receiver(post_delete, sender=User)
+def descontar_usuario(sender, instance, **kwargs):
+    invalidar_panel()
+
+
+def crear_grupos(sender, using, **kwargs):
+    """Grupos de permisos predefinidos; se conecta a post_migrate en CarritoConfig.ready"""
+    asegurar_grupos()
+
+
+@receiver(user_logged_in)
+def fusionar_carrito(sender, request, user, **kwargs):
+    """Pasa el carrito anónimo (cookie) al del usuario en login_view, LoginView y registro"""
+    if request is not None:
+        fusionar_carrito_anonimo(request, user)
+
+
+@receiver(user_logged_in)
+def sellar_sesion_nueva(sender, request, user, **kwargs):
+    """login() ya guarda la sesión: cuenta como renovada (también con force_login)"""
+    if request is not None and hasattr(request, 'session'):
+        sellar_sesion(request.session)
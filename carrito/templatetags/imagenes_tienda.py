@@ -0,0 +1,17 @@
+from django import template
+
+from carrito.imagenes import fuentes
+
+register = template.Library()
+
+
+@register.inclusion_tag('carrito/imagen_responsive.html')
+def imagen_responsive(producto, perfil, clase='', estilo='', diferida=True):
+    """<picture> con un srcset por formato (AVIF/WebP/JPEG) para el perfil indicado"""
+    return {
+        'producto': producto,
+        'imagen': fuentes(producto, perfil),
+        'clase': clase,
+        'estilo': estilo,
+        'diferida': diferida,
+    }
@@ -1,3 +1,465 @@
-from django.test import TestCase
+import datetime
+import threading
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.models import F, Sum
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .auditoria import auditar
+from .bd import REPLICA, leer_de_replica
+from .busqueda import buscar_productos
+from .cache import CLAVE_CATALOGO, _aversion, _version
+from .consultas import resumen_carrito
+from .estadisticas import calcular_estadisticas
+from .models import Carrito, InventarioMovimiento, LineaPedido, Producto, ResumenInventarioDiario
+from .perfilado import PresupuestoExcedido, peores_endpoints, perfilar, reiniciar_endpoints
+from .permisos import GRUPO_TOTAL
+from .reportes import consolidar_resumenes
+from .reservas import liberar_reservas_vencidas
+
+
+class ResumenCarritoTests(TestCase):
+    """Las páginas del carrito deben costar lo mismo con 1 o con 50 líneas"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('cliente', password='clave-segura-123')
+        self.carrito = Carrito.objects.create(usuario=self.usuario)
+        self.client.force_login(self.usuario)
+
+    def llenar_carrito(self, lineas):
+        for i in range(lineas):
+            producto = Producto.objects.create(
+                nombre=f'Producto {i}',
+                descripcion='Prueba',
+                precio=Decimal('2.50'),
+                inventario=10
+            )
+            self.carrito.agregar_producto(producto, 2)
+
+    # Usuario, carrito e ítems: la sesión sale de la caché y no se reescribe
+    MAXIMO_CONSULTAS = 3
+
+    def contar_consultas(self, url, metodo='get'):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = getattr(self.client, metodo)(url)
+        self.assertLess(respuesta.status_code, 400)
+        return len(consultas)
+
+    def test_resumen_calcula_totales_en_sql(self):
+        self.llenar_carrito(3)
+        with self.assertNumQueries(1):
+            resumen = resumen_carrito(self.carrito)
+        self.assertEqual(resumen.total, Decimal('15.00'))
+        self.assertEqual(resumen.unidades, 6)
+        self.assertTrue(resumen.stock_suficiente)
+        self.assertEqual(resumen.items[0].subtotal_linea, Decimal('5.00'))
+        self.assertEqual(resumen.items[0].maximo_disponible, 10)
+
+    def test_ver_carrito_consultas_constantes(self):
+        self.llenar_carrito(1)
+        pocas = self.contar_consultas(reverse('carrito:ver_carrito'))
+        self.llenar_carrito(49)
+        muchas = self.contar_consultas(reverse('carrito:ver_carrito'))
+        self.assertEqual(pocas, muchas)
+        self.assertLessEqual(muchas, self.MAXIMO_CONSULTAS)
+
+    def test_checkout_consultas_constantes(self):
+        self.llenar_carrito(1)
+        pocas = self.contar_consultas(reverse('carrito:checkout'))
+        self.llenar_carrito(49)
+        muchas = self.contar_consultas(reverse('carrito:checkout'))
+        self.assertEqual(pocas, muchas)
+        self.assertLessEqual(muchas, self.MAXIMO_CONSULTAS)
+
+
+class PanelAdministracionTests(TestCase):
+    """El panel no debe crecer en consultas con el catálogo y debe cachearse"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('admin', password='clave-segura-123', is_staff=True)
+        self.client.force_login(self.admin)
+
+    def crear_productos(self, cantidad, inventario=3):
+        Producto.objects.bulk_create(
+            Producto(nombre=f'Producto {i}', descripcion='Prueba', precio=Decimal('1.00'), inventario=inventario)
+            for i in range(cantidad)
+        )
+
+    def contar_consultas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('carrito:admin_panel'))
+        self.assertEqual(respuesta.status_code, 200)
+        return len(consultas)
+
+    def test_contadores_en_una_consulta(self):
+        self.crear_productos(3, inventario=0)
+        self.crear_productos(2, inventario=10)
+        with self.assertNumQueries(4):
+            estadisticas = calcular_estadisticas()
+        self.assertEqual(estadisticas['total_productos'], 5)
+        self.assertEqual(estadisticas['bajo_stock'], 3)
+        self.assertEqual(estadisticas['agotados'], 3)
+        self.assertEqual(estadisticas['total_usuarios'], 1)
+
+    def test_consultas_constantes_y_cacheadas(self):
+        self.crear_productos(5)
+        # Con cached_db la caché también guarda la sesión: las dos mediciones en frío
+        cache.clear()
+        frio = self.contar_consultas()
+        cache.clear()
+        self.crear_productos(200)
+        cache.clear()
+        self.assertEqual(self.contar_consultas(), frio)
+        # Con la caché caliente solo quedan sesión y usuario
+        self.assertLess(self.contar_consultas(), frio)
+
+    def test_se_invalida_al_cambiar_productos(self):
+        self.crear_productos(1)
+        self.client.get(reverse('carrito:admin_panel'))
+        producto = Producto.objects.create(nombre='Nuevo', descripcion='Prueba', precio=Decimal('1.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.save()
+        respuesta = self.client.get(reverse('carrito:admin_panel'))
+        self.assertEqual(respuesta.context['total_productos'], 2)
+
+
+class VersionesCacheTests(TestCase):
+    """Si otra request crea la versión entre el get y el add, se usa la guardada"""
+
+    def test_add_perdido_usa_la_version_guardada(self):
+        for nombre, version in (('sync', _version), ('async', async_to_sync(_aversion))):
+            with self.subTest(nombre):
+                cache.clear()
+                cache.set(CLAVE_CATALOGO, 42, None)
+                leer = cache.get
+                lecturas = []
+
+                def get(*args):
+                    # El primer get no la ve, como si la otra request la escribiera justo después
+                    lecturas.append(args)
+                    return None if len(lecturas) == 1 else leer(*args)
+
+                with mock.patch.object(cache, 'get', side_effect=get):
+                    self.assertEqual(version(CLAVE_CATALOGO), 42)
+                self.assertEqual(cache.get(CLAVE_CATALOGO), 42)
+
+
+class ExportacionTests(TestCase):
+    """Bajo ASGI la exportación sale bloque a bloque, no leída entera antes de mandarla"""
+
+    def test_asgi_recibe_un_cuerpo_async(self):
+        Producto.objects.bulk_create(
+            Producto(nombre=f'Producto {i}', descripcion='Prueba', precio=Decimal('1.00'), inventario=1)
+            for i in range(5)
+        )
+        self.async_client.force_login(User.objects.create_user('admin', is_staff=True))
+
+        async def descargar():
+            respuesta = await self.async_client.get(
+                reverse('carrito:admin_exportar', args=['productos', 'jsonl'])
+            )
+            self.assertTrue(respuesta.is_async)
+            return b''.join([bloque async for bloque in respuesta.streaming_content])
+
+        self.assertEqual(len(async_to_sync(descargar)().splitlines()), 5)
+
+
+class AuditoriaIndicesTests(TestCase):
+    """Ninguna consulta caliente debe recorrer una tabla entera"""
+
+    def test_consultas_calientes_usan_indices(self):
+        for nombre, plan, escaneos in auditar():
+            with self.subTest(nombre):
+                self.assertEqual(escaneos, [], plan)
+
+
+class BusquedaTests(TestCase):
+    """Los filtros del listado se aplican antes del tope de resultados del motor"""
+
+    def test_agotados_no_desplazan_a_los_disponibles(self):
+        for i in range(25):
+            Producto.objects.create(nombre=f'Cable {i}', descripcion='Cable USB', precio=Decimal('1.00'), inventario=0)
+        disponible = Producto.objects.create(
+            nombre='Adaptador', descripcion='Incluye cable', precio=Decimal('1.00'), inventario=3
+        )
+        respuesta = self.client.get(reverse('carrito:busqueda_productos'), {'q': 'cable'})
+        self.assertEqual([r['id'] for r in respuesta.json()['resultados']], [disponible.pk])
+
+
+@skipUnless(REPLICA in settings.DATABASES, 'sin base réplica (TIENDA_DB_REPLICA_HOST)')
+class BusquedaReplicaTests(TransactionTestCase):
+    """Dentro de desde_replica el motor de búsqueda también lee de la réplica"""
+    databases = set(settings.DATABASES)
+
+    def test_motor_lee_de_la_replica(self):
+        with CaptureQueriesContext(connections[REPLICA]) as consultas, leer_de_replica():
+            list(buscar_productos('cable', Producto.objects.filter(inventario__gt=0)))
+        self.assertEqual(len(consultas), 1)
+
+
+class ConsolidadoInventarioTests(TestCase):
+    """Lo movido después de consolidar un día se suma a ese día en la corrida siguiente"""
+
+    def test_rehace_el_ultimo_dia_consolidado(self):
+        dia = timezone.localdate() - datetime.timedelta(days=2)
+        producto = Producto.objects.create(nombre='Taza', descripcion='Prueba', precio=Decimal('3.00'), inventario=10)
+        InventarioMovimiento.objects.all().delete()
+
+        def mover(delta, hora, dias=0):
+            InventarioMovimiento.objects.create(
+                producto=producto, delta=delta, motivo=InventarioMovimiento.AJUSTE,
+                creado=timezone.make_aware(datetime.datetime.combine(dia + datetime.timedelta(days=dias), hora))
+            )
+            Producto.objects.filter(pk=producto.pk).update(inventario=F('inventario') + delta)
+
+        InventarioMovimiento.objects.create(
+            producto=producto, delta=10, motivo=InventarioMovimiento.ALTA,
+            creado=timezone.make_aware(datetime.datetime.combine(dia, datetime.time(9)))
+        )
+        self.assertEqual(consolidar_resumenes(), 1)
+        mover(5, datetime.time(18))
+        mover(-3, datetime.time(10), dias=1)
+        self.assertEqual(consolidar_resumenes(), 2)
+
+        self.assertEqual(
+            list(ResumenInventarioDiario.objects.order_by('fecha').values_list(
+                'fecha', 'movimientos', 'unidades_entrada', 'unidades_salida', 'inventario_total'
+            )),
+            [(dia, 2, 15, 0, 15), (dia + datetime.timedelta(days=1), 1, 0, 3, 12)]
+        )
+
+    def test_borrar_un_producto_cierra_su_stock(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            taza = Producto.objects.create(nombre='Taza', descripcion='Prueba', precio=Decimal('3.00'), inventario=10)
+            Producto.objects.create(nombre='Plato', descripcion='Prueba', precio=Decimal('5.00'), inventario=4)
+        ayer = timezone.localdate() - datetime.timedelta(days=1)
+        InventarioMovimiento.objects.update(creado=F('creado') - datetime.timedelta(days=1))
+        self.assertEqual(consolidar_resumenes(), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            taza.delete()
+        consolidar_resumenes()
+        self.assertEqual(
+            list(ResumenInventarioDiario.objects.order_by('fecha').values_list('fecha', 'inventario_total')),
+            [(ayer, 14), (timezone.localdate(), 4)]
+        )
+
+
+class LibroVentasTests(TestCase):
+    """Cada unidad vendida sale del libro como 'venta', reservada o no"""
+
+    def test_venta_completa_en_el_libro(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            taza = Producto.objects.create(nombre='Taza', descripcion='Prueba', precio=Decimal('3.00'), inventario=10)
+            plato = Producto.objects.create(nombre='Plato', descripcion='Prueba', precio=Decimal('5.00'), inventario=10)
+            carrito = Carrito.objects.create(usuario=User.objects.create_user('comprador'))
+            carrito.agregar_producto(taza, 3)
+            # Línea sin reserva (cargada desde el admin): se descuenta al confirmar
+            carrito.items.create(producto=plato, cantidad=2)
+            carrito.confirmar_pedido()
+
+        def suma(**filtro):
+            return dict(
+                InventarioMovimiento.objects.filter(**filtro).values('producto')
+                .annotate(total=Sum('delta')).values_list('producto', 'total')
+            )
+
+        self.assertEqual(suma(motivo=InventarioMovimiento.VENTA), {taza.pk: -3, plato.pk: -2})
+        self.assertEqual(suma(), {taza.pk: 7, plato.pk: 8})
+        self.assertEqual(suma(motivo__in=['reserva', 'liberacion', 'vencimiento']), {taza.pk: 0})
+
+
+class LibroAdminTests(TestCase):
+    """Editar el inventario desde la lista del admin (list_editable) queda en el libro"""
+
+    def test_list_editable_anota_ajuste(self):
+        admin = User.objects.create_superuser('jefe', password='clave-segura-123')
+        self.client.force_login(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            producto = Producto.objects.create(nombre='Taza', descripcion='Prueba', precio=Decimal('3.00'), inventario=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(reverse('admin:carrito_producto_changelist'), {
+                'form-TOTAL_FORMS': '1',
+                'form-INITIAL_FORMS': '1',
+                'form-0-id': str(producto.pk),
+                'form-0-inventario': '4',
+                '_save': 'Guardar',
+            })
+        self.assertEqual(respuesta.status_code, 302)
+        producto.refresh_from_db()
+        self.assertEqual(producto.inventario, 4)
+        self.assertEqual(
+            list(InventarioMovimiento.objects.filter(producto=producto).values_list('motivo', 'delta').order_by('pk')),
+            [(InventarioMovimiento.ALTA, 10), (InventarioMovimiento.AJUSTE, -6)]
+        )
+
+
+class PermisosUsuariosTests(TestCase):
+    """Asignar grupos y permisos no debe romperse con datos que no estén como se espera"""
+
+    def setUp(self):
+        self.jefe = User.objects.create_superuser('jefe', password='clave-segura-123')
+        self.usuario = User.objects.create_user('empleado')
+        self.client.force_login(self.jefe)
+
+    # Recrear los grupos es un camino de recuperación, no cuenta para el presupuesto
+    @override_settings(PERFILADO_ESTRICTO=False)
+    def test_permisos_completos_sin_el_grupo(self):
+        Group.objects.filter(name=GRUPO_TOTAL).delete()
+        respuesta = self.client.post(reverse('admin:auth_user_changelist'), {
+            'action': 'asignar_permisos_completos',
+            '_selected_action': [self.usuario.pk],
+        })
+        self.assertEqual(respuesta.status_code, 302)
+        grupo = self.usuario.groups.get()
+        self.assertEqual(grupo.name, GRUPO_TOTAL)
+        self.assertEqual(grupo.permissions.count(), Permission.objects.count())
+
+    def test_actualizar_usuario_valida_los_ids(self):
+        url = reverse('carrito:actualizar_usuario', args=[self.usuario.pk])
+        grupo = Group.objects.get(name=GRUPO_TOTAL)
+        respuesta = self.client.post(url, {'grupos': [grupo.pk, 'x'], 'permisos': ['1']})
+        self.assertRedirects(respuesta, reverse('carrito:gestion_usuarios'), fetch_redirect_response=False)
+        self.assertFalse(self.usuario.groups.exists())
+
+        self.client.post(url, {'grupos': [grupo.pk], 'is_staff': 'on'})
+        self.usuario.refresh_from_db()
+        self.assertEqual(list(self.usuario.groups.all()), [grupo])
+        self.assertTrue(self.usuario.is_staff)
+
+
+class ReservasVencidasTests(TestCase):
+    """Las reservas vencidas vuelven al inventario; las vigentes no se tocan"""
+
+    def test_libera_solo_lo_vencido(self):
+        producto = Producto.objects.create(nombre='Taza', descripcion='Prueba', precio=Decimal('3.00'), inventario=10)
+        otro = Producto.objects.create(nombre='Plato', descripcion='Prueba', precio=Decimal('5.00'), inventario=10)
+        abandonados = [
+            Carrito.objects.create(usuario=User.objects.create_user(f'abandono{i}')) for i in range(3)
+        ]
+        for carrito in abandonados:
+            carrito.agregar_producto(producto, 2)
+        activo = Carrito.objects.create(usuario=User.objects.create_user('activo'))
+        activo.agregar_producto(otro, 1)
+        activo.agregar_producto(producto, 1)
+
+        despues = timezone.now() + datetime.timedelta(seconds=settings.RESERVA_CARRITO_SEGUNDOS + 1)
+        activo.items.filter(producto=producto).update(reserva_vence=despues + datetime.timedelta(hours=1))
+        # Los movimientos del libro se escriben al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            barrido = liberar_reservas_vencidas(tamano_lote=2, ahora=despues)
+
+        self.assertEqual((barrido.lotes, barrido.lineas, barrido.unidades), (2, 4, 7))
+        producto.refresh_from_db()
+        otro.refresh_from_db()
+        self.assertEqual((producto.inventario, otro.inventario), (9, 10))
+        self.assertEqual(Carrito.objects.filter(items__isnull=False).distinct().count(), 1)
+        activo.refresh_from_db()
+        self.assertEqual((activo.total_items, activo.monto_total), (1, Decimal('3.00')))
+        self.assertEqual(
+            sum(InventarioMovimiento.objects.filter(motivo=InventarioMovimiento.VENCIMIENTO).values_list('delta', flat=True)),
+            7
+        )
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class ReservasDuranteCheckoutTests(TransactionTestCase):
+    """El barrido no toca un carrito mientras se confirma su pedido (requiere bloqueos por fila)"""
+
+    def test_barrido_saltea_checkout_en_curso(self):
+        producto = Producto.objects.create(nombre='Taza', descripcion='Prueba', precio=Decimal('3.00'), inventario=10)
+        carrito = Carrito.objects.create(usuario=User.objects.create_user('comprador'))
+        carrito.agregar_producto(producto, 4)
+
+        en_checkout, barrido_listo = threading.Event(), threading.Event()
+        bulk_create = LineaPedido.objects.bulk_create
+
+        def pausar(lineas):
+            en_checkout.set()
+            barrido_listo.wait(10)
+            return bulk_create(lineas)
+
+        def comprar():
+            try:
+                with mock.patch.object(LineaPedido.objects, 'bulk_create', side_effect=pausar):
+                    Carrito.objects.get(pk=carrito.pk).confirmar_pedido()
+            finally:
+                connections.close_all()
+
+        hilo = threading.Thread(target=comprar)
+        hilo.start()
+        self.assertTrue(en_checkout.wait(10))
+        despues = timezone.now() + datetime.timedelta(seconds=settings.RESERVA_CARRITO_SEGUNDOS + 1)
+        try:
+            barrido = liberar_reservas_vencidas(ahora=despues)
+        finally:
+            barrido_listo.set()
+            hilo.join()
+
+        self.assertEqual(barrido.unidades, 0)
+        producto.refresh_from_db()
+        vendidas = sum(LineaPedido.objects.filter(producto=producto).values_list('cantidad', flat=True))
+        self.assertEqual((vendidas, producto.inventario), (4, 6))
+
+
+@override_settings(PERFILADO=True, PERFILADO_ESTRICTO=True)
+class PerfiladoTests(TestCase):
+    """El perfilado reporta consultas y N+1, y el modo estricto hace fallar al que se pasa"""
+
+    def setUp(self):
+        reiniciar_endpoints()
+        self.usuario = User.objects.create_user('cliente', password='clave-segura-123', is_staff=True)
+        self.client.force_login(self.usuario)
+
+    def test_detecta_n_mas_1_y_su_origen(self):
+        Producto.objects.bulk_create(
+            Producto(nombre=f'Producto {i}', descripcion='Prueba', precio=Decimal('1.00'), inventario=1)
+            for i in range(4)
+        )
+        with perfilar() as perfil:
+            for producto in Producto.objects.all():
+                producto.carrito_items.count()
+        self.assertEqual(len(perfil), 5)
+        [(veces, _, origen)] = perfil.repetidas()
+        self.assertEqual(veces, 4)
+        self.assertTrue(origen.startswith('carrito/tests.py:'), origen)
+
+    def test_encabezados_pagina_y_presupuesto(self):
+        respuesta = self.client.get(reverse('carrito:ver_carrito'))
+        self.assertLessEqual(int(respuesta['X-Consultas']), 3)
+        self.assertIn('db;dur=', respuesta['Server-Timing'])
+
+        respuesta = self.client.get(reverse('carrito:admin_perfilado'))
+        self.assertContains(respuesta, 'GET carrito:ver_carrito')
+        self.assertEqual(peores_endpoints()[0].presupuesto, 3)
+
+        with override_settings(PERFILADO_PRESUPUESTOS={'carrito:ver_carrito': 0}):
+            with self.assertRaises(PresupuestoExcedido):
+                self.client.get(reverse('carrito:ver_carrito'))
+
+    def test_presupuesto_por_metodo(self):
+        # El GET del checkout tiene presupuesto propio; confirmar la compra usa el general
+        carrito = Carrito.objects.create(usuario=self.usuario)
+        for i in range(5):
+            carrito.agregar_producto(Producto.objects.create(
+                nombre=f'Producto {i}', descripcion='Prueba', precio=Decimal('2.50'), inventario=10
+            ), 2)
+        respuesta = self.client.get(reverse('carrito:checkout'))
+        self.assertLessEqual(int(respuesta['X-Consultas']), 3)
+
+        respuesta = self.client.post(reverse('carrito:checkout'))
+        self.assertContains(respuesta, '10 artículos')
+        self.assertGreater(int(respuesta['X-Consultas']), 3)
+        self.assertEqual(
+            {e.nombre: e.presupuesto for e in peores_endpoints()},
+            {'GET carrito:checkout': 3, 'POST carrito:checkout': settings.PERFILADO_PRESUPUESTO}
+        )
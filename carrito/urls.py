@@ -1,20 +1,34 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from django.views.decorators.http import require_POST
 
 app_name = 'carrito'  # Namespace para todas las URLs
 
+# Bajo ASGI las páginas de lectura van en sus versiones async (settings.VISTAS_ASYNC)
+if settings.VISTAS_ASYNC:
+    lista_productos, detalle_producto, ver_carrito = (
+        views.alista_productos, views.adetalle_producto, views.aver_carrito
+    )
+else:
+    lista_productos, detalle_producto, ver_carrito = (
+        views.lista_productos, views.detalle_producto, views.ver_carrito
+    )
+
 urlpatterns = [
     # --------------------------------------------
     # Páginas públicas
     # --------------------------------------------
-    path('', views.lista_productos, name='lista_productos'),
-    path('producto/<int:producto_id>/', views.detalle_producto, name='detalle_producto'),
+    path('', lista_productos, name='lista_productos'),
+    path('producto/<int:producto_id>/', detalle_producto, name='detalle_producto'),
+    path('productos/pagina/', views.productos_pagina, name='productos_pagina'),
+    path('buscar/', views.busqueda_productos, name='busqueda_productos'),
+    path('imagenes/<str:huella>-<int:ancho>.<str:formato>', views.imagen_variante, name='imagen_variante'),
     
     # --------------------------------------------
     # Gestión del carrito
     # --------------------------------------------
-    path('carrito/', views.ver_carrito, name='ver_carrito'),
+    path('carrito/', ver_carrito, name='ver_carrito'),
     path('agregar/<int:producto_id>/', views.agregar_al_carrito, name='agregar_al_carrito'),
     path('actualizar/<int:item_id>/', views.actualizar_carrito, name='actualizar_carrito'),
     path('eliminar/<int:item_id>/', views.eliminar_del_carrito, name='eliminar_del_carrito'),
@@ -41,6 +55,8 @@ urlpatterns = [
          require_POST(views.eliminar_producto),  # Solo acepta POST
          name='admin_eliminar_producto'),
     path('admin/reportes/', views.reportes_productos, name='admin_reportes'),
+    path('admin/exportar/<slug:conjunto>.<slug:formato>', views.exportar_datos, name='admin_exportar'),
+    path('admin/perf/', views.perfilado_consultas, name='admin_perfilado'),
     
     # ============================================
     # NUEVAS URLs PARA GESTIÓN DE USUARIOS
@@ -49,4 +65,6 @@ urlpatterns = [
     path('admin/usuarios/actualizar/<int:user_id>/', 
          require_POST(views.actualizar_usuario),  # Solo acepta POST
          name='actualizar_usuario'),
+    path('api/permisos/', views.opciones_permisos_json, name='opciones_permisos'),
+    path('api/user-permissions/<int:user_id>/', views.permisos_usuario_json, name='permisos_usuario'),
 ]
@@ -0,0 +1,58 @@
+"""
+Consultas de la gestión de usuarios.
+
+El listado se pagina en el servidor y se busca por prefijo del nombre de
+usuario como rango (username >= q AND username < q + '\\uffff'), así usa el
+índice único de username en SQLite y en Postgres; un LIKE con ESCAPE, que
+es lo que arma Django, recorre la tabla. Grupos y permisos de la página
+llegan en dos consultas con prefetch, y los selectores del modal piden
+las opciones por JSON solo cuando se abren.
+"""
+from django.contrib.auth.models import Group, Permission, User
+from django.db.models import Prefetch
+
+USUARIOS_POR_PAGINA = 25
+
+
+def buscar_usuarios(busqueda=''):
+    """Usuarios por nombre, filtrados por prefijo (distingue mayúsculas)"""
+    usuarios = User.objects.order_by('username')
+    if busqueda:
+        usuarios = usuarios.filter(username__gte=busqueda, username__lt=busqueda + '\uffff')
+    return usuarios
+
+
+def con_grupos_y_permisos(usuarios):
+    """Prefetch de grupos y permisos (con su content_type) para la página"""
+    return usuarios.prefetch_related(
+        'groups',
+        Prefetch('user_permissions', queryset=Permission.objects.select_related('content_type')),
+    )
+
+
+def permisos_de(usuario):
+    """Lo que el modal marca al abrirse para un usuario"""
+    return {
+        'groups': list(usuario.groups.values_list('id', flat=True)),
+        'permissions': list(usuario.user_permissions.values_list('id', flat=True)),
+        'is_staff': usuario.is_staff,
+        'is_superuser': usuario.is_superuser,
+    }
+
+
+def opciones_permisos():
+    """Grupos y permisos que ofrecen los selectores"""
+    permisos = Permission.objects.select_related('content_type').order_by(
+        'content_type__app_label', 'codename'
+    )
+    return {
+        'groups': [{'id': pk, 'name': nombre} for pk, nombre in Group.objects.order_by('name').values_list('id', 'name')],
+        'permissions': [
+            {
+                'id': permiso.id,
+                'name': permiso.name,
+                'codename': f'{permiso.content_type.app_label}.{permiso.codename}',
+            }
+            for permiso in permisos
+        ],
+    }
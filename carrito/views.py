@@ -1,27 +1,48 @@
-from django.contrib.auth.models import User, Group, Permission
-from django.contrib.contenttypes.models import ContentType
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.admin.views.decorators import staff_member_required
-from django.contrib.auth import login, authenticate
+from django.contrib.auth import login
+from django.contrib.auth.middleware import get_user
 from django.contrib import messages
-from django.core.exceptions import ObjectDoesNotExist
 from django.views.decorators.http import require_POST
-from django.db import models
-from .models import Producto, Carrito, ItemCarrito
-from .forms import RegistroForm, LoginForm, ProductoForm
+from django.db import models, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from .models import Producto, ItemCarrito
+from .inventario import StockInsuficiente
+from .consultas import ResumenCarrito, resumen_carrito
+from .carritos import CarritoUsuario, carrito_de
+from .paginacion import apagina_por_cursor, pagina_por_cursor
+from .busqueda import LIMITE_RESULTADOS, buscar_productos
+from . import cache as cache_tienda
+from .estadisticas import UMBRAL_BAJO_STOCK, estadisticas_panel
+from .reportes import estadisticas_inventario, historial_inventario, productos_populares
+from .exportacion import CONJUNTOS, FORMATOS, exportar
+from . import imagenes
+from .archivos import CACHE_INMUTABLE, Archivo, servir_archivo
+from .bd import aiterar_de_replica, desde_replica, iterar_de_replica
+from .perfilado import peores_endpoints, reiniciar_endpoints
+from .permisos import fijar_en_lote
+from .usuarios import (
+    USUARIOS_POR_PAGINA, buscar_usuarios, con_grupos_y_permisos, opciones_permisos, permisos_de
+)
+from .forms import RegistroForm, LoginForm, PermisosUsuarioForm, ProductoForm
 
 
 # -------------------------------
 # Funciones auxiliares
 # -------------------------------
 
-def obtener_o_crear_carrito(user):
-    """Obtiene el carrito existente o crea uno nuevo para el usuario"""
-    try:
-        return user.carrito
-    except ObjectDoesNotExist:
-        return Carrito.objects.create(usuario=user)
+async def ausuario(request):
+    """Resuelve request.user en un hilo; después la plantilla lo lee sin consultas"""
+    return await sync_to_async(get_user)(request)
 
 def es_administrador(user):
     """Verifica si el usuario es administrador (staff o superuser)"""
@@ -31,110 +52,213 @@ def es_administrador(user):
 # Vistas públicas
 # -------------------------------
 
+PRODUCTOS_POR_PAGINA = 24
+
+def pagina_catalogo(cursor):
+    """Página del catálogo desde la caché, con el fragmento fijo de cada tarjeta"""
+    productos, siguiente = cache_tienda.pagina_catalogo(
+        cursor,
+        lambda: pagina_por_cursor(
+            Producto.objects.filter(inventario__gt=0),
+            cursor,
+            PRODUCTOS_POR_PAGINA
+        )
+    )
+    fragmentos = cache_tienda.fragmentos_productos(
+        productos,
+        lambda producto: render_to_string('carrito/tarjeta_producto.html', {'producto': producto})
+    )
+    for producto in productos:
+        producto.fragmento = fragmentos[producto.pk]
+    return productos, siguiente
+
+@desde_replica
 def lista_productos(request):
-    """Muestra todos los productos disponibles"""
-    productos = Producto.objects.filter(inventario__gt=0)
-    carrito_items_count = 0
-    
-    if request.user.is_authenticated:
-        carrito = obtener_o_crear_carrito(request.user)
-        carrito_items_count = carrito.cantidad_items()
+    """Muestra los productos disponibles, paginados por cursor"""
+    productos, siguiente = pagina_catalogo(request.GET.get('despues'))
     
     return render(request, 'carrito/lista_productos.html', {
         'productos': productos,
-        'carrito_items_count': carrito_items_count
+        'siguiente': siguiente,
+        'carrito_items_count': carrito_de(request).unidades()
     })
 
-@login_required
+@desde_replica
+def productos_pagina(request):
+    """Siguiente página del catálogo en JSON (scroll infinito)"""
+    productos, siguiente = pagina_catalogo(request.GET.get('despues'))
+    return JsonResponse({
+        'html': render_to_string(
+            'carrito/tarjetas_productos.html',
+            {'productos': productos},
+            request=request
+        ),
+        'siguiente': siguiente,
+    })
+
+@desde_replica
+def busqueda_productos(request):
+    """Búsqueda pública del catálogo (JSON, pensada para autocompletar)"""
+    busqueda = request.GET.get('q', '')
+    productos = Producto.objects.filter(inventario__gt=0)
+    if busqueda:
+        productos = buscar_productos(busqueda, productos, limite=20)
+    else:
+        productos = productos.none()
+    
+    return JsonResponse({
+        'q': busqueda,
+        'resultados': [
+            {
+                'id': producto.id,
+                'nombre': producto.nombre,
+                'precio': str(producto.precio),
+                'inventario': producto.inventario,
+                'url': reverse('carrito:detalle_producto', args=[producto.id]),
+                'imagen': imagenes.fuentes(producto, 'miniatura')['src'] if producto.imagen else None,
+            }
+            for producto in productos
+        ]
+    })
+
+@desde_replica
 def detalle_producto(request, producto_id):
     """Muestra los detalles de un producto específico"""
-    producto = get_object_or_404(Producto, id=producto_id)
-    carrito = obtener_o_crear_carrito(request.user)
-    en_carrito = carrito.items.filter(producto=producto).exists()
+    producto = cache_tienda.producto(
+        producto_id,
+        lambda: get_object_or_404(Producto, id=producto_id)
+    )
     
     return render(request, 'carrito/detalle_producto.html', {
         'producto': producto,
-        'en_carrito': en_carrito,
+        'en_carrito': carrito_de(request).contiene(producto),
         'tiene_imagen': producto.imagen and hasattr(producto.imagen, 'url')
     })
 
-@login_required
+def imagen_variante(request, huella, ancho, formato):
+    """Sirve una variante de imagen; la genera y la deja en disco si todavía no existe"""
+    if ancho not in imagenes.ANCHOS or formato not in imagenes.formatos():
+        raise Http404("Variante no disponible")
+    ruta = imagenes.ruta_variante(huella, ancho, formato)
+    if not ruta.exists():
+        producto = Producto.objects.filter(imagen_huella=huella).exclude(imagen='').first()
+        if producto is None:
+            raise Http404("Imagen no encontrada")
+        with producto.imagen.open('rb') as original:
+            imagenes.generar_variante(original, huella, ancho, formato)
+
+    # El nombre cambia con el contenido: el navegador nunca necesita revalidar
+    archivo = Archivo.desde_disco(ruta, CACHE_INMUTABLE)
+    archivo.tipo = imagenes.TIPOS[formato]
+    return servir_archivo(request, archivo)
+
 def ver_carrito(request):
-    """Muestra el contenido del carrito"""
-    carrito = obtener_o_crear_carrito(request.user)
+    """Muestra el contenido del carrito (anónimo o del usuario)"""
+    resumen = carrito_de(request).resumen()
     return render(request, 'carrito/carrito.html', {
-        'carrito': carrito,
-        'items': carrito.items.select_related('producto'),
-        'total': carrito.total()
+        'items': resumen.items,
+        'total': resumen.total,
+        'carrito_items_count': resumen.unidades
+    })
+
+# -------------------------------
+# Vistas async de lectura (ver TIENDA_VISTAS_ASYNC en settings)
+# -------------------------------
+
+async def apagina_catalogo(cursor):
+    """pagina_catalogo con el ORM y la caché async"""
+    productos, siguiente = await cache_tienda.apagina_catalogo(
+        cursor,
+        lambda: apagina_por_cursor(
+            Producto.objects.filter(inventario__gt=0),
+            cursor,
+            PRODUCTOS_POR_PAGINA
+        )
+    )
+    fragmentos = await cache_tienda.afragmentos_productos(
+        productos,
+        lambda producto: render_to_string('carrito/tarjeta_producto.html', {'producto': producto})
+    )
+    for producto in productos:
+        producto.fragmento = fragmentos[producto.pk]
+    return productos, siguiente
+
+@desde_replica
+async def alista_productos(request):
+    """lista_productos sin pasar por el pool de hilos de ASGI"""
+    productos, siguiente = await apagina_catalogo(request.GET.get('despues'))
+    await ausuario(request)
+
+    return render(request, 'carrito/lista_productos.html', {
+        'productos': productos,
+        'siguiente': siguiente,
+        'carrito_items_count': await carrito_de(request).aunidades()
+    })
+
+@desde_replica
+async def adetalle_producto(request, producto_id):
+    """detalle_producto con el ORM y la caché async"""
+    async def buscar():
+        try:
+            return await Producto.objects.aget(id=producto_id)
+        except Producto.DoesNotExist:
+            raise Http404("Producto no encontrado")
+
+    producto = await cache_tienda.aproducto(producto_id, buscar)
+    await ausuario(request)
+
+    return render(request, 'carrito/detalle_producto.html', {
+        'producto': producto,
+        'en_carrito': await carrito_de(request).acontiene(producto),
+        'tiene_imagen': producto.imagen and hasattr(producto.imagen, 'url')
+    })
+
+async def aver_carrito(request):
+    """ver_carrito con el ORM async"""
+    await ausuario(request)
+    resumen = await carrito_de(request).aresumen()
+    return render(request, 'carrito/carrito.html', {
+        'items': resumen.items,
+        'total': resumen.total,
+        'carrito_items_count': resumen.unidades
     })
 
-@login_required
 def agregar_al_carrito(request, producto_id):
     """Agrega un producto al carrito con validación de stock"""
     producto = get_object_or_404(Producto, id=producto_id)
     cantidad = int(request.POST.get('cantidad', 1))
-    carrito = obtener_o_crear_carrito(request.user)
     
     try:
-        # Validación de stock disponible
-        if cantidad > producto.inventario:
-            messages.warning(request, f"No hay suficiente stock de {producto.nombre}")
-            return redirect(request.META.get('HTTP_REFERER', 'carrito:lista_productos'))
-        
-        # Agregar al carrito
-        item, created = ItemCarrito.objects.get_or_create(
-            carrito=carrito,
-            producto=producto,
-            defaults={'cantidad': cantidad}
-        )
-        
-        if not created:
-            if (item.cantidad + cantidad) > producto.inventario:
-                messages.warning(request, f"No puedes agregar más de {producto.inventario} unidades")
-            else:
-                item.cantidad += cantidad
-                item.save()
-                messages.success(request, f"Se agregaron {cantidad} {producto.nombre} al carrito")
-        else:
-            messages.success(request, f"{producto.nombre} agregado al carrito")
-            
+        # Con usuario la reserva es un UPDATE condicional; sin usuario solo se
+        # valida contra el stock libre y se reserva al iniciar sesión
+        carrito_de(request).agregar(producto, cantidad)
+        messages.success(request, f"Se agregaron {cantidad} {producto.nombre} al carrito")
+    except StockInsuficiente:
+        messages.warning(request, f"No hay suficiente stock de {producto.nombre}")
     except Exception as e:
         messages.error(request, f"Error al agregar producto: {str(e)}")
     
     return redirect(request.META.get('HTTP_REFERER', 'carrito:lista_productos'))
 
-@login_required
 def actualizar_carrito(request, item_id):
     """Actualiza la cantidad de un item en el carrito"""
-    carrito = obtener_o_crear_carrito(request.user)
-    item = get_object_or_404(ItemCarrito, id=item_id, carrito=carrito)
     nueva_cantidad = int(request.POST.get('cantidad', 1))
     
     try:
+        producto = carrito_de(request).actualizar(item_id, nueva_cantidad)
         if nueva_cantidad <= 0:
-            carrito.remover_producto(item.producto)
-            messages.success(request, f"{item.producto.nombre} eliminado del carrito")
+            messages.success(request, f"{producto.nombre} eliminado del carrito")
         else:
-            # Validar que no exceda el inventario
-            if nueva_cantidad > item.producto.inventario + item.cantidad:
-                messages.error(request, f"No hay suficiente inventario. Máximo disponible: {item.producto.inventario}")
-            else:
-                diferencia = nueva_cantidad - item.cantidad
-                carrito.agregar_producto(item.producto, diferencia)
-                messages.success(request, f"Cantidad de {item.producto.nombre} actualizada")
+            messages.success(request, f"Cantidad de {producto.nombre} actualizada")
     except ValueError as e:
         messages.error(request, str(e))
     
     return redirect('carrito:ver_carrito')
 
-@login_required
 def eliminar_del_carrito(request, item_id):
     """Elimina un producto del carrito"""
-    carrito = obtener_o_crear_carrito(request.user)
-    item = get_object_or_404(ItemCarrito, id=item_id, carrito=carrito)
-    nombre_producto = item.producto.nombre
-    carrito.remover_producto(item.producto)
-    messages.success(request, f"{nombre_producto} eliminado del carrito")
+    producto = carrito_de(request).eliminar(item_id)
+    messages.success(request, f"{producto.nombre} eliminado del carrito")
     return redirect('carrito:ver_carrito')
 
 def registro(request):
@@ -143,25 +267,15 @@ def registro(request):
         form = RegistroForm(request.POST)
         if form.is_valid():
             try:
-                # Guardar el usuario
+                # Guardar el usuario (el único hash de la contraseña)
                 user = form.save(commit=False)
                 user.email = form.cleaned_data.get('email')
                 user.save()
                 
-                # Crear carrito para el usuario
-                Carrito.objects.create(usuario=user)
-                
-                # Autenticar y loguear al usuario
-                username = form.cleaned_data.get('username')
-                password = form.cleaned_data.get('password1')
-                user = authenticate(username=username, password=password)
-                
-                if user is not None:
-                    login(request, user)
-                    messages.success(request, "Registro exitoso. ¡Bienvenido!")
-                    return redirect('carrito:lista_productos')
-                else:
-                    messages.error(request, "Error al autenticar al usuario después del registro")
+                # Recién creado: no hace falta authenticate(), que la volvería a hashear
+                login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+                messages.success(request, "Registro exitoso. ¡Bienvenido!")
+                return redirect('carrito:lista_productos')
             except Exception as e:
                 messages.error(request, f"Error al registrar usuario: {str(e)}")
         else:
@@ -179,17 +293,12 @@ def login_view(request):
     if request.method == 'POST':
         form = LoginForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
-            
-            if user is not None:
-                login(request, user)
-                obtener_o_crear_carrito(user)
-                messages.success(request, f"Bienvenido de nuevo, {username}!")
-                return redirect('carrito:lista_productos')
-            else:
-                messages.error(request, "Usuario o contraseña incorrectos")
+            # is_valid() ya autenticó: get_user() evita hashear la contraseña otra vez
+            user = form.get_user()
+            # El receptor de user_logged_in pasa el carrito anónimo al del usuario
+            login(request, user)
+            messages.success(request, f"Bienvenido de nuevo, {user.get_username()}!")
+            return redirect('carrito:lista_productos')
         else:
             messages.error(request, "Por favor corrige los errores en el formulario")
     else:
@@ -200,40 +309,41 @@ def login_view(request):
 @login_required
 def checkout(request):
     """Procesa la compra"""
-    carrito = obtener_o_crear_carrito(request.user)
+    carrito = CarritoUsuario(request.user).existente()
+    resumen = resumen_carrito(carrito) if carrito else ResumenCarrito()
     
-    if carrito.items.count() == 0:
+    if resumen.vacio:
         messages.warning(request, "Tu carrito está vacío")
         return redirect('carrito:ver_carrito')
     
     if request.method == 'POST':
         try:
-            # Verificar stock antes de procesar
-            for item in carrito.items.all():
-                if item.cantidad > item.producto.inventario:
+            # Verificar stock antes de procesar (lo reservado ya es de la línea)
+            if not resumen.stock_suficiente:
+                for item in resumen.sin_stock:
                     messages.error(request, f"No hay suficiente stock de {item.producto.nombre}")
-                    return redirect('carrito:ver_carrito')
+                return redirect('carrito:ver_carrito')
             
-            # Procesar compra (simulado)
-            carrito.limpiar()
+            pedido = carrito.confirmar_pedido()
             messages.success(request, "¡Compra realizada con éxito!")
-            return render(request, 'carrito/orden_completada.html')
+            return render(request, 'carrito/orden_completada.html', {'pedido': pedido})
         
+        except StockInsuficiente:
+            messages.error(request, "Otro cliente se llevó parte del stock de tu carrito")
+            return redirect('carrito:ver_carrito')
         except Exception as e:
             messages.error(request, f"Error al procesar la compra: {str(e)}")
             return redirect('carrito:ver_carrito')
     
     return render(request, 'carrito/checkout.html', {
         'carrito': carrito,
-        'items': carrito.items.select_related('producto'),
-        'total': carrito.total()
+        'items': resumen.items,
+        'total': resumen.total
     })
 
-@login_required
 def limpiar_carrito(request):
     """Vacia completamente el carrito de compras"""
-    carrito = obtener_o_crear_carrito(request.user)
-    carrito.limpiar()
+    carrito_de(request).limpiar()
     messages.success(request, "Carrito vaciado correctamente")
     return redirect('carrito:ver_carrito')
 
@@ -242,44 +352,41 @@ def limpiar_carrito(request):
 # -------------------------------
 
 @staff_member_required
+@desde_replica
 def panel_administracion(request):
     """Panel principal de administración"""
-    total_productos = Producto.objects.count()
-    productos_bajo_stock = Producto.objects.filter(inventario__lt=5).order_by('inventario')
-    total_usuarios = User.objects.count()  # Nuevo: conteo de usuarios
-    
     return render(request, 'carrito/admin/panel.html', {
-        'total_productos': total_productos,
-        'productos_bajo_stock': productos_bajo_stock,
-        'ultimos_productos': Producto.objects.order_by('-creado')[:5],
-        'todos_los_productos': Producto.objects.all(),
-        'total_usuarios': total_usuarios,  # Nuevo: pasar a template
-        'productos_agotados': Producto.objects.filter(inventario=0)
+        **estadisticas_panel(),
+        'umbral_bajo_stock': UMBRAL_BAJO_STOCK,
+        'estadisticas_cache': cache_tienda.estadisticas()
     })
 
 @staff_member_required
 def admin_lista_productos(request):
     """Lista COMPLETA de productos para administradores"""
     busqueda = request.GET.get('q', '')
+    filtro = request.GET.get('filter', '')
     productos = Producto.objects.all().order_by('-creado')
     
+    if filtro == 'agotados':
+        productos = productos.filter(inventario=0)
+    elif filtro == 'bajo_stock':
+        productos = productos.filter(inventario__lt=UMBRAL_BAJO_STOCK, inventario__gt=0)
+    
     if busqueda:
-        productos = productos.filter(
-            models.Q(nombre__icontains=busqueda) |
-            models.Q(descripcion__icontains=busqueda)
-        )
+        # Índice de texto completo, ordenado por relevancia (filtros incluidos)
+        productos = buscar_productos(busqueda, productos)
     
-    # Agrupar por disponibilidad de stock
-    productos_agotados = productos.filter(inventario=0)
-    productos_bajo_stock = productos.filter(inventario__lt=5, inventario__gt=0)
-    productos_disponibles = productos.filter(inventario__gte=5)
+    pagina = Paginator(productos, 25).get_page(request.GET.get('page'))
     
     return render(request, 'carrito/admin/lista_productos.html', {
-        'productos_agotados': productos_agotados,
-        'productos_bajo_stock': productos_bajo_stock,
-        'productos_disponibles': productos_disponibles,
+        'productos': pagina,
         'busqueda': busqueda,
-        'total_productos': productos.count()
+        'total_productos': pagina.paginator.count,
+        # El motor devuelve a lo sumo LIMITE_RESULTADOS: la lista puede estar cortada
+        'busqueda_truncada': bool(busqueda) and pagina.paginator.count >= LIMITE_RESULTADOS,
+        'limite_busqueda': LIMITE_RESULTADOS,
+        'umbral_bajo_stock': UMBRAL_BAJO_STOCK
     })
 
 @staff_member_required
@@ -358,82 +465,93 @@ def eliminar_producto(request, producto_id):
 
 @staff_member_required
 def gestion_usuarios(request):
-    """Vista completa de gestión de usuarios"""
-    usuarios = User.objects.all().prefetch_related('groups')  # ✅ Corregido (usa prefetch_related)
-    grupos = Group.objects.all()
-    permisos = Permission.objects.all()
-    
+    """Usuarios paginados con sus grupos y permisos (sin una consulta por fila)"""
+    busqueda = request.GET.get('q', '').strip()
+    pagina = Paginator(
+        con_grupos_y_permisos(buscar_usuarios(busqueda)), USUARIOS_POR_PAGINA
+    ).get_page(request.GET.get('page'))
+
     return render(request, 'carrito/admin/gestion_usuarios.html', {
-        'usuarios': usuarios,
-        'grupos': grupos,
-        'permisos': permisos,
-        'content_types': ContentType.objects.all()
+        'usuarios': pagina,
+        'paginas': pagina.paginator.get_elided_page_range(pagina.number),
+        'busqueda': busqueda,
     })
 
+@staff_member_required
+def opciones_permisos_json(request):
+    """Grupos y permisos para los selectores del modal (se piden al abrirlo)"""
+    return JsonResponse(opciones_permisos())
+
+@staff_member_required
+def permisos_usuario_json(request, user_id):
+    """Grupos, permisos y banderas actuales de un usuario"""
+    return JsonResponse(permisos_de(get_object_or_404(User, id=user_id)))
+
 @staff_member_required
 @require_POST
 def actualizar_usuario(request, user_id):
     """Actualiza permisos y grupos de usuario"""
     usuario = get_object_or_404(User, id=user_id)
     
-    if request.user.is_superuser:  # Solo superusuarios pueden hacer esto
-        # Manejar grupos
-        grupos_seleccionados = request.POST.getlist('grupos')
-        usuario.groups.set(grupos_seleccionados)
-        
-        # Manejar permisos individuales
-        permisos_seleccionados = request.POST.getlist('permisos')
-        usuario.user_permissions.set(permisos_seleccionados)
-        
-        # Actualizar estado de staff/superuser
-        usuario.is_staff = 'is_staff' in request.POST
-        usuario.is_superuser = 'is_superuser' in request.POST
-        usuario.save()
-        
-        messages.success(request, f"Usuario {usuario.username} actualizado")
-    else:
+    if not request.user.is_superuser:  # Solo superusuarios pueden hacer esto
         messages.error(request, "No tienes permisos para esta acción")
-    
+        return redirect('carrito:gestion_usuarios')
+
+    form = PermisosUsuarioForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, f"Grupos o permisos inválidos para {usuario.username}")
+        return redirect('carrito:gestion_usuarios')
+
+    # Grupos y permisos individuales: un DELETE y un INSERT por tabla como mucho
+    with transaction.atomic():
+        fijar_en_lote(User.groups, [usuario], form.cleaned_data['grupos'])
+        fijar_en_lote(User.user_permissions, [usuario], form.cleaned_data['permisos'])
+
+    # Actualizar estado de staff/superuser
+    usuario.is_staff = 'is_staff' in request.POST
+    usuario.is_superuser = 'is_superuser' in request.POST
+    usuario.save()
+
+    messages.success(request, f"Usuario {usuario.username} actualizado")
     return redirect('carrito:gestion_usuarios')
 
 @staff_member_required
+@desde_replica
 def reportes_productos(request):
-    """Reportes avanzados con gráficos y estadísticas"""
-    from django.db.models import Sum, Avg, Count
-    import datetime
-    
-    # Estadísticas básicas
-    estadisticas = {
-        'total_inventario': Producto.objects.aggregate(Sum('inventario'))['inventario__sum'],
-        'valor_total': Producto.objects.aggregate(
-            total=Sum(models.F('inventario') * models.F('precio'))
-        )['total'] or 0,
-        'precio_promedio': Producto.objects.aggregate(Avg('precio'))['precio__avg'],
-        'productos_sin_imagen': Producto.objects.filter(imagen__isnull=True).count()
-    }
-    
-    # Productos más populares (en carritos)
-    productos_populares = ItemCarrito.objects.values(
-        'producto__nombre'
-    ).annotate(
-        total_vendido=Sum('cantidad'),
-        veces_agregado=Count('id')
-    ).order_by('-total_vendido')[:10]
-    
-    # Evolución de inventario (últimos 30 días)
-    fecha_limite = datetime.date.today() - datetime.timedelta(days=30)
-    historial = Producto.objects.filter(
-        actualizado__gte=fecha_limite
-    ).order_by('actualizado').values(
-        'actualizado'
-    ).annotate(
-        total=Count('id'),
-        nuevo_inventario=Sum('inventario')
-    )
-    
+    """Reportes con estadísticas actuales y el historial consolidado por día"""
     return render(request, 'carrito/admin/reportes.html', {
-        'estadisticas': estadisticas,
-        'productos_populares': productos_populares,
-        'historial': historial,
-        'hoy': datetime.date.today()
-    })
\ No newline at end of file
+        'estadisticas': estadisticas_inventario(),
+        'productos_populares': productos_populares(),
+        'historial': historial_inventario(dias=30),
+        'exportaciones': CONJUNTOS,
+        'hoy': timezone.localdate()
+    })
+
+@staff_member_required
+def exportar_datos(request, conjunto, formato):
+    """Descarga en streaming de un conjunto de datos (CSV o JSON Lines)"""
+    try:
+        bloques = exportar(conjunto, formato)
+    except (KeyError, ValueError):
+        raise Http404("Exportación no disponible")
+    # Bajo ASGI un iterador sync se leería entero antes de mandarlo
+    iterar = aiterar_de_replica if isinstance(request, ASGIRequest) else iterar_de_replica
+    respuesta = StreamingHttpResponse(iterar(bloques), content_type=FORMATOS[formato])
+    respuesta['Content-Disposition'] = (
+        f'attachment; filename="{conjunto}-{timezone.localdate():%Y%m%d}.{formato}"'
+    )
+    return respuesta
+
+@staff_member_required
+def perfilado_consultas(request):
+    """Los endpoints con más consultas según PerfiladoMiddleware (TIENDA_PERFILADO)"""
+    if request.method == 'POST':
+        reiniciar_endpoints()
+        messages.success(request, "Se reinició el perfilado de consultas")
+        return redirect('carrito:admin_perfilado')
+    return render(request, 'carrito/admin/perfilado.html', {
+        'activo': settings.PERFILADO,
+        'estricto': settings.PERFILADO_ESTRICTO,
+        'umbral_repetidas': settings.PERFILADO_REPETIDAS,
+        'endpoints': peores_endpoints(),
+    })
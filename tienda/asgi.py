@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tienda.settings')
+# Las páginas de lectura en sus versiones async (ver VISTAS_ASYNC en settings)
+os.environ.setdefault('TIENDA_VISTAS_ASYNC', '1')
 
 application = get_asgi_application()
@@ -42,10 +42,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'carrito.perfilado.PerfiladoMiddleware',
+    'carrito.archivos.ArchivosMiddleware',
+    'carrito.sesiones.SesionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'carrito.movimientos.MovimientosMiddleware',
+    'carrito.carritos.CarritoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -71,17 +75,125 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'tienda.wsgi.application'
 
+# Catálogo, detalle y carrito tienen versiones async (carrito.views.alista_productos,
+# ...). tienda.asgi las activa con TIENDA_VISTAS_ASYNC=1; bajo WSGI se quedan
+# las sync, que no pagan el puente async_to_sync en cada request.
+VISTAS_ASYNC = os.environ.get('TIENDA_VISTAS_ASYNC', '0') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# TIENDA_DB elige el perfil: 'sqlite' (por defecto) o 'postgres'. El resto
+# sale de TIENDA_DB_NOMBRE, _USUARIO, _CLAVE, _HOST y _PUERTO.
+#
+# SQLite corre en modo WAL (los lectores no bloquean a quien escribe),
+# synchronous=NORMAL (seguro en WAL; solo se pierde la última transacción si
+# se corta la luz), espera hasta `timeout` segundos por el lock y abre las
+# transacciones con BEGIN IMMEDIATE; ver carrito.bd.sqlite.
+#
+# Postgres reutiliza conexiones TIENDA_DB_CONEXION_SEGUNDOS segundos y las
+# revisa antes de usarlas. Django 4.2 no trae pool propio: con
+# TIENDA_DB_PGBOUNCER=1 se apunta a un PgBouncer en modo transacción, que
+# no admite cursores del lado del servidor (los usan las exportaciones).
+# Con TIENDA_DB_REPLICA_HOST las lecturas del catálogo y de los reportes
+# van a esa réplica (carrito.bd.RouterReplica).
+
+BASES_DISPONIBLES = {
+    'sqlite': {
+        'ENGINE': 'carrito.bd.sqlite',
+        'NAME': os.environ.get('TIENDA_DB_NOMBRE', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'
+            ),
+        },
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('TIENDA_DB_NOMBRE', 'tienda'),
+        'USER': os.environ.get('TIENDA_DB_USUARIO', 'tienda'),
+        'PASSWORD': os.environ.get('TIENDA_DB_CLAVE', ''),
+        'HOST': os.environ.get('TIENDA_DB_HOST', '127.0.0.1'),
+        'PORT': os.environ.get('TIENDA_DB_PUERTO', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('TIENDA_DB_CONEXION_SEGUNDOS', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('TIENDA_DB_PGBOUNCER') == '1',
+    },
+}
+
 DATABASES = {
+    'default': BASES_DISPONIBLES[os.environ.get('TIENDA_DB', 'sqlite')],
+}
+if os.environ.get('TIENDA_DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['TIENDA_DB_REPLICA_HOST'],
+        # En los tests la réplica es la misma base de prueba
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['carrito.bd.RouterReplica']
+
+
+# Caché
+# TIENDA_CACHE elige el backend: 'locmem' (por defecto, por proceso),
+# 'archivo' (compartido entre procesos de la misma máquina), 'redis'
+# (cualquier servidor compatible en TIENDA_CACHE_URL) o 'ninguna'.
+
+CACHES_DISPONIBLES = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tienda',
+    },
+    'archivo': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('TIENDA_CACHE_DIR', BASE_DIR / '.cache'),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('TIENDA_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    },
+    'ninguna': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        **CACHES_DISPONIBLES[os.environ.get('TIENDA_CACHE', 'locmem')],
+        'KEY_PREFIX': 'tienda',
+        'TIMEOUT': 300,
     }
 }
 
+# Segundos que viven las páginas del catálogo y los fragmentos de tarjetas
+CACHE_TTL_CATALOGO = 300
+
+
+# Hashers de contraseñas
+# TIENDA_HASHER elige con cuál se guardan las contraseñas nuevas: 'scrypt'
+# (por defecto, de la biblioteca estándar), 'argon2' (requiere argon2-cffi)
+# o 'pbkdf2'. Los demás quedan para verificar hashes anteriores, que se
+# rehashean con el preferido en el siguiente login. Los costos siguen las
+# recomendaciones de OWASP; cambiarlos también provoca el rehash.
+HASHERS_DISPONIBLES = {
+    'scrypt': 'carrito.hashers.ScryptAjustado',
+    'argon2': 'carrito.hashers.Argon2Ajustado',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+HASHERS_PARAMETROS = {
+    'scrypt': {'work_factor': 2 ** 15, 'block_size': 8, 'parallelism': 1},
+    'argon2': {'time_cost': 2, 'memory_cost': 19 * 1024, 'parallelism': 1},
+}
+HASHER_PREFERIDO = os.environ.get('TIENDA_HASHER', 'scrypt')
+PASSWORD_HASHERS = [HASHERS_DISPONIBLES[HASHER_PREFERIDO]] + [
+    ruta for nombre, ruta in HASHERS_DISPONIBLES.items() if nombre != HASHER_PREFERIDO
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -118,10 +230,33 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+# collectstatic copia aquí los estáticos con hash y sus versiones .gz/.br
+STATIC_ROOT = BASE_DIR / 'staticfiles'
 # Configuración para archivos multimedia (imágenes de productos)
 MEDIA_URL = '/media/'  # URL base para servir archivos media
 MEDIA_ROOT = BASE_DIR / 'media'  # Ruta absoluta del sistema de archivos donde se guardarán
 
+# Variantes de Producto.imagen (ver carrito.imagenes): dónde se guardan y
+# qué perfiles se generan al subir la imagen; el resto se genera al pedirlas
+IMAGENES_VARIANTES_ROOT = MEDIA_ROOT / 'variantes'
+IMAGENES_PERFILES_AL_SUBIR = ('miniatura', 'tarjeta')
+
+# carrito.archivos.ArchivosMiddleware sirve STATIC_ROOT y MEDIA_ROOT desde la
+# propia aplicación (WSGI o ASGI). TIENDA_SERVIR_ARCHIVOS=0 lo desactiva si
+# hay un servidor web delante. ARCHIVOS_MAX_AGE es la caché de lo que no
+# lleva hash en el nombre.
+ARCHIVOS_SERVIR = os.environ.get('TIENDA_SERVIR_ARCHIVOS', '1') == '1'
+ARCHIVOS_MAX_AGE = 60
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'carrito.archivos.AlmacenEstaticos',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -143,9 +278,47 @@ LOGIN_URL = 'login'  # Esta queda igual porque está definida en urls.py princip
 LOGOUT_REDIRECT_URL = 'carrito:lista_productos'  # Agregado namespace
 LOGIN_REDIRECT_URL = 'carrito:lista_productos'  # Agregado namespace
 
-# Configuración de archivos multimedia
-DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
-
-# Configuración opcional para el manejo de sesiones
+# Motor de búsqueda de productos: None elige según la base de datos
+# (FTS5 en SQLite, tsvector en PostgreSQL). También acepta una ruta, p. ej.
+# 'carrito.busqueda.MotorBusqueda' para volver al LIKE sin índice.
+BUSQUEDA_MOTOR = None
+
+# Sesiones
+# TIENDA_SESIONES elige el motor: 'cached_db' (por defecto: lee de la caché
+# y escribe en la base; con varios procesos conviene TIENDA_CACHE compartida),
+# 'cookie' (cookie firmada, sin filas en la base) o 'db'.
+SESIONES_DISPONIBLES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_ENGINE = SESIONES_DISPONIBLES[os.environ.get('TIENDA_SESIONES', 'cached_db')]
 SESSION_COOKIE_AGE = 1209600  # 2 semanas en segundos (opcional)
-SESSION_SAVE_EVERY_REQUEST = True  # Para renovar la sesión con cada request
\ No newline at end of file
+# El vencimiento se renueva (y la sesión se reescribe) a lo sumo una vez por
+# SESION_RENOVAR_CADA segundos; ver carrito.sesiones.SesionMiddleware
+SESSION_SAVE_EVERY_REQUEST = False
+SESION_RENOVAR_CADA = 60 * 60 * 24
+
+# Reservas de stock de los carritos
+# Las unidades agregadas quedan reservadas TIENDA_RESERVA_SEGUNDOS (2 horas
+# por defecto) desde el último cambio de la línea; después las devuelve al
+# inventario el comando liberar_reservas (ver carrito.reservas).
+RESERVA_CARRITO_SEGUNDOS = int(os.environ.get('TIENDA_RESERVA_SEGUNDOS', 60 * 60 * 2))
+
+# Perfilado de consultas
+# TIENDA_PERFILADO=1 activa carrito.perfilado.PerfiladoMiddleware: cada
+# respuesta lleva sus consultas, el tiempo en la base y los N+1 en
+# encabezados, y /admin/perf/ lista los peores endpoints. Con 'estricto'
+# además lanza PresupuestoExcedido cuando una vista pasa su presupuesto
+# (TIENDA_PERFILADO=estricto python manage.py test).
+PERFILADO = os.environ.get('TIENDA_PERFILADO', '0') in ('1', 'estricto')
+PERFILADO_ESTRICTO = os.environ.get('TIENDA_PERFILADO') == 'estricto'
+# Veces que una misma firma de SQL tiene que repetirse para contar como N+1
+PERFILADO_REPETIDAS = 3
+# Máximo de consultas por request; PERFILADO_PRESUPUESTOS lo ajusta por
+# 'METODO vista' o por vista para cualquier método
+PERFILADO_PRESUPUESTO = 20
+PERFILADO_PRESUPUESTOS = {
+    'GET carrito:ver_carrito': 3,
+    'GET carrito:checkout': 3,
+}
@@ -26,7 +26,8 @@ urlpatterns = [
         name='logout'),
 ]
 
-# Configuración para archivos media y estáticos en desarrollo
-if settings.DEBUG:
+# Los archivos media y estáticos los sirve carrito.archivos.ArchivosMiddleware
+# (con o sin DEBUG); runserver sigue sirviendo los estáticos sin collectstatic.
+# Si el middleware está desactivado, en desarrollo se vuelve a static().
+if settings.DEBUG and not settings.ARCHIVOS_SERVIR:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file